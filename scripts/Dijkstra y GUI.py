@@ -10,125 +10,134 @@ from tkinter import filedialog, ttk, messagebox
 import networkx as nx
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import heapq
+import nodos as emisor
+from transporte import enviar_rango, recibir_mensaje
+from medicion import registrar_transferencia
+from topologia import topologia_compartida
+from tabla_rutas import tabla_rutas_compartida, rutas_por_tiempo, rutas_alternativas, rutas_disjuntas_optimas
+from multiplexado import enviar_archivos, recorrer_directorio
 
 # Configuración de red
 PUERTO_RECEPTOR = 5051
-BUFFER_SIZE = 4096
 
 #Ejecutar nodos.py en segundo plano
 subprocess.Popen(["python", "nodos.py"])
 
-# Definir los datos de la red (IPs y nombres)
-nodos = {
-    '100.101.1.1': 'Marco',
-    '100.101.1.2': 'Poncho', 
-    '100.101.1.3': 'Alberto',
-    '100.101.1.4': 'Raúl'
-}
+# Datos de la red (IPs, nombres y pesos de los enlaces) desde la topología compartida
+topologia = topologia_compartida()
+nodos = topologia.nodos()
 
-# Grafo de latencias (ms)
-grafo_latencia = {
-    '100.101.1.1': {'100.101.1.2': 109, '100.101.1.3': 199, '100.101.1.4': 75},
-    '100.101.1.2': {'100.101.1.1': 78, '100.101.1.3': 78, '100.101.1.4': 275},
-    '100.101.1.3': {'100.101.1.1': 56, '100.101.1.2': 117, '100.101.1.4': 174},
-    '100.101.1.4': {'100.101.1.1': 115, '100.101.1.2': 115, '100.101.1.3': 205}
-}
+# Grafos de latencia (ms) y ancho de banda (Mbps)
+grafo_latencia, grafo_ancho_banda = topologia.grafos()
 
-# Grafo de ancho de banda (Mbps) - para referencia
-grafo_ancho_banda = {
-    '100.101.1.1': {'100.101.1.2': 23.2, '100.101.1.3': 23.1, '100.101.1.4': 26.2},
-    '100.101.1.2': {'100.101.1.1': 80.0, '100.101.1.3': 3.95, '100.101.1.4': 11.3},
-    '100.101.1.3': {'100.101.1.1': 22.0, '100.101.1.2': 2.08, '100.101.1.4': 21.7},
-    '100.101.1.4': {'100.101.1.1': 83.1, '100.101.1.2': 4.58, '100.101.1.3': 6.46}
-}
+def actualizar_pesos():
+    """Carga en los grafos los pesos más recientes de la topología (mediciones o referencia)"""
+    latencia, ancho_banda = topologia.grafos()
+    grafo_latencia.update(latencia)
+    grafo_ancho_banda.update(ancho_banda)
 
-# Implementación del algoritmo de Dijkstra
-def dijkstra(grafo, inicio, fin, use_latency=True):
+def ejecutar_envio(enviar, tamano, mensaje, ip_destino, progress_var=None, status_label=None, que="archivo"):
     """
-    Implementación del algoritmo de Dijkstra para encontrar la ruta más corta.
+    Ejecuta un envío mostrando su progreso y su resultado en la interfaz.
     
     Args:
-        grafo: Diccionario de diccionarios con pesos (latencia o ancho de banda)
-        inicio: Nodo inicial
-        fin: Nodo final
-        use_latency: Si True, minimiza latencia; si False, maximiza ancho de banda
-        
+        enviar: Función que hace el envío; recibe la función de progreso
+            (bytes de cada bloque enviado) y lanza una excepción si falla
+        tamano: Bytes a enviar, para la barra de progreso
+        mensaje: Texto de estado al empezar
+        ip_destino: IP del nodo destino
+        progress_var: Variable de tkinter para actualizar progreso
+        status_label: Label de tkinter para actualizar estado
+        que: "archivo" o "directorio", para los mensajes
+    
     Returns:
-        Distancia total y lista de nodos que forman la ruta
+        Tiempo de transferencia en segundos (0 si falló)
     """
-    # Para ancho de banda, invertimos el problema para maximizar
-    if not use_latency:
-        # Crear una copia del grafo con valores inversos para maximizar ancho de banda
-        grafo_invertido = {}
-        for u in grafo:
-            grafo_invertido[u] = {}
-            for v, peso in grafo[u].items():
-                # Usamos el inverso del ancho de banda
-                grafo_invertido[u][v] = 1.0 / peso if peso > 0 else float('inf')
-        grafo = grafo_invertido
-    
-    # Inicializar
-    distancias = {nodo: float('inf') for nodo in grafo}
-    distancias[inicio] = 0
-    visitados = set()
-    padres = {nodo: None for nodo in grafo}
-    cola_prioridad = [(0, inicio)]
-    
-    while cola_prioridad:
-        # Obtener el nodo de menor distancia
-        distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
-        
-        # Si llegamos al destino, terminamos
-        if nodo_actual == fin:
-            break
-            
-        # Si ya visitamos el nodo, continuamos
-        if nodo_actual in visitados:
-            continue
+    inicio = time.time()
+    
+    try:
+        if status_label:
+            status_label.config(text=mensaje)
+        
+        bytes_enviados = [0]
+        
+        def actualizar_progreso(n_bytes):
+            bytes_enviados[0] += n_bytes
             
-        # Marcar como visitado
-        visitados.add(nodo_actual)
-        
-        # Explorar vecinos
-        for vecino, peso in grafo[nodo_actual].items():
-            # Si el vecino no ha sido visitado
-            if vecino not in visitados:
-                nueva_distancia = distancia_actual + peso
-                # Si encontramos un camino más corto
-                if nueva_distancia < distancias[vecino]:
-                    distancias[vecino] = nueva_distancia
-                    padres[vecino] = nodo_actual
-                    heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
-    
-    # Reconstruir el camino
-    ruta = []
-    nodo_actual = fin
-    while nodo_actual is not None:
-        ruta.append(nodo_actual)
-        nodo_actual = padres[nodo_actual]
-    ruta.reverse()
-    
-    # Si no hay ruta
-    if not ruta or ruta[0] != inicio:
-        return float('inf'), []
-    
-    # Calcular el valor real (latencia total o ancho de banda mínimo)
-    if use_latency:
-        valor_total = distancias[fin]
-    else:
-        # Para ancho de banda, calculamos el cuello de botella (mínimo ancho de banda en la ruta)
-        grafo_original = grafo_ancho_banda
-        ancho_minimo = float('inf')
-        for i in range(len(ruta) - 1):
-            ancho = grafo_original[ruta[i]][ruta[i+1]]
-            ancho_minimo = min(ancho_minimo, ancho)
-        valor_total = ancho_minimo
-    
-    return valor_total, ruta
+            # Actualizar barra de progreso
+            if progress_var and tamano:
+                progress_var.set(bytes_enviados[0] / tamano * 100)
+                if status_label:
+                    status_label.config(text=f"Enviando: {bytes_enviados[0]}/{tamano} bytes ({bytes_enviados[0]/tamano*100:.1f}%)")
+        
+        enviar(actualizar_progreso)
+        
+        tiempo_total = time.time() - inicio
+        
+        if status_label:
+            status_label.config(text=f"{que.capitalize()} enviado correctamente a {nodos[ip_destino]} en {tiempo_total:.2f} segundos")
+        
+        return tiempo_total
+        
+    except Exception as e:
+        if status_label:
+            status_label.config(text=f"Error al enviar {que}: {e}")
+        return 0
+
+def enviar_directo(archivo, ip_destino, al_enviar=None):
+    """
+    Envía un archivo directamente al receptor por una sola conexión.
+    
+    Raises:
+        Exception: Si el envío falla o el receptor no confirma el archivo completo
+    """
+    # Crear una conexión directa al receptor
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.connect((ip_destino, PUERTO_RECEPTOR))
+        
+        # Obtener tamaño del archivo
+        tamano = os.path.getsize(archivo)
+        
+        # Crear metadatos
+        metadata = json.dumps({
+            'nombre': os.path.basename(archivo),
+            'tamano': tamano,
+            'espera_respuesta': True
+        }).encode()
+        
+        # Enviar longitud del JSON (10 bytes)
+        s.sendall(f"{len(metadata):<10}".encode())
+        
+        # Enviar metadatos
+        s.sendall(metadata)
+        
+        # Enviar archivo (sin copias en espacio de usuario si hay sendfile)
+        with open(archivo, 'rb') as f:
+            enviar_rango(s, f, 0, tamano, al_enviar)
+        
+        if not recibir_mensaje(s).get('completo'):
+            raise Exception("El receptor no confirmó el archivo completo")
+
+def enviar_por_nodos(archivo, ruta, al_enviar=None):
+    """
+    Envía un archivo a través de los nodos principales de la ruta.
+    
+    Los nodos intermedios viajan en los metadatos para que cada nodo
+    principal reenvíe al siguiente salto de la ruta. Se espera la
+    confirmación del receptor final, así una caída más adelante en la ruta
+    también hace probar las rutas de respaldo.
+    
+    Raises:
+        Exception: Si el envío falla o el receptor no confirma el archivo completo
+    """
+    paquete = {'nombre': os.path.basename(archivo), 'espera_respuesta': True}
+    respuesta = emisor.enviar_segmento(ruta, archivo, 0, os.path.getsize(archivo), paquete, al_enviar)
+    if not respuesta.get('completo'):
+        raise Exception("El receptor no confirmó el archivo completo")
 
 # Función para enviar un archivo a través de un nodo intermediario
-def enviar_archivo_por_ruta(archivo, ip_origen, ruta, progress_var=None, status_label=None):
+def enviar_archivo_por_ruta(archivo, ip_origen, ruta, progress_var=None, status_label=None, flujos=None,
+                            compresion=None):
     """
     Envía un archivo siguiendo una ruta específica.
     
@@ -138,6 +147,10 @@ def enviar_archivo_por_ruta(archivo, ip_origen, ruta, progress_var=None, status_
         ruta: Lista de IPs que forman la ruta
         progress_var: Variable de tkinter para actualizar progreso
         status_label: Label de tkinter para actualizar estado
+        flujos: Conexiones TCP paralelas; si es None se calcula con el
+            producto ancho de banda-retardo de la ruta
+        compresion: Codec de compresión; si es None se elige según el ancho
+            de banda de la ruta y una muestra del archivo (puede no comprimir)
     
     Returns:
         Tiempo de transferencia en segundos
@@ -149,95 +162,68 @@ def enviar_archivo_por_ruta(archivo, ip_origen, ruta, progress_var=None, status_
     
     ip_destino = ruta[-1]
     
-    # Si es una transferencia directa (solo origen y destino)
+    # Un directorio viaja por el servicio multiplexado: sus archivos pequeños en lotes
+    # por una conexión persistente con cada salto, y el receptor recrea el árbol
+    if os.path.isdir(archivo):
+        def enviar_directorio(actualizar_progreso):
+            resultados = enviar_archivos(ruta, [archivo], actualizar_progreso)
+            fallidos = [nombre for nombre, respuesta in resultados if not respuesta.get('completo')]
+            if fallidos:
+                raise Exception(f"{len(fallidos)} envíos no llegaron, el primero {fallidos[0]}")
+        
+        tamano = sum(tamano or 0 for _, _, tamano in recorrer_directorio(archivo))
+        return ejecutar_envio(enviar_directorio, tamano,
+                              f"Enviando directorio a {nodos[ip_destino]} por la ruta: {' -> '.join([nodos[ip] for ip in ruta])}",
+                              ip_destino, progress_var, status_label, que="directorio")
+    
+    tamano = os.path.getsize(archivo)
+    latencia_ruta = sum(grafo_latencia[ruta[i]][ruta[i+1]] for i in range(len(ruta) - 1))
+    ancho_ruta = min(grafo_ancho_banda[ruta[i]][ruta[i+1]] for i in range(len(ruta) - 1))
+    if flujos is None:
+        flujos = emisor.flujos_paralelos(ancho_ruta, latencia_ruta, tamano)
+    
+    # En enlaces lentos comprimir al vuelo puede acelerar el envío
+    if compresion is None:
+        compresion = emisor.elegir_codec(archivo, ancho_ruta)
+    
+    # Directa (solo origen y destino) o a través de los nodos intermedios; todos los
+    # modos informan el progreso y esperan la confirmación del receptor final
     if len(ruta) == 2:
-        inicio = time.time()
-        
-        try:
-            if status_label:
-                status_label.config(text=f"Enviando archivo directamente a {nodos[ip_destino]}...")
-            
-            # Crear una conexión directa al receptor
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((ip_destino, PUERTO_RECEPTOR))
-                
-                # Obtener tamaño del archivo
-                tamano = os.path.getsize(archivo)
-                
-                # Crear metadatos
-                metadata = json.dumps({
-                    'nombre': os.path.basename(archivo),
-                    'tamano': tamano
-                }).encode()
-                
-                # Enviar longitud del JSON (10 bytes)
-                s.sendall(f"{len(metadata):<10}".encode())
-                
-                # Enviar metadatos
-                s.sendall(metadata)
-                
-                # Enviar archivo
-                bytes_enviados = 0
-                with open(archivo, 'rb') as f:
-                    while True:
-                        chunk = f.read(BUFFER_SIZE)
-                        if not chunk:
-                            break
-                        s.sendall(chunk)
-                        bytes_enviados += len(chunk)
-                        
-                        # Actualizar barra de progreso
-                        if progress_var:
-                            progress_var.set(bytes_enviados / tamano * 100)
-                            status_label.config(text=f"Enviando: {bytes_enviados}/{tamano} bytes ({bytes_enviados/tamano*100:.1f}%)")
-                            status_label.update()
-                
-            fin = time.time()
-            tiempo_total = fin - inicio
-            
-            if status_label:
-                status_label.config(text=f"Archivo enviado correctamente a {nodos[ip_destino]} en {tiempo_total:.2f} segundos")
-            
-            return tiempo_total
-            
-        except Exception as e:
-            if status_label:
-                status_label.config(text=f"Error al enviar archivo: {e}")
-            return 0
+        por = f"directamente a {nodos[ip_destino]}"
+    else:
+        por = f"a {nodos[ip_destino]} a través de la ruta: {' -> '.join([nodos[ip] for ip in ruta])}"
+    
+    # Transferencia comprimida
+    if compresion:
+        def enviar(actualizar_progreso):
+            if not emisor.enviar_archivo_comprimido(ruta, archivo, compresion, actualizar_progreso, confirmar=True):
+                raise Exception("No se pudo enviar el archivo comprimido")
+        mensaje = f"Enviando archivo {por} comprimido con {compresion}..."
+    
+    elif flujos > 1:
+        def enviar(actualizar_progreso):
+            if not emisor.enviar_archivo_paralelo(ruta, archivo, flujos, actualizar_progreso, confirmar=True):
+                raise Exception("No se pudieron enviar todos los flujos")
+        mensaje = f"Enviando archivo {por} en {flujos} flujos paralelos..."
+    
+    elif len(ruta) == 2:
+        def enviar(actualizar_progreso):
+            enviar_directo(archivo, ip_destino, actualizar_progreso)
+        mensaje = f"Enviando archivo {por}..."
     
     # Si la transferencia requiere nodos intermedios
     else:
-        inicio = time.time()
-        
-        try:
-            if status_label:
-                status_label.config(text=f"Enviando archivo a {nodos[ip_destino]} a través de la ruta: {' -> '.join([nodos[ip] for ip in ruta])}")
-            
-            # Usar el script nodos.py para enviar al primer nodo de la ruta
-            ip_primer_nodo = ruta[1]  # El siguiente después del origen
-            
-            # Comando para ejecutar el script nodos.py
-            comando = ["python", "nodos.py", ip_primer_nodo, ip_destino, archivo]
-            
-            # Ejecutar el comando
-            proceso = subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            salida, error = proceso.communicate()
-            
-            if proceso.returncode != 0:
-                raise Exception(f"Error en el script nodos.py: {error.decode()}")
-            
-            fin = time.time()
-            tiempo_total = fin - inicio
-            
-            if status_label:
-                status_label.config(text=f"Archivo enviado correctamente a {nodos[ip_destino]} en {tiempo_total:.2f} segundos")
-            
-            return tiempo_total
-            
-        except Exception as e:
-            if status_label:
-                status_label.config(text=f"Error al enviar archivo: {e}")
-            return 0
+        def enviar(actualizar_progreso):
+            enviar_por_nodos(archivo, ruta, actualizar_progreso)
+        mensaje = f"Enviando archivo {por}"
+    
+    tiempo_total = ejecutar_envio(enviar, tamano, mensaje, ip_destino, progress_var, status_label)
+    
+    # Sin compresión, el envío directo ocupó el enlace: sirve como muestra de su ancho de banda
+    if tiempo_total > 0 and len(ruta) == 2 and not compresion:
+        registrar_transferencia(ip_origen, ip_destino, tamano, tiempo_total)
+    
+    return tiempo_total
 
 # Interfaz gráfica
 class FileTransferGUI:
@@ -256,8 +242,9 @@ class FileTransferGUI:
         # Variables
         self.archivo_seleccionado = None
         self.ip_destino = tk.StringVar()
-        self.usar_latencia = tk.BooleanVar(value=True)
+        self.criterio = tk.StringVar(value="latencia")
         self.ruta_optima = []
+        self.rutas_respaldo = []
         self.progreso = tk.DoubleVar()
         
         # Frame principal
@@ -276,6 +263,7 @@ class FileTransferGUI:
         self.archivo_label = ttk.Label(top_frame, text="Ningún archivo seleccionado")
         self.archivo_label.grid(row=1, column=1, sticky=tk.W, pady=5)
         ttk.Button(top_frame, text="Seleccionar", command=self.seleccionar_archivo).grid(row=1, column=2, padx=5)
+        ttk.Button(top_frame, text="Carpeta", command=self.seleccionar_carpeta).grid(row=1, column=3, padx=5)
         
         # Selección de destino
         ttk.Label(top_frame, text="Nodo destino:").grid(row=2, column=0, sticky=tk.W, pady=5)
@@ -286,11 +274,12 @@ class FileTransferGUI:
         
         # Opciones de optimización
         ttk.Label(top_frame, text="Optimizar por:").grid(row=3, column=0, sticky=tk.W, pady=5)
-        ttk.Radiobutton(top_frame, text="Latencia (más rápido)", variable=self.usar_latencia, value=True).grid(row=3, column=1, sticky=tk.W, pady=2)
-        ttk.Radiobutton(top_frame, text="Ancho de banda (mayor capacidad)", variable=self.usar_latencia, value=False).grid(row=4, column=1, sticky=tk.W, pady=2)
+        ttk.Radiobutton(top_frame, text="Latencia (más rápido)", variable=self.criterio, value="latencia").grid(row=3, column=1, sticky=tk.W, pady=2)
+        ttk.Radiobutton(top_frame, text="Ancho de banda (mayor capacidad)", variable=self.criterio, value="ancho_banda").grid(row=4, column=1, sticky=tk.W, pady=2)
+        ttk.Radiobutton(top_frame, text="Tiempo estimado (según tamaño del archivo)", variable=self.criterio, value="tiempo").grid(row=5, column=1, sticky=tk.W, pady=2)
         
         # Botón para calcular ruta
-        ttk.Button(top_frame, text="Calcular Ruta Óptima", command=self.calcular_ruta).grid(row=5, column=0, columnspan=3, pady=10)
+        ttk.Button(top_frame, text="Calcular Ruta Óptima", command=self.calcular_ruta).grid(row=6, column=0, columnspan=3, pady=10)
         
         # Frame para visualización de la ruta
         self.ruta_frame = ttk.LabelFrame(main_frame, text="Ruta Calculada", padding=10)
@@ -314,6 +303,7 @@ class FileTransferGUI:
         button_frame.pack(fill=tk.X, pady=5)
         ttk.Button(button_frame, text="Transferir por Ruta Óptima", command=self.transferir_optima).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Transferir Directamente", command=self.transferir_directa).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Transferir por Múltiples Rutas", command=self.transferir_multiruta).pack(side=tk.LEFT, padx=5)
         
         # Barra de progreso
         self.progress = ttk.Progressbar(self.transfer_frame, variable=self.progreso, maximum=100)
@@ -392,6 +382,15 @@ class FileTransferGUI:
             tamano_str = self.formatear_tamano(tamano)
             self.archivo_label.config(text=f"{nombre_archivo} ({tamano_str})")
     
+    def seleccionar_carpeta(self):
+        """Abre un diálogo para seleccionar un directorio completo"""
+        carpeta = filedialog.askdirectory()
+        if carpeta:
+            self.archivo_seleccionado = carpeta
+            archivos = [tamano for _, _, tamano in recorrer_directorio(carpeta) if tamano is not None]
+            tamano_str = self.formatear_tamano(sum(archivos))
+            self.archivo_label.config(text=f"{os.path.basename(carpeta)}/ ({len(archivos)} archivos, {tamano_str})")
+    
     def formatear_tamano(self, tamano):
         """Formatea el tamaño en bytes a una representación más legible"""
         for unidad in ['B', 'KB', 'MB', 'GB']:
@@ -421,11 +420,24 @@ class FileTransferGUI:
             messagebox.showwarning("Advertencia", "Seleccione un nodo destino válido")
             return
         
-        # Grafo a usar según la optimización seleccionada
-        grafo_usado = grafo_latencia if self.usar_latencia.get() else grafo_ancho_banda
+        criterio = self.criterio.get()
         
-        # Calcular ruta con Dijkstra
-        valor, ruta = dijkstra(grafo_usado, self.ip_local, ip_destino, self.usar_latencia.get())
+        # Usar los pesos medidos más recientes
+        actualizar_pesos()
+        
+        if criterio == "tiempo":
+            # Rutas candidatas ordenadas por tiempo estimado para el tamaño del archivo
+            # (las candidatas se reutilizan de la caché mientras no cambien los pesos)
+            if os.path.isdir(self.archivo_seleccionado):
+                tamano = sum(tamano or 0 for _, _, tamano in recorrer_directorio(self.archivo_seleccionado))
+            else:
+                tamano = os.path.getsize(self.archivo_seleccionado)
+            candidatas = rutas_por_tiempo(self.ip_local, ip_destino, tamano)
+            ruta = candidatas[0][1] if candidatas else []
+        else:
+            # Ruta precalculada en la tabla de rutas (al cambiar los pesos sólo
+            # se recalculan las rutas afectadas)
+            valor, ruta = tabla_rutas_compartida().ruta(self.ip_local, ip_destino, criterio)
         
         # Mostrar información de la ruta
         if not ruta:
@@ -434,17 +446,36 @@ class FileTransferGUI:
         
         self.ruta_optima = ruta
         
+        # Rutas de respaldo calculadas de antemano: si la óptima falla al
+        # transferir, se pasa a la siguiente sin recalcular
+        if criterio == "tiempo":
+            respaldo = [ruta_candidata for _, ruta_candidata, _, _ in candidatas]
+        else:
+            respaldo = [ruta_alternativa for _, ruta_alternativa in rutas_alternativas(self.ip_local, ip_destino, criterio)]
+        self.rutas_respaldo = [ruta_alternativa for ruta_alternativa in respaldo if ruta_alternativa != ruta]
+        
         # Mostrar información
-        if self.usar_latencia.get():
+        if criterio == "latencia":
             self.info_ruta.config(
                 text=f"Ruta óptima: {' -> '.join([nodos[ip] for ip in ruta])}\n"
                 f"Latencia total: {valor} ms"
             )
-        else:
+        elif criterio == "ancho_banda":
             self.info_ruta.config(
                 text=f"Ruta óptima: {' -> '.join([nodos[ip] for ip in ruta])}\n"
                 f"Ancho de banda mínimo: {valor} Mbps"
             )
+        else:
+            # Mostrar las mejores candidatas con su tiempo estimado
+            lineas = [
+                f"{i + 1}. {' -> '.join([nodos[ip] for ip in ruta_candidata])}: "
+                f"{tiempo:.2f} s ({latencia} ms, {cuello} Mbps)"
+                for i, (tiempo, ruta_candidata, latencia, cuello) in enumerate(candidatas[:3])
+            ]
+            self.info_ruta.config(
+                text=f"Ruta óptima para {self.formatear_tamano(tamano)}: {' -> '.join([nodos[ip] for ip in ruta])}\n"
+                + "\n".join(lineas)
+            )
         
         # Visualizar la ruta en el grafo
         self.visualizar_ruta(ruta)
@@ -462,7 +493,8 @@ class FileTransferGUI:
             G.add_node(ip, label=f"{nombre}\n({ip})")
         
         # Agregar todas las aristas con sus pesos
-        grafo_usado = grafo_latencia if self.usar_latencia.get() else grafo_ancho_banda
+        criterio = self.criterio.get()
+        grafo_usado = grafo_ancho_banda if criterio == "ancho_banda" else grafo_latencia
         for u in grafo_usado:
             for v, peso in grafo_usado[u].items():
                 G.add_edge(u, v, weight=peso)
@@ -490,9 +522,12 @@ class FileTransferGUI:
         edge_labels = {}
         for i in range(len(ruta)-1):
             u, v = ruta[i], ruta[i+1]
-            weight = grafo_usado[u][v]
-            unit = "ms" if self.usar_latencia.get() else "Mbps"
-            edge_labels[(u, v)] = f"{weight} {unit}"
+            if criterio == "tiempo":
+                edge_labels[(u, v)] = f"{grafo_latencia[u][v]} ms / {grafo_ancho_banda[u][v]} Mbps"
+            else:
+                weight = grafo_usado[u][v]
+                unit = "ms" if criterio == "latencia" else "Mbps"
+                edge_labels[(u, v)] = f"{weight} {unit}"
         
         nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=8, ax=ax)
         
@@ -543,6 +578,54 @@ class FileTransferGUI:
             args=(self.archivo_seleccionado, self.ip_local, ruta_directa, False)
         ).start()
     
+    def transferir_multiruta(self):
+        """Inicia la transferencia del archivo repartido en franjas por varias rutas"""
+        if not self.archivo_seleccionado:
+            messagebox.showwarning("Advertencia", "Seleccione un archivo primero")
+            return
+        
+        if os.path.isdir(self.archivo_seleccionado):
+            messagebox.showwarning("Advertencia", "Un directorio se envía por una sola ruta (óptima o directa)")
+            return
+            
+        ip_destino = self.obtener_ip_destino()
+        if not ip_destino:
+            messagebox.showwarning("Advertencia", "Seleccione un nodo destino válido")
+            return
+        
+        # Resetear progreso
+        self.progreso.set(0)
+        
+        threading.Thread(
+            target=self._transferir_multiruta_y_actualizar,
+            args=(self.archivo_seleccionado, self.ip_local, ip_destino)
+        ).start()
+    
+    def _transferir_multiruta_y_actualizar(self, archivo, ip_origen, ip_destino):
+        """Transfiere el archivo por rutas sin aristas en común y actualiza la interfaz"""
+        nombre_archivo = os.path.basename(archivo)
+        actualizar_pesos()
+        # Rutas sin nodos principales en común, para que ninguno cargue con dos franjas
+        rutas = rutas_disjuntas_optimas(ip_origen, ip_destino, 'ancho_banda', nodos_disjuntos=True)
+        franjas = emisor.repartir_franjas(os.path.getsize(archivo), rutas)
+        
+        self.status_label.config(text=f"Enviando {nombre_archivo} en {len(franjas)} franjas por rutas paralelas...")
+        
+        inicio = time.time()
+        if not emisor.enviar_archivo_multiruta(rutas, archivo):
+            self.status_label.config(text="Error al enviar el archivo por múltiples rutas")
+            return
+        tiempo = time.time() - inicio
+        
+        self.progreso.set(100)
+        self.status_label.config(text=f"Archivo enviado por {len(franjas)} rutas en {tiempo:.2f} segundos")
+        
+        descripcion_rutas = " | ".join(" -> ".join(nodos[ip] for ip in ruta) for ruta, _, _ in franjas)
+        self.tree.insert("", "end", values=(f"Multiruta: {descripcion_rutas}", f"{tiempo:.2f}", ""))
+        
+        messagebox.showinfo("Transferencia Completada",
+                           f"Archivo {nombre_archivo} transferido por {len(franjas)} rutas en {tiempo:.2f} segundos")
+    
     def _transferir_y_actualizar(self, archivo, ip_origen, ruta, es_optima):
         """Transfiere el archivo y actualiza la interfaz"""
         tipo_ruta = "óptima" if es_optima else "directa"
@@ -557,6 +640,20 @@ class FileTransferGUI:
             status_label=self.status_label
         )
         
+        # Si la ruta óptima falló, probar las rutas de respaldo en orden
+        if tiempo <= 0 and es_optima:
+            for ruta_respaldo in self.rutas_respaldo:
+                self.progreso.set(0)
+                self.status_label.config(text=f"Ruta fallida; reintentando por {' -> '.join([nodos[ip] for ip in ruta_respaldo])}...")
+                tiempo = enviar_archivo_por_ruta(
+                    archivo, ip_origen, ruta_respaldo,
+                    progress_var=self.progreso,
+                    status_label=self.status_label
+                )
+                if tiempo > 0:
+                    ruta = ruta_respaldo
+                    break
+        
         if tiempo > 0:
             # Descripción de la ruta
             descripcion_ruta = f"{' -> '.join([nodos[ip] for ip in ruta])}"
@@ -1,110 +1,31 @@
-import networkx as nx
-import matplotlib.pyplot as plt
-import pandas as pd
-import heapq
-
-# Definir los datos de la red
-nodos = {
-    '100.101.1.1': 'Marco',
-    '100.101.1.2': 'Poncho',
-    '100.101.1.3': 'Alberto',
-    '100.101.1.4': 'Raúl'
-}
-
-# Crear el grafo de ancho de banda (Mbps)
-# como queremos maximizar el ancho de banda, usaremos el valor negativo
-# para que al ordenar de menor a mayor, obtengamos los anchos de banda mayores primero
-grafo_ancho_banda = {
-    '100.101.1.1': {'100.101.1.2': 23.2, '100.101.1.3': 23.1, '100.101.1.4': 26.2},
-    '100.101.1.2': {'100.101.1.1': 80.0, '100.101.1.3': 3.95, '100.101.1.4': 11.3},
-    '100.101.1.3': {'100.101.1.1': 22.0, '100.101.1.2': 2.08, '100.101.1.4': 21.7},
-    '100.101.1.4': {'100.101.1.1': 83.1, '100.101.1.2': 4.58, '100.101.1.3': 6.46}
-}
-
-# Tabla de latencias (ms) para referencia
-grafo_latencia = {
-    '100.101.1.1': {'100.101.1.2': 109, '100.101.1.3': 199, '100.101.1.4': 75},
-    '100.101.1.2': {'100.101.1.1': 78, '100.101.1.3': 78, '100.101.1.4': 275},
-    '100.101.1.3': {'100.101.1.1': 56, '100.101.1.2': 117, '100.101.1.4': 174},
-    '100.101.1.4': {'100.101.1.1': 115, '100.101.1.2': 115, '100.101.1.3': 205}
-}
+import sys
+from topologia import topologia_compartida
+from arbol_expansion import (arbol_expansion, configuracion_enrutamiento, guardar_configuracion,
+                             SIMETRIZACIONES, ARCHIVO_CONFIGURACION)
 
 # Función de Kruskal para encontrar el árbol de expansión máxima (maximizando ancho de banda)
-def kruskal_max_bandwidth(grafo):
+def kruskal_max_bandwidth(grafo, simetrizacion='max', max_grado=None, max_diametro=None):
     """
     Implementación del algoritmo de Kruskal para encontrar el árbol de expansión máxima.
     Maximiza el ancho de banda total.
     
     Args:
-        grafo: Diccionario de diccionarios con los anchos de banda
+        grafo: Diccionario de diccionarios con los anchos de banda, o un GrafoCSR
+        simetrizacion: Cómo combinar las mediciones de las dos direcciones de
+            cada enlace: 'min', 'media' o 'max'
+        max_grado: Máximo de vecinos de cada nodo en el árbol (None = sin límite)
+        max_diametro: Máximo de saltos entre dos nodos del árbol (None = sin límite)
         
     Returns:
         Un conjunto de aristas que forman el MST
     """
-    # Convertir el grafo en una lista de aristas (u, v, ancho_banda)
-    aristas = []
-    for u in grafo:
-        for v, ancho_banda in grafo[u].items():
-            # Solo incluimos una arista por cada par de nodos (la de mayor ancho de banda)
-            # Verificamos si ya existe la arista inversa con mayor ancho de banda
-            existe_inversa = False
-            for idx, (u_existente, v_existente, banda_existente) in enumerate(aristas):
-                if (u_existente == v and v_existente == u):
-                    existe_inversa = True
-                    if ancho_banda > banda_existente:
-                        aristas[idx] = (u, v, ancho_banda)
-                    break
-            
-            if not existe_inversa:
-                aristas.append((u, v, ancho_banda))
-    
-    # Ordenar aristas por ancho de banda (de mayor a menor)
-    aristas.sort(key=lambda x: x[2], reverse=True)
-    
-    # Conjunto de nodos
-    nodos_set = set(grafo.keys())
-    
-    # Inicializar estructura para Union-Find
-    padre = {nodo: nodo for nodo in nodos_set}
-    rango = {nodo: 0 for nodo in nodos_set}
-    
-    # Función para encontrar el representante (líder) de un conjunto
-    def encontrar(nodo):
-        if padre[nodo] != nodo:
-            padre[nodo] = encontrar(padre[nodo])  # Compresión de ruta
-        return padre[nodo]
-    
-    # Función para unir dos conjuntos
-    def unir(u, v):
-        raiz_u = encontrar(u)
-        raiz_v = encontrar(v)
-        
-        if raiz_u != raiz_v:
-            # Union by rank para mantener el árbol balanceado
-            if rango[raiz_u] < rango[raiz_v]:
-                padre[raiz_u] = raiz_v
-            else:
-                padre[raiz_v] = raiz_u
-                if rango[raiz_u] == rango[raiz_v]:
-                    rango[raiz_u] += 1
-    
-    # MST (Maximum Spanning Tree)
-    mst = []
-    
-    # Algoritmo de Kruskal (adaptado para maximizar)
-    for u, v, ancho_banda in aristas:
-        if encontrar(u) != encontrar(v):  # Si no forman un ciclo
-            unir(u, v)
-            mst.append((u, v, ancho_banda))
-            
-            # Detener cuando tengamos n-1 aristas (MST completo)
-            if len(mst) == len(nodos_set) - 1:
-                break
-                
-    return mst
+    return arbol_expansion(grafo, simetrizacion, True, max_grado, max_diametro)
 
 # Función para visualizar el grafo original y el MST
 def visualizar_grafos(grafo_original, mst, nodos_nombres):
+    import networkx as nx
+    import matplotlib.pyplot as plt
+    
     # Crear grafo original con NetworkX
     G_original = nx.Graph()
     
@@ -194,68 +115,106 @@ def visualizar_grafos(grafo_original, mst, nodos_nombres):
     
     return G_original, G_mst
 
-# Ejecutar el algoritmo de Kruskal para maximizar el ancho de banda
-mst = kruskal_max_bandwidth(grafo_ancho_banda)
+if __name__ == "__main__":
+    import pandas as pd
+    
+    argumentos = sys.argv[1:]
+    simetrizacion = 'max'
+    if '--simetria' in argumentos:
+        posicion = argumentos.index('--simetria')
+        simetrizacion = argumentos[posicion + 1]
+        del argumentos[posicion:posicion + 2]
+    max_grado = None
+    if '--max-grado' in argumentos:
+        posicion = argumentos.index('--max-grado')
+        max_grado = int(argumentos[posicion + 1])
+        del argumentos[posicion:posicion + 2]
+    max_diametro = None
+    if '--max-diametro' in argumentos:
+        posicion = argumentos.index('--max-diametro')
+        max_diametro = int(argumentos[posicion + 1])
+        del argumentos[posicion:posicion + 2]
+    guardar = '--configuracion' in argumentos
+    if guardar:
+        argumentos.remove('--configuracion')
+    if argumentos or simetrizacion not in SIMETRIZACIONES:
+        print("Uso: python Implementación_de_Kruskal.py [--simetria min|media|max] [--max-grado N] "
+              "[--max-diametro N] [--configuracion]")
+        sys.exit(1)
+    
+    # Datos de la red desde la topología compartida
+    topologia = topologia_compartida()
+    nodos = topologia.nodos()
+    
+    # Grafo de ancho de banda (Mbps) y tabla de latencias (ms) para referencia,
+    # con las mediciones recientes donde las hay
+    grafo_latencia, grafo_ancho_banda = topologia.grafos()
+    
+    # Ejecutar el algoritmo de Kruskal para maximizar el ancho de banda
+    mst = kruskal_max_bandwidth(grafo_ancho_banda, simetrizacion, max_grado, max_diametro)
+    
+    # Los nodos principales enrutan por el árbol los archivos enviados con --salto-a-salto arbol
+    if guardar:
+        guardar_configuracion(configuracion_enrutamiento(list(nodos), mst, simetrizacion=simetrizacion,
+                                                         max_grado=max_grado, max_diametro=max_diametro))
+        print(f"Configuración de enrutamiento por el árbol guardada en '{ARCHIVO_CONFIGURACION}'")
 
-# Mostrar resultado
-print("Árbol de Expansión Mínima (MST) - Minimizar Ancho de Banda:")
-total_ancho_banda = 0
-for u, v, ancho_banda in mst:
-    print(f"Conexión: {nodos[u]} ({u}) -- {nodos[v]} ({v}), Ancho de Banda: {ancho_banda} Mbps")
-    total_ancho_banda += ancho_banda
-print(f"Ancho de banda total del MST: {total_ancho_banda} Mbps")
+    # Mostrar resultado
+    print("Árbol de Expansión Mínima (MST) - Minimizar Ancho de Banda:")
+    total_ancho_banda = 0
+    for u, v, ancho_banda in mst:
+        print(f"Conexión: {nodos[u]} ({u}) -- {nodos[v]} ({v}), Ancho de Banda: {ancho_banda} Mbps")
+        total_ancho_banda += ancho_banda
+    print(f"Ancho de banda total del MST: {total_ancho_banda} Mbps")
 
-# Visualizar los grafos
-G_original, G_mst = visualizar_grafos(grafo_ancho_banda, mst, nodos)
+    # Visualizar los grafos
+    G_original, G_mst = visualizar_grafos(grafo_ancho_banda, mst, nodos)
 
-# Análisis de eficiencia
-# Para el grafo original, sumamos el ancho de banda máximo entre cada par de nodos
-ancho_banda_original = 0
-aristas_procesadas = set()
-for u in grafo_ancho_banda:
-    for v, ancho_banda in grafo_ancho_banda[u].items():
-        if (u, v) not in aristas_procesadas and (v, u) not in aristas_procesadas:
-            ancho_banda_inverso = grafo_ancho_banda.get(v, {}).get(u, 0)
-            ancho_banda_original += max(ancho_banda, ancho_banda_inverso)
-            aristas_procesadas.add((u, v))
+    # Análisis de eficiencia
+    # Para el grafo original, sumamos el ancho de banda máximo entre cada par de nodos
+    ancho_banda_original = 0
+    aristas_procesadas = set()
+    for u in grafo_ancho_banda:
+        for v, ancho_banda in grafo_ancho_banda[u].items():
+            if (u, v) not in aristas_procesadas and (v, u) not in aristas_procesadas:
+                ancho_banda_inverso = grafo_ancho_banda.get(v, {}).get(u, 0)
+                ancho_banda_original += max(ancho_banda, ancho_banda_inverso)
+                aristas_procesadas.add((u, v))
 
-# Porcentaje de eficiencia
-porcentaje_eficiencia = (total_ancho_banda / ancho_banda_original) * 100
+    # Porcentaje de eficiencia
+    porcentaje_eficiencia = (total_ancho_banda / ancho_banda_original) * 100
 
-print(f"\nAnálisis de Eficiencia:")
-print(f"Ancho de banda total de todas las conexiones originales: {ancho_banda_original} Mbps")
-print(f"Ancho de banda total del MST: {total_ancho_banda} Mbps")
-print(f"Eficiencia del MST: {porcentaje_eficiencia:.2f}% del ancho de banda original")
-print(f"Reducción de conexiones: {len(grafo_ancho_banda) * (len(grafo_ancho_banda) - 1) // 2 - len(mst)} conexiones eliminadas")
+    print(f"\nAnálisis de Eficiencia:")
+    print(f"Ancho de banda total de todas las conexiones originales: {ancho_banda_original} Mbps")
+    print(f"Ancho de banda total del MST: {total_ancho_banda} Mbps")
+    print(f"Eficiencia del MST: {porcentaje_eficiencia:.2f}% del ancho de banda original")
+    print(f"Reducción de conexiones: {len(grafo_ancho_banda) * (len(grafo_ancho_banda) - 1) // 2 - len(mst)} conexiones eliminadas")
 
-# Generar tabla comparativa entre topología original y MST
-tabla_comparativa = []
-for nodo_origen in nodos:
-    for nodo_destino in nodos:
-        if nodo_origen != nodo_destino:
-            # Verificar si esta conexión existe en el MST
-            esta_en_mst = False
-            for u, v, _ in mst:
-                if (u == nodo_origen and v == nodo_destino) or (u == nodo_destino and v == nodo_origen):
-                    esta_en_mst = True
-                    break
+    # Generar tabla comparativa entre topología original y MST
+    tabla_comparativa = []
+    aristas_mst = {frozenset((u, v)) for u, v, _ in mst}
+    for nodo_origen in nodos:
+        for nodo_destino in nodos:
+            if nodo_origen != nodo_destino:
+                # Verificar si esta conexión existe en el MST (en cualquier dirección)
+                esta_en_mst = frozenset((nodo_origen, nodo_destino)) in aristas_mst
             
-            # Agregar a la tabla
-            tabla_comparativa.append({
-                'Origen': nodos[nodo_origen],
-                'IP Origen': nodo_origen,
-                'Destino': nodos[nodo_destino],
-                'IP Destino': nodo_destino,
-                'Ancho de Banda (Mbps)': grafo_ancho_banda[nodo_origen][nodo_destino],
-                'Latencia (ms)': grafo_latencia[nodo_origen][nodo_destino],
-                'En MST': 'Sí' if esta_en_mst else 'No'
-            })
+                # Agregar a la tabla
+                tabla_comparativa.append({
+                    'Origen': nodos[nodo_origen],
+                    'IP Origen': nodo_origen,
+                    'Destino': nodos[nodo_destino],
+                    'IP Destino': nodo_destino,
+                    'Ancho de Banda (Mbps)': grafo_ancho_banda.get(nodo_origen, {}).get(nodo_destino),
+                    'Latencia (ms)': grafo_latencia.get(nodo_origen, {}).get(nodo_destino),
+                    'En MST': 'Sí' if esta_en_mst else 'No'
+                })
 
-# Convertir a DataFrame y mostrar
-df_comparativo = pd.DataFrame(tabla_comparativa)
-print("\nTabla Comparativa:")
-print(df_comparativo)
+    # Convertir a DataFrame y mostrar
+    df_comparativo = pd.DataFrame(tabla_comparativa)
+    print("\nTabla Comparativa:")
+    print(df_comparativo)
 
-# Guardar tabla como CSV
-df_comparativo.to_csv('comparativa_topologia.csv', index=False)
-print("Tabla comparativa guardada como 'comparativa_topologia.csv'")
\ No newline at end of file
+    # Guardar tabla como CSV
+    df_comparativo.to_csv('comparativa_topologia.csv', index=False)
+    print("Tabla comparativa guardada como 'comparativa_topologia.csv'")
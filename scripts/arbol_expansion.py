@@ -0,0 +1,430 @@
+import os
+import sys
+import json
+import heapq
+import threading
+from collections import deque
+from grafo import como_csr
+from topologia import topologia_compartida
+
+# Configuración de enrutamiento por el árbol que usan los nodos principales ('salto_a_salto': 'arbol')
+ARCHIVO_CONFIGURACION = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'arbol.json')
+
+# Cómo se combinan las mediciones de las dos direcciones de un enlace
+SIMETRIZACIONES = {
+    'min': min,
+    'max': max,
+    'media': lambda ida, vuelta: (ida + vuelta) / 2,
+}
+
+# Si cambian más enlaces a la vez, sale más barato recalcular el árbol entero
+MAX_CAMBIOS_INCREMENTALES = 32
+
+class UnionFind:
+    """Conjuntos disjuntos de nodos 0..n-1 (unión por rango y compresión de ruta)"""
+    def __init__(self, n):
+        self.padre = list(range(n))
+        self.rango = [0] * n
+
+    def encontrar(self, nodo):
+        padre = self.padre
+        while padre[nodo] != nodo:
+            padre[nodo] = padre[padre[nodo]]  # Compresión de ruta (a la mitad)
+            nodo = padre[nodo]
+        return nodo
+
+    def unir(self, u, v):
+        """Une los conjuntos de u y v; devuelve False si ya estaban unidos"""
+        raiz_u, raiz_v = self.encontrar(u), self.encontrar(v)
+        if raiz_u == raiz_v:
+            return False
+        if self.rango[raiz_u] < self.rango[raiz_v]:
+            raiz_u, raiz_v = raiz_v, raiz_u
+        self.padre[raiz_v] = raiz_u
+        if self.rango[raiz_u] == self.rango[raiz_v]:
+            self.rango[raiz_u] += 1
+        return True
+
+def aristas_simetricas(grafo, simetrizacion='max'):
+    """
+    Une las mediciones de las dos direcciones de cada enlace en una arista no dirigida.
+
+    Args:
+        grafo: Diccionario de diccionarios con los pesos dirigidos, o un GrafoCSR
+        simetrizacion: 'min', 'media' o 'max' (ver SIMETRIZACIONES); si sólo
+            hay medición en una dirección se usa ésa
+
+    Returns:
+        El grafo en formato CSR y la lista de (u, v, peso) con ids enteros y u < v
+    """
+    csr = como_csr(grafo)
+    return csr, csr.aristas_no_dirigidas(SIMETRIZACIONES[simetrizacion])
+
+def kruskal(grafo, simetrizacion='max', maximizar=True, max_grado=None):
+    """
+    Árbol de expansión máxima (o mínima) con el algoritmo de Kruskal, en O(E log E).
+
+    Con max_grado se descartan las aristas que dejarían a un nodo con más
+    vecinos de los permitidos. Encontrar el mejor árbol con grado acotado
+    es NP-difícil: este criterio voraz da un buen árbol, no necesariamente
+    el óptimo, y puede no conectar todos los nodos si el grado es muy bajo.
+
+    Args:
+        grafo: Diccionario de diccionarios con los pesos, o un GrafoCSR
+        simetrizacion: Cómo combinar las dos direcciones de cada enlace
+        maximizar: True para el árbol de mayor peso (ancho de banda),
+            False para el de menor peso (latencia)
+        max_grado: Máximo de vecinos de cada nodo en el árbol (None = sin límite)
+
+    Returns:
+        Lista de aristas (u, v, peso) del árbol, con las IPs de los nodos
+    """
+    csr, aristas = aristas_simetricas(grafo, simetrizacion)
+    aristas.sort(key=lambda arista: arista[2], reverse=maximizar)
+
+    num_nodos = csr.num_nodos()
+    conjuntos = UnionFind(num_nodos)
+    grado = [0] * num_nodos
+    arbol = []
+    for u, v, peso in aristas:
+        if max_grado is not None and (grado[u] >= max_grado or grado[v] >= max_grado):
+            continue
+        if conjuntos.unir(u, v):
+            grado[u] += 1
+            grado[v] += 1
+            arbol.append((csr.nodos[u], csr.nodos[v], peso))
+            if len(arbol) == num_nodos - 1:
+                break
+    return arbol
+
+def arbol_diametro_acotado(grafo, max_diametro, simetrizacion='max', maximizar=True, max_grado=None):
+    """
+    Árbol de expansión en el que ningún par de nodos queda a más de max_diametro saltos.
+
+    Un árbol de diámetro D tiene un centro (un nodo si D es par, una arista
+    si es impar) a no más de D // 2 saltos de todos los nodos. Para cada
+    centro posible el árbol crece como en Prim, tomando siempre la mejor
+    arista que no aleja a ningún nodo del centro más de ese radio (ni
+    supera max_grado), y se queda el mejor de todos los árboles. Es una
+    heurística: el problema exacto es NP-difícil.
+
+    Returns:
+        Lista de aristas (u, v, peso) del árbol, con las IPs de los nodos.
+        Si ningún centro permite conectar todos los nodos, el que más conecta.
+    """
+    csr, aristas = aristas_simetricas(grafo, simetrizacion)
+    num_nodos = csr.num_nodos()
+    vecinos = [[] for _ in range(num_nodos)]
+    for u, v, peso in aristas:
+        vecinos[u].append((v, peso))
+        vecinos[v].append((u, peso))
+    signo = -1 if maximizar else 1
+    radio = max_diametro // 2
+
+    def crecer(centro, inicial):
+        profundidad = {nodo: 0 for nodo in centro}
+        grado = [0] * num_nodos
+        arbol = list(inicial)
+        for u, v, _ in inicial:
+            grado[u] += 1
+            grado[v] += 1
+        cola = [(signo * peso, u, v) for u in centro for v, peso in vecinos[u] if v not in profundidad and radio > 0]
+        heapq.heapify(cola)
+        while cola and len(profundidad) < num_nodos:
+            costo, u, v = heapq.heappop(cola)
+            if v in profundidad or (max_grado is not None and (grado[u] >= max_grado or grado[v] >= max_grado)):
+                continue
+            profundidad[v] = profundidad[u] + 1
+            grado[u] += 1
+            grado[v] += 1
+            arbol.append((u, v, signo * costo))
+            if profundidad[v] < radio:
+                for w, peso in vecinos[v]:
+                    if w not in profundidad:
+                        heapq.heappush(cola, (signo * peso, v, w))
+        return arbol
+
+    if max_diametro % 2 == 0:
+        centros = [((nodo,), []) for nodo in range(num_nodos)]
+    else:
+        centros = [((u, v), [(u, v, peso)]) for u, v, peso in aristas]
+
+    def calidad(arbol):
+        # Primero los nodos conectados, después el peso total (mayor o menor según maximizar)
+        return len(arbol), -signo * sum(peso for _, _, peso in arbol)
+
+    mejor = []
+    for centro, inicial in centros:
+        if radio == 0 and len(centro) == 1:
+            continue
+        arbol = crecer(centro, inicial)
+        if calidad(arbol) > calidad(mejor):
+            mejor = arbol
+    return [(csr.nodos[u], csr.nodos[v], peso) for u, v, peso in mejor]
+
+def arbol_expansion(grafo, simetrizacion='max', maximizar=True, max_grado=None, max_diametro=None):
+    """Árbol de expansión con las restricciones indicadas (ver kruskal y arbol_diametro_acotado)"""
+    if max_diametro is not None:
+        return arbol_diametro_acotado(grafo, max_diametro, simetrizacion, maximizar, max_grado)
+    return kruskal(grafo, simetrizacion, maximizar, max_grado)
+
+def tabla_siguiente_salto(nodos, arbol):
+    """
+    Siguiente salto de cada nodo hacia cada destino siguiendo las aristas del árbol.
+
+    En un árbol hay un solo camino entre dos nodos: un recorrido en anchura
+    desde cada destino deja en el padre de cada nodo su siguiente salto.
+
+    Returns:
+        Diccionario {origen: {destino: siguiente salto}} (sólo nodos conectados)
+    """
+    vecinos = {nodo: [] for nodo in nodos}
+    for u, v, _ in arbol:
+        vecinos.setdefault(u, []).append(v)
+        vecinos.setdefault(v, []).append(u)
+    tabla = {nodo: {} for nodo in vecinos}
+    for destino in vecinos:
+        visitados = {destino}
+        cola = deque([destino])
+        while cola:
+            nodo = cola.popleft()
+            for vecino in vecinos[nodo]:
+                if vecino not in visitados:
+                    visitados.add(vecino)
+                    tabla[vecino][destino] = nodo
+                    cola.append(vecino)
+    return tabla
+
+def configuracion_enrutamiento(nodos, arbol, **descripcion):
+    """
+    Configuración de enrutamiento de la red superpuesta (overlay) que forma el árbol.
+
+    Args:
+        nodos: IPs de los nodos de la red
+        arbol: Aristas (u, v, peso) del árbol
+        descripcion: Datos adicionales que se guardan tal cual (criterio, restricciones)
+
+    Returns:
+        Diccionario con las aristas del árbol y la tabla de siguiente salto de cada nodo
+    """
+    return dict(descripcion, aristas=[list(arista) for arista in arbol],
+                siguiente_salto=tabla_siguiente_salto(nodos, arbol))
+
+def guardar_configuracion(configuracion, ruta=ARCHIVO_CONFIGURACION):
+    """Escribe la configuración de forma atómica para que un nodo principal nunca lea una a medias"""
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(configuracion, f, indent=2)
+    os.replace(temporal, ruta)
+
+_configuracion = {'mtime': None, 'valor': None}
+_bloqueo_configuracion = threading.Lock()
+
+def cargar_configuracion(ruta=ARCHIVO_CONFIGURACION):
+    """Configuración guardada, o None si no hay; se vuelve a leer sólo si el archivo cambió"""
+    try:
+        mtime = os.stat(ruta).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _bloqueo_configuracion:
+        if _configuracion['mtime'] != mtime:
+            with open(ruta, encoding='utf-8') as f:
+                _configuracion['valor'] = json.load(f)
+            _configuracion['mtime'] = mtime
+        return _configuracion['valor']
+
+class ArbolIncremental:
+    """
+    Árbol de expansión (sin restricciones de grado ni diámetro) que se mantiene al día enlace a enlace.
+
+    Cuando cambia el peso de un solo enlace no hace falta repetir Kruskal:
+    - Si una arista del árbol empeora (o desaparece), se quita y se une
+      el corte con la mejor arista que lo cruce, que puede ser ella misma.
+    - Si una arista fuera del árbol mejora, se compara con la peor arista
+      del camino que une sus extremos en el árbol y se intercambian si es mejor.
+    - En los otros dos casos el árbol no cambia.
+    Cada cambio cuesta O(V + E) en lugar de O(E log E).
+    """
+    def __init__(self, grafo, simetrizacion='max', maximizar=True):
+        self.simetrizacion = simetrizacion
+        self.maximizar = maximizar
+        self.bloqueo = threading.RLock()
+        self.fuente = None  # Grafo de la topología del que se obtuvo csr (ver arbol_compartido)
+        self._construir(como_csr(grafo))
+
+    def _construir(self, csr):
+        self.csr = csr
+        self.nodos = list(csr.nodos)
+        self.indice = {nodo: i for i, nodo in enumerate(self.nodos)}
+        self.pesos = self._pesos(csr)
+        self.vecinos = {nodo: set() for nodo in self.nodos}
+        for u, v, _ in kruskal(csr, self.simetrizacion, self.maximizar):
+            self.vecinos[u].add(v)
+            self.vecinos[v].add(u)
+        self.tabla = None
+
+    def _pesos(self, csr):
+        _, aristas = aristas_simetricas(csr, self.simetrizacion)
+        return {frozenset((csr.nodos[u], csr.nodos[v])): peso for u, v, peso in aristas if peso > 0}
+
+    def _mejor(self, a, b):
+        return a > b if self.maximizar else a < b
+
+    def aristas(self):
+        """Aristas (u, v, peso) del árbol, con las IPs de los nodos"""
+        with self.bloqueo:
+            return [(u, v, self.pesos[frozenset((u, v))])
+                    for u in self.nodos for v in self.vecinos[u] if self.indice[u] < self.indice[v]]
+
+    def actualizar_arista(self, origen, destino, peso):
+        """
+        Cambia el peso del enlace origen -- destino (ya simetrizado) y repara el árbol.
+
+        Args:
+            peso: Peso nuevo, o None (o 0) si el enlace desapareció
+
+        Returns:
+            True si cambió el árbol
+        """
+        with self.bloqueo:
+            clave = frozenset((origen, destino))
+            if peso:
+                self.pesos[clave] = peso
+            else:
+                self.pesos.pop(clave, None)
+
+            if destino in self.vecinos[origen]:
+                # Arista del árbol: quitarla y reconectar el corte con la mejor arista que lo cruce
+                self.vecinos[origen].discard(destino)
+                self.vecinos[destino].discard(origen)
+                lado = self._componente(origen)
+                mejor = None
+                for arista, valor in self.pesos.items():
+                    u, v = tuple(arista)
+                    if (u in lado) != (v in lado) and (mejor is None or self._mejor(valor, mejor[1])):
+                        mejor = (arista, valor)
+                if mejor:
+                    u, v = tuple(mejor[0])
+                    self.vecinos[u].add(v)
+                    self.vecinos[v].add(u)
+                cambio = mejor is None or mejor[0] != clave
+            elif peso:
+                camino = self._camino(origen, destino)
+                if camino is None:
+                    # Extremos en componentes distintas: la arista las une
+                    self.vecinos[origen].add(destino)
+                    self.vecinos[destino].add(origen)
+                    cambio = True
+                else:
+                    # La peor arista del camino que une los extremos en el árbol
+                    peor = None
+                    for u, v in zip(camino, camino[1:]):
+                        valor = self.pesos[frozenset((u, v))]
+                        if peor is None or self._mejor(peor[2], valor):
+                            peor = (u, v, valor)
+                    cambio = self._mejor(peso, peor[2])
+                    if cambio:
+                        self.vecinos[peor[0]].discard(peor[1])
+                        self.vecinos[peor[1]].discard(peor[0])
+                        self.vecinos[origen].add(destino)
+                        self.vecinos[destino].add(origen)
+            else:
+                cambio = False
+
+            if cambio:
+                self.tabla = None
+            return cambio
+
+    def _componente(self, inicio):
+        visitados = {inicio}
+        cola = deque([inicio])
+        while cola:
+            for vecino in self.vecinos[cola.popleft()]:
+                if vecino not in visitados:
+                    visitados.add(vecino)
+                    cola.append(vecino)
+        return visitados
+
+    def _camino(self, inicio, fin):
+        """Camino de inicio a fin por el árbol, o None si están en componentes distintas"""
+        padres = {inicio: None}
+        cola = deque([inicio])
+        while cola and fin not in padres:
+            nodo = cola.popleft()
+            for vecino in self.vecinos[nodo]:
+                if vecino not in padres:
+                    padres[vecino] = nodo
+                    cola.append(vecino)
+        if fin not in padres:
+            return None
+        camino = [fin]
+        while padres[camino[-1]] is not None:
+            camino.append(padres[camino[-1]])
+        return camino[::-1]
+
+    def sincronizar(self, csr):
+        """
+        Pone el árbol al día con un grafo nuevo de la misma red.
+
+        Returns:
+            Número de enlaces actualizados, o -1 si se recalculó el árbol entero
+        """
+        with self.bloqueo:
+            if csr is self.csr:
+                return 0
+            pesos = self._pesos(csr)
+            if csr.nodos != self.nodos:
+                self._construir(csr)
+                return -1
+            cambios = [(arista, pesos.get(arista)) for arista in set(pesos) | set(self.pesos)
+                       if pesos.get(arista) != self.pesos.get(arista)]
+            if len(cambios) > MAX_CAMBIOS_INCREMENTALES:
+                self._construir(csr)
+                return -1
+            for arista, peso in cambios:
+                self.actualizar_arista(*tuple(arista), peso)
+            self.csr = csr
+            return len(cambios)
+
+    def siguiente_salto(self, origen, destino):
+        """IP del siguiente salto de origen hacia destino por el árbol, o None si no hay camino"""
+        with self.bloqueo:
+            if self.tabla is None:
+                self.tabla = tabla_siguiente_salto(self.nodos, self.aristas())
+            return self.tabla.get(origen, {}).get(destino)
+
+# Árbol compartido por los módulos de un mismo proceso
+_arbol = None
+_bloqueo_arbol = threading.Lock()
+
+def arbol_compartido():
+    """Árbol de expansión máxima por ancho de banda, al día con la topología compartida"""
+    global _arbol
+    csr = topologia_compartida().grafo_csr()
+    with _bloqueo_arbol:
+        if _arbol is None:
+            _arbol = ArbolIncremental(csr.con_pesos('ancho_banda'))
+            _arbol.fuente = csr
+        elif _arbol.fuente is not csr:
+            _arbol.sincronizar(csr.con_pesos('ancho_banda'))
+            _arbol.fuente = csr
+        return _arbol
+
+def siguiente_salto_arbol(origen, destino):
+    """
+    Siguiente salto de origen hacia destino por la red superpuesta del árbol.
+
+    Usa la configuración guardada (ARCHIVO_CONFIGURACION) si existe; si no,
+    el árbol de expansión máxima de la topología actual.
+    """
+    configuracion = cargar_configuracion()
+    if configuracion is not None:
+        return configuracion['siguiente_salto'].get(origen, {}).get(destino)
+    return arbol_compartido().siguiente_salto(origen, destino)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Uso: python arbol_expansion.py <ip_origen> <ip_destino>")
+        sys.exit(1)
+    salto = siguiente_salto_arbol(sys.argv[1], sys.argv[2])
+    print(f"[Topología] Siguiente salto de {sys.argv[1]} hacia {sys.argv[2]} por el árbol: {salto or 'sin ruta'}")
@@ -0,0 +1,196 @@
+import os
+import time
+import zlib
+import lzma
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from transporte import recibir_exacto, escribir_en
+
+# Bloques en los que se divide el archivo; cada uno se comprime por separado
+TAMANO_BLOQUE_COMPRESION = 1024 * 1024
+HILOS_COMPRESION = max(1, min(4, os.cpu_count() or 1))
+
+# Selección del codec
+TAMANO_MINIMO_COMPRESION = 64 * 1024   # Archivos más pequeños se envían tal cual
+PIEZAS_MUESTRA = 4                     # Trozos del archivo que forman la muestra
+TAMANO_PIEZA_MUESTRA = 64 * 1024
+GANANCIA_MINIMA = 1.1                  # Comprimir debe acelerar el envío al menos un 10%
+ANCHO_BANDA_PREDETERMINADO_MBPS = 20   # Si no se conoce el cuello de botella de la ruta
+
+# Tramas del cuerpo comprimido: tipo, bytes en el cable, bytes originales
+TRAMA = struct.Struct('>BII')
+TRAMA_FIN = 0
+TRAMA_COMPRIMIDA = 1
+TRAMA_SIN_COMPRIMIR = 2  # El bloque no se reducía al comprimirlo
+MAX_TAMANO_TRAMA = 16 * 1024 * 1024
+
+class Codec:
+    """Par de funciones que comprimen y descomprimen un bloque completo"""
+    def __init__(self, nombre, comprimir, descomprimir):
+        self.nombre = nombre
+        self.comprimir = comprimir
+        self.descomprimir = descomprimir
+
+# Codecs disponibles, por nombre (el receptor tiene que conocer el mismo)
+codecs = {}
+
+def registrar_codec(nombre, comprimir, descomprimir):
+    """
+    Agrega un codec a los que se pueden elegir.
+
+    Args:
+        nombre: Nombre con el que viaja en los metadatos
+        comprimir: Función bytes -> bytes comprimidos
+        descomprimir: Función bytes comprimidos -> bytes
+    """
+    codecs[nombre] = Codec(nombre, comprimir, descomprimir)
+
+registrar_codec('zlib-rapido', lambda datos: zlib.compress(datos, 1), zlib.decompress)
+registrar_codec('zlib', lambda datos: zlib.compress(datos, 6), zlib.decompress)
+registrar_codec('lzma', lambda datos: lzma.compress(datos, preset=6), lzma.decompress)
+
+# Codecs más rápidos, si están instalados
+try:
+    import zstandard
+    registrar_codec('zstd', lambda datos: zstandard.ZstdCompressor(level=3).compress(datos),
+                    lambda datos: zstandard.ZstdDecompressor().decompress(datos))
+except ImportError:
+    pass
+
+try:
+    import lz4.frame
+    registrar_codec('lz4', lz4.frame.compress, lz4.frame.decompress)
+except ImportError:
+    pass
+
+def leer_muestra(nombre_archivo):
+    """Lee unos trozos repartidos por el archivo para estimar cuánto se comprime"""
+    tamano = os.path.getsize(nombre_archivo)
+    muestra = bytearray()
+    with open(nombre_archivo, 'rb') as f:
+        for i in range(PIEZAS_MUESTRA):
+            f.seek(tamano * i // PIEZAS_MUESTRA)
+            muestra += f.read(TAMANO_PIEZA_MUESTRA)
+    return bytes(muestra)
+
+def elegir_codec(nombre_archivo, ancho_banda_mbps=None):
+    """
+    Elige el codec que hace más rápido el envío de un archivo por una ruta.
+
+    Se comprime una muestra del archivo con cada codec para medir su
+    proporción de compresión y su velocidad. Como la compresión va en
+    paralelo con el envío, la velocidad efectiva es la menor entre la de
+    comprimir y la del enlace dividida por la proporción; si ningún codec
+    supera al envío sin comprimir por GANANCIA_MINIMA (enlaces rápidos o
+    datos ya comprimidos), no se comprime.
+
+    Args:
+        nombre_archivo: Ruta del archivo a enviar
+        ancho_banda_mbps: Cuello de botella de la ruta (Mbps)
+
+    Returns:
+        Nombre del codec, o None para enviar sin comprimir
+    """
+    if os.path.getsize(nombre_archivo) < TAMANO_MINIMO_COMPRESION:
+        return None
+
+    enlace = (ancho_banda_mbps or ANCHO_BANDA_PREDETERMINADO_MBPS) * 1e6 / 8  # bytes/s
+    muestra = leer_muestra(nombre_archivo)
+    mejor, mejor_velocidad = None, enlace * GANANCIA_MINIMA
+    for nombre, codec in codecs.items():
+        inicio = time.perf_counter()
+        comprimido = codec.comprimir(muestra)
+        duracion = max(time.perf_counter() - inicio, 1e-6)
+
+        proporcion = max(len(comprimido), 1) / len(muestra)
+        velocidad = min(len(muestra) / duracion * HILOS_COMPRESION, enlace / proporcion)
+        if velocidad > mejor_velocidad:
+            mejor, mejor_velocidad = nombre, velocidad
+    return mejor
+
+def canalizar(elementos, funcion, hilos=HILOS_COMPRESION):
+    """
+    Aplica funcion a cada elemento en un pool de hilos, devolviendo los resultados en orden.
+
+    Se mantienen como mucho 2 * hilos elementos en proceso, así la
+    compresión (o descompresión) de los bloques siguientes se solapa con
+    el envío (o la escritura) del actual sin acumular el archivo en memoria.
+    """
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        pendientes = deque()
+        for elemento in elementos:
+            pendientes.append(pool.submit(funcion, elemento))
+            if len(pendientes) >= 2 * hilos:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+
+def enviar_comprimido(sock, f, codec, al_enviar=None):
+    """
+    Envía un archivo comprimido por bloques, en tramas.
+
+    Args:
+        sock: Socket conectado
+        f: Archivo abierto en modo binario
+        codec: Nombre del codec (ver codecs)
+        al_enviar: Función opcional que recibe los bytes originales de cada bloque enviado
+
+    Returns:
+        Bytes enviados por el socket
+    """
+    codec = codecs[codec]
+
+    def bloques():
+        while True:
+            datos = f.read(TAMANO_BLOQUE_COMPRESION)
+            if not datos:
+                return
+            yield datos
+
+    def comprimir(datos):
+        comprimido = codec.comprimir(datos)
+        if len(comprimido) < len(datos):
+            return TRAMA.pack(TRAMA_COMPRIMIDA, len(comprimido), len(datos)) + comprimido, len(datos)
+        return TRAMA.pack(TRAMA_SIN_COMPRIMIR, len(datos), len(datos)) + datos, len(datos)
+
+    enviados = 0
+    for trama, original in canalizar(bloques(), comprimir):
+        sock.sendall(trama)
+        enviados += len(trama)
+        if al_enviar:
+            al_enviar(original)
+    sock.sendall(TRAMA.pack(TRAMA_FIN, 0, 0))
+    return enviados + TRAMA.size
+
+def recibir_comprimido(sock, fd, codec):
+    """
+    Recibe las tramas de un archivo comprimido y escribe los datos descomprimidos.
+
+    Returns:
+        Bytes escritos en el archivo
+    """
+    codec = codecs[codec]
+
+    def tramas():
+        while True:
+            tipo, longitud, original = TRAMA.unpack(recibir_exacto(sock, TRAMA.size))
+            if tipo == TRAMA_FIN:
+                return
+            if tipo not in (TRAMA_COMPRIMIDA, TRAMA_SIN_COMPRIMIR) or original > MAX_TAMANO_TRAMA:
+                raise Exception(f"Trama comprimida inválida (tipo {tipo}, {original} bytes)")
+            yield tipo, recibir_exacto(sock, longitud), original
+
+    def descomprimir(trama):
+        tipo, datos, original = trama
+        if tipo == TRAMA_COMPRIMIDA:
+            datos = codec.descomprimir(bytes(datos))
+        if len(datos) != original:
+            raise Exception("Un bloque descomprimido no tiene el tamaño esperado")
+        return datos
+
+    escritos = 0
+    for datos in canalizar(tramas(), descomprimir):
+        escribir_en(fd, datos, escritos)
+        escritos += len(datos)
+    return escritos
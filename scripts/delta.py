@@ -0,0 +1,237 @@
+import os
+import zlib
+import struct
+import hashlib
+from transporte import enviar_rango, recibir_exacto, recibir_a_archivo, copiar_rango
+
+# Tamaño de bloque del índice de firmas: cerca de la raíz cuadrada del archivo base
+TAMANO_BLOQUE_MINIMO = 2 * 1024
+TAMANO_BLOQUE_MAXIMO = 128 * 1024
+
+# Tras un bloque sin coincidencia se busca byte a byte en la ventana siguiente;
+# en una zona que no coincide, la búsqueda fina se repite sólo cada tantos bloques
+BLOQUES_ENTRE_BUSQUEDAS = 8
+
+# Operaciones del cuerpo de un envío delta
+OP_BLOQUES = b'B'    # Copiar 'cuenta' bloques consecutivos del archivo base
+OP_LITERAL = b'L'    # Datos nuevos que viajan tal cual
+CABECERA_BLOQUES = struct.Struct('>II')  # Índice del primer bloque, cuenta
+CABECERA_LITERAL = struct.Struct('>I')   # Longitud de los datos
+
+MODULO_ADLER = 65521
+
+def tamano_bloque_delta(tamano):
+    """
+    Tamaño de bloque para indexar un archivo de tamano bytes.
+
+    Con bloques de unos raíz(tamaño) bytes el índice y la búsqueda quedan
+    equilibrados: ni demasiadas firmas que enviar ni bloques tan grandes
+    que un cambio pequeño obligue a reenviar mucho.
+    """
+    bloque = TAMANO_BLOQUE_MINIMO
+    while bloque * bloque < tamano and bloque < TAMANO_BLOQUE_MAXIMO:
+        bloque *= 2
+    return bloque
+
+def firma_fuerte(datos):
+    """Resumen de un bloque para confirmar una coincidencia de la firma débil"""
+    return hashlib.blake2b(datos, digest_size=8).hexdigest()
+
+def firmas_archivo(ruta, tamano_bloque):
+    """
+    Índice de bloques de un archivo.
+
+    Cada bloque tiene una firma débil (Adler-32, que se puede desplazar byte
+    a byte) y una fuerte (BLAKE2b) que descarta las colisiones de la débil.
+
+    Returns:
+        Lista de [firma débil, firma fuerte], una por bloque
+    """
+    firmas = []
+    with open(ruta, 'rb') as f:
+        while True:
+            bloque = f.read(tamano_bloque)
+            if not bloque:
+                break
+            firmas.append([zlib.adler32(bloque), firma_fuerte(bloque)])
+    return firmas
+
+def resumen_archivo(ruta):
+    """SHA-256 de un archivo completo, para verificar la reconstrucción"""
+    resumen = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        while True:
+            datos = f.read(1024 * 1024)
+            if not datos:
+                break
+            resumen.update(datos)
+    return resumen.hexdigest()
+
+def calcular_delta(datos, firmas, tamano_bloque, tamano_base, max_literal=None):
+    """
+    Compara un archivo con el índice de bloques del archivo base del receptor.
+
+    Se prueba primero cada bloque en su posición alineada; si no coincide,
+    se desplaza la firma débil byte a byte dentro de la ventana siguiente
+    para reencontrar los bloques movidos por inserciones o borrados. Las
+    candidatas de la firma débil se confirman con la fuerte.
+
+    Args:
+        datos: Contenido del archivo (bytes o mmap)
+        firmas: Índice del archivo base (ver firmas_archivo)
+        tamano_bloque: Tamaño de bloque del índice
+        tamano_base: Tamaño del archivo base (su último bloque puede ser más corto)
+        max_literal: Si los datos nuevos superan estos bytes se abandona
+
+    Returns:
+        Lista de operaciones ('bloques', primer índice, cuenta) o
+        ('literal', desplazamiento, longitud), o None si se superó max_literal
+    """
+    tabla = {}
+    for indice, (debil, fuerte) in enumerate(firmas):
+        tabla.setdefault(debil, []).append((indice, fuerte))
+    ultimo = len(firmas) - 1
+    largo_ultimo = tamano_base - ultimo * tamano_bloque
+
+    def coincidencia(debil, inicio, fin):
+        candidatos = tabla.get(debil)
+        if not candidatos:
+            return None
+        fuerte = firma_fuerte(datos[inicio:fin])
+        for indice, firma in candidatos:
+            largo = largo_ultimo if indice == ultimo else tamano_bloque
+            if firma == fuerte and largo == fin - inicio:
+                return indice
+        return None
+
+    tamano = len(datos)
+    operaciones = []
+    literales = 0
+    literal_desde = 0
+
+    def agregar_bloque(inicio, indice):
+        nonlocal literales, literal_desde
+        if literal_desde < inicio:
+            operaciones.append(('literal', literal_desde, inicio - literal_desde))
+            literales += inicio - literal_desde
+        anterior = operaciones[-1] if operaciones else None
+        if anterior and anterior[0] == 'bloques' and anterior[1] + anterior[2] == indice:
+            operaciones[-1] = ('bloques', anterior[1], anterior[2] + 1)
+        else:
+            operaciones.append(('bloques', indice, 1))
+
+    pos = 0
+    fallos = 0
+    while pos + tamano_bloque <= tamano:
+        fin = pos + tamano_bloque
+        debil = zlib.adler32(datos[pos:fin])
+        indice = coincidencia(debil, pos, fin)
+
+        if indice is None and fallos % BLOQUES_ENTRE_BUSQUEDAS == 0:
+            # Desplazar la firma débil byte a byte por la ventana siguiente
+            a, b = debil & 0xFFFF, debil >> 16
+            limite = min(pos + tamano_bloque, tamano - tamano_bloque)
+            while pos < limite:
+                saliente, entrante = datos[pos], datos[pos + tamano_bloque]
+                a = (a - saliente + entrante) % MODULO_ADLER
+                b = (b - tamano_bloque * saliente + a - 1) % MODULO_ADLER
+                pos += 1
+                if (b << 16 | a) in tabla:
+                    indice = coincidencia(b << 16 | a, pos, pos + tamano_bloque)
+                    if indice is not None:
+                        break
+            if indice is None:
+                pos = fin
+
+        if indice is not None:
+            agregar_bloque(pos, indice)
+            pos += tamano_bloque
+            literal_desde = pos
+            fallos = 0
+        else:
+            if pos == fin - tamano_bloque:
+                pos = fin
+            fallos += 1
+
+        if max_literal is not None and literales + pos - literal_desde > max_literal:
+            return None
+
+    # El resto puede coincidir con el último bloque (más corto) del archivo base
+    if pos < tamano and tamano - pos == largo_ultimo:
+        indice = coincidencia(zlib.adler32(datos[pos:]), pos, tamano)
+        if indice is not None:
+            agregar_bloque(pos, indice)
+            literal_desde = pos = tamano
+
+    if literal_desde < tamano:
+        operaciones.append(('literal', literal_desde, tamano - literal_desde))
+        literales += tamano - literal_desde
+    if max_literal is not None and literales > max_literal:
+        return None
+    return operaciones
+
+def tamano_cuerpo(operaciones):
+    """Bytes que ocupan las operaciones en el cable"""
+    total = 0
+    for operacion in operaciones:
+        if operacion[0] == 'bloques':
+            total += 1 + CABECERA_BLOQUES.size
+        else:
+            total += 1 + CABECERA_LITERAL.size + operacion[2]
+    return total
+
+def enviar_delta(sock, f, operaciones):
+    """
+    Envía las operaciones de un delta.
+
+    Las cabeceras se agrupan en un solo envío y los datos nuevos se mandan
+    directamente desde el archivo (con sendfile donde exista).
+    """
+    pendiente = bytearray()
+    for operacion in operaciones:
+        if operacion[0] == 'bloques':
+            pendiente += OP_BLOQUES + CABECERA_BLOQUES.pack(operacion[1], operacion[2])
+        else:
+            pendiente += OP_LITERAL + CABECERA_LITERAL.pack(operacion[2])
+            sock.sendall(pendiente)
+            pendiente.clear()
+            enviar_rango(sock, f, operacion[1], operacion[2])
+    if pendiente:
+        sock.sendall(pendiente)
+
+def aplicar_delta(sock, fd_destino, fd_base, tamano_cuerpo, tamano_bloque, tamano_base):
+    """
+    Reconstruye un archivo a partir del archivo base y de las operaciones recibidas.
+
+    Args:
+        sock: Socket del que se leen las operaciones
+        fd_destino: Descriptor del archivo nuevo
+        fd_base: Descriptor del archivo base (lectura)
+        tamano_cuerpo: Bytes de operaciones anunciados por el emisor
+        tamano_bloque: Tamaño de bloque del índice usado por el emisor
+        tamano_base: Tamaño del archivo base
+
+    Returns:
+        Bytes escritos en el archivo nuevo
+    """
+    consumidos = 0
+    escritos = 0
+    while consumidos < tamano_cuerpo:
+        tipo = bytes(recibir_exacto(sock, 1))
+        if tipo == OP_BLOQUES:
+            indice, cuenta = CABECERA_BLOQUES.unpack(recibir_exacto(sock, CABECERA_BLOQUES.size))
+            desplazamiento = indice * tamano_bloque
+            if cuenta == 0 or desplazamiento >= tamano_base:
+                raise Exception(f"Bloque {indice} fuera del archivo base")
+            longitud = min(cuenta * tamano_bloque, tamano_base - desplazamiento)
+            copiar_rango(fd_base, fd_destino, desplazamiento, escritos, longitud)
+            consumidos += 1 + CABECERA_BLOQUES.size
+        elif tipo == OP_LITERAL:
+            longitud, = CABECERA_LITERAL.unpack(recibir_exacto(sock, CABECERA_LITERAL.size))
+            if recibir_a_archivo(sock, fd_destino, escritos, longitud) < longitud:
+                raise Exception("Conexión cerrada inesperadamente")
+            consumidos += 1 + CABECERA_LITERAL.size + longitud
+        else:
+            raise Exception(f"Operación de delta desconocida: {tipo!r}")
+        escritos += longitud
+    return escritos
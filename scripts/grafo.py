@@ -0,0 +1,170 @@
+from array import array
+
+class GrafoCSR:
+    """
+    Grafo dirigido y ponderado en formato CSR (compressed sparse row).
+
+    Los nodos se identifican con enteros 0..n-1 (nodos[i] es la IP del
+    nodo i). Las aristas que salen del nodo u ocupan las posiciones
+    inicios[u] .. inicios[u+1]-1 de los arreglos destinos y pesos, así el
+    grafo entero son unos pocos arreglos contiguos de enteros y flotantes
+    en lugar de un diccionario por nodo, y recorrer los vecinos de un nodo
+    es recorrer un tramo de un arreglo.
+
+    atributos guarda métricas adicionales alineadas con pesos (por ejemplo,
+    el ancho de banda de cada arista cuando el peso es la latencia).
+    """
+    def __init__(self, nodos, inicios, destinos, pesos, atributos=None):
+        self.nodos = nodos
+        self.indice = {nodo: i for i, nodo in enumerate(nodos)}
+        self.inicios = inicios
+        self.destinos = destinos
+        self.pesos = pesos
+        self.atributos = atributos or {}
+
+    @classmethod
+    def desde_diccionario(cls, grafo, **otros):
+        """
+        Construye el grafo a partir de un diccionario de diccionarios {u: {v: peso}}.
+
+        Las aristas ya vienen agrupadas por origen, así que se construye en
+        O(V + E) sin ordenar.
+
+        Args:
+            grafo: Diccionario de diccionarios con los pesos
+            otros: Otros diccionarios de diccionarios con métricas de las
+                mismas aristas, que se guardan en atributos (0 si falta)
+        """
+        nodos = list(grafo)
+        indice = {nodo: i for i, nodo in enumerate(nodos)}
+        for vecinos in grafo.values():
+            for v in vecinos:
+                if v not in indice:
+                    indice[v] = len(nodos)
+                    nodos.append(v)
+
+        inicios = array('l', [0]) * (len(nodos) + 1)
+        destinos = array('l')
+        pesos = array('d')
+        atributos = {nombre: array('d') for nombre in otros}
+        for u, nodo in enumerate(nodos):
+            for v, peso in grafo.get(nodo, {}).items():
+                destinos.append(indice[v])
+                pesos.append(peso)
+                for nombre, metrica in otros.items():
+                    atributos[nombre].append(metrica.get(nodo, {}).get(v, 0))
+            inicios[u + 1] = len(destinos)
+        return cls(nodos, inicios, destinos, pesos, atributos)
+
+    @classmethod
+    def desde_aristas(cls, nodos, aristas):
+        """
+        Construye el grafo a partir de una lista de aristas (u, v, peso) con ids enteros.
+
+        Las aristas se agrupan por origen con un conteo (O(V + E)).
+        """
+        n = len(nodos)
+        inicios = array('l', [0]) * (n + 1)
+        for u, _, _ in aristas:
+            inicios[u + 1] += 1
+        for u in range(n):
+            inicios[u + 1] += inicios[u]
+
+        destinos = array('l', [0]) * len(aristas)
+        pesos = array('d', [0.0]) * len(aristas)
+        siguiente = array('l', inicios[:n])
+        for u, v, peso in aristas:
+            posicion = siguiente[u]
+            destinos[posicion] = v
+            pesos[posicion] = peso
+            siguiente[u] += 1
+        return cls(list(nodos), inicios, destinos, pesos)
+
+    def num_nodos(self):
+        return len(self.nodos)
+
+    def num_aristas(self):
+        return len(self.destinos)
+
+    def aristas(self):
+        """Itera las aristas como (u, v, peso) con ids enteros"""
+        for u in range(len(self.nodos)):
+            for posicion in range(self.inicios[u], self.inicios[u + 1]):
+                yield u, self.destinos[posicion], self.pesos[posicion]
+
+    def aristas_no_dirigidas(self, combinar=max):
+        """
+        Une cada par de aristas opuestas u -> v y v -> u en una sola.
+
+        Usa un diccionario indexado por el par (menor, mayor), así que es
+        O(E) en lugar de buscar la arista inversa en la lista.
+
+        Args:
+            combinar: Función que recibe los pesos de las dos direcciones
+
+        Returns:
+            Lista de (u, v, peso) con u < v
+        """
+        pares = {}
+        for u, v, peso in self.aristas():
+            if u == v:
+                continue
+            clave = (u, v) if u < v else (v, u)
+            anterior = pares.get(clave)
+            pares[clave] = peso if anterior is None else combinar(anterior, peso)
+        return [(u, v, peso) for (u, v), peso in pares.items()]
+
+    def con_pesos(self, atributo):
+        """
+        El mismo grafo usando como peso uno de sus atributos.
+
+        Comparte los arreglos con el original (no copia nada), así que sirve
+        para pasar el grafo de ancho de banda a las funciones que usan pesos.
+        """
+        otros = dict(self.atributos, **{'peso': self.pesos})
+        del otros[atributo]
+        return GrafoCSR(self.nodos, self.inicios, self.destinos, self.atributos[atributo], otros)
+
+    def entrantes(self):
+        """
+        Aristas que llegan a cada nodo, también en formato CSR.
+
+        Returns:
+            inicios, origenes y posiciones: las aristas que llegan al nodo v
+            ocupan inicios[v] .. inicios[v+1]-1; origenes guarda su nodo de
+            salida y posiciones su posición en los arreglos del grafo
+        """
+        n = len(self.nodos)
+        inicios = array('l', [0]) * (n + 1)
+        for v in self.destinos:
+            inicios[v + 1] += 1
+        for v in range(n):
+            inicios[v + 1] += inicios[v]
+
+        origenes = array('l', [0]) * len(self.destinos)
+        posiciones = array('l', [0]) * len(self.destinos)
+        siguiente = array('l', inicios[:n])
+        for u, v, posicion in self.aristas_con_posicion():
+            origenes[siguiente[v]] = u
+            posiciones[siguiente[v]] = posicion
+            siguiente[v] += 1
+        return inicios, origenes, posiciones
+
+    def aristas_con_posicion(self):
+        """Itera las aristas como (u, v, posición en los arreglos)"""
+        for u in range(len(self.nodos)):
+            for posicion in range(self.inicios[u], self.inicios[u + 1]):
+                yield u, self.destinos[posicion], posicion
+
+    def a_diccionario(self):
+        """Diccionario de diccionarios {u: {v: peso}} con las IPs de los nodos"""
+        grafo = {nodo: {} for nodo in self.nodos}
+        for u, v, peso in self.aristas():
+            grafo[self.nodos[u]][self.nodos[v]] = peso
+        return grafo
+
+def como_csr(grafo, **otros):
+    """Devuelve el grafo en formato CSR, convirtiéndolo si es un diccionario de diccionarios"""
+    if isinstance(grafo, GrafoCSR):
+        return grafo
+    return GrafoCSR.desde_diccionario(grafo, **otros)
@@ -0,0 +1,224 @@
+import socket
+import sys
+import time
+import struct
+import threading
+from transporte import enviar_mensaje, recibir_mensaje
+from topologia import topologia_compartida
+
+PUERTO_MEDICION = 5052  # UDP: eco de sondeos de RTT; TCP: ráfagas y consulta de pesos
+
+# Frecuencia y tamaño de las mediciones
+INTERVALO_RTT = 10                  # Segundos entre rondas de sondeos de RTT
+INTERVALO_RAFAGA = 120              # Segundos entre mediciones de ancho de banda
+SONDEOS_POR_RONDA = 5
+TIEMPO_ESPERA_SONDEO = 2            # Segundos antes de dar un sondeo por perdido
+
+# Muestras pasivas de las transferencias reales (emisor, nodo principal y receptor)
+MIN_BYTES_MUESTRA = 1024 * 1024     # Transferencias más cortas las domina la latencia
+
+# Ráfagas de medición de ancho de banda: varias veces el producto ancho de banda-retardo del
+# enlace, para que el arranque lento de TCP no domine la medición
+RAFAGA_BDP = 8                      # Productos ancho de banda-retardo por ráfaga
+MAX_TAMANO_RAFAGA = 16 * 1024 * 1024
+BLOQUE_RAFAGA = 256 * 1024
+
+SONDEO = struct.Struct('>Qd')       # Número de secuencia, instante de envío
+
+class MedidorEnlaces:
+    """
+    Servicio de medición de los enlaces de un nodo.
+
+    Mide periódicamente el RTT (sondeos UDP de eco) y el ancho de banda
+    (ráfagas TCP de varios productos ancho de banda-retardo, cronometradas
+    por el vecino) hacia cada vecino y guarda las muestras en la
+    topología local, que las suaviza con un promedio exponencial (EWMA).
+    En cada ronda pide también a cada vecino las mediciones de sus propios
+    enlaces, así la topología de cada nodo tiene los pesos de toda la red.
+    """
+    def __init__(self, ip_local, vecinos, topologia=None):
+        self.ip_local = ip_local
+        self.vecinos = [vecino for vecino in vecinos if vecino != ip_local]
+        self.topologia = topologia or topologia_compartida()
+        self.datos_rafaga = bytes(BLOQUE_RAFAGA)
+
+    def medir_rtt(self, vecino):
+        """RTT (ms) hacia un vecino: el menor de varios sondeos UDP, o None si no respondió"""
+        mejores = []
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.settimeout(TIEMPO_ESPERA_SONDEO)
+            for secuencia in range(SONDEOS_POR_RONDA):
+                s.sendto(SONDEO.pack(secuencia, time.perf_counter()), (vecino, PUERTO_MEDICION))
+                try:
+                    while True:
+                        respuesta, _ = s.recvfrom(SONDEO.size)
+                        recibida, enviado = SONDEO.unpack(respuesta)
+                        # Descartar respuestas atrasadas de sondeos anteriores
+                        if recibida == secuencia:
+                            mejores.append((time.perf_counter() - enviado) * 1000)
+                            break
+                except (socket.timeout, struct.error):
+                    continue
+        return min(mejores) if mejores else None
+
+    def tamano_rafaga(self, vecino, rtt_ms):
+        """Bytes de la ráfaga hacia un vecino: RAFAGA_BDP veces el producto ancho de banda-retardo del enlace"""
+        _, grafo_ancho_banda = self.topologia.grafos()
+        ancho_banda = grafo_ancho_banda.get(self.ip_local, {}).get(vecino, 0)
+        producto_bdp = ancho_banda * 1e6 / 8 * rtt_ms / 1000.0
+        return int(min(max(RAFAGA_BDP * producto_bdp, MIN_BYTES_MUESTRA), MAX_TAMANO_RAFAGA))
+
+    def medir_ancho_banda(self, vecino, rtt_ms=0):
+        """
+        Ancho de banda (Mbps) hacia un vecino enviando una ráfaga TCP.
+
+        El vecino cronometra la ráfaga sin el primer RTT desde que le llega
+        el primer byte, así no cuentan la conexión ni el comienzo del
+        arranque lento.
+        """
+        tamano = self.tamano_rafaga(vecino, rtt_ms)
+        with socket.create_connection((vecino, PUERTO_MEDICION), timeout=60) as s:
+            enviar_mensaje(s, {'tipo': 'rafaga', 'tamano': tamano, 'rtt_ms': rtt_ms})
+            vista = memoryview(self.datos_rafaga)
+            for inicio in range(0, tamano, BLOQUE_RAFAGA):
+                s.sendall(vista[:min(BLOQUE_RAFAGA, tamano - inicio)])
+            respuesta = recibir_mensaje(s)
+        return respuesta['bytes_medidos'] * 8 / max(respuesta['segundos'], 1e-3) / 1e6
+
+    def consultar_vecino(self, vecino):
+        """Pide a un vecino las mediciones de sus enlaces y guarda las más recientes (ya vienen suavizadas)"""
+        with socket.create_connection((vecino, PUERTO_MEDICION), timeout=TIEMPO_ESPERA_SONDEO) as s:
+            enviar_mensaje(s, {'tipo': 'pesos'})
+            pesos = recibir_mensaje(s)
+        for metrica, destinos in pesos.items():
+            for destino, (valor, instante) in destinos.items():
+                if destino != vecino:
+                    self.topologia.registrar_medicion(vecino, destino, metrica, valor, instante,
+                                                      fuente=vecino, suavizar=False)
+
+    def servir_eco(self):
+        """Responde los sondeos UDP de RTT de los demás nodos"""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.bind(('0.0.0.0', PUERTO_MEDICION))
+            while True:
+                datos, direccion = s.recvfrom(SONDEO.size)
+                s.sendto(datos, direccion)
+
+    def servir_tcp(self):
+        """Atiende ráfagas de medición y consultas de pesos de los demás nodos"""
+        servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        servidor.bind(('0.0.0.0', PUERTO_MEDICION))
+        servidor.listen(5)
+        while True:
+            conn, addr = servidor.accept()
+            threading.Thread(target=self.atender, args=(conn, addr), daemon=True).start()
+
+    def atender(self, conn, addr):
+        try:
+            conn.settimeout(60)
+            solicitud = recibir_mensaje(conn)
+            if solicitud['tipo'] == 'rafaga':
+                enviar_mensaje(conn, self.recibir_rafaga(conn, min(solicitud['tamano'], MAX_TAMANO_RAFAGA),
+                                                         solicitud.get('rtt_ms', 0)))
+            elif solicitud['tipo'] == 'pesos':
+                enviar_mensaje(conn, self.topologia.mediciones(self.ip_local))
+        except Exception as e:
+            print(f"[ERROR] Medición de {addr[0]} fallida: {e}")
+        finally:
+            conn.close()
+
+    def recibir_rafaga(self, conn, tamano, rtt_ms):
+        """
+        Recibe una ráfaga y cronometra los bytes que llegan después del primer RTT.
+
+        Returns:
+            Diccionario con los bytes recibidos y los bytes y segundos medidos
+        """
+        buffer = bytearray(BLOQUE_RAFAGA)
+        recibidos = 0
+        primero = medido_desde = None
+        bytes_antes = 0
+        while recibidos < tamano:
+            leidos = conn.recv_into(buffer, min(len(buffer), tamano - recibidos))
+            if not leidos:
+                raise Exception(f"Ráfaga cortada a los {recibidos} de {tamano} bytes")
+            ahora = time.perf_counter()
+            if primero is None:
+                primero = ahora
+            elif medido_desde is None and ahora - primero >= rtt_ms / 1000.0:
+                medido_desde, bytes_antes = ahora, recibidos
+            recibidos += leidos
+        if medido_desde is None:
+            # La ráfaga entera llegó en menos de un RTT: contarla desde el primer bloque
+            medido_desde, bytes_antes = primero, 0
+        return {'recibidos': recibidos, 'bytes_medidos': recibidos - bytes_antes,
+                'segundos': time.perf_counter() - medido_desde}
+
+    def ronda(self, medir_rafaga):
+        """Mide los enlaces hacia todos los vecinos y reúne sus mediciones"""
+        for vecino in self.vecinos:
+            rtt = self.medir_rtt(vecino)
+            if rtt is None:
+                print(f"[Medición] {vecino} no responde a los sondeos")
+                continue
+            self.topologia.registrar_medicion(self.ip_local, vecino, 'latencia', rtt, fuente='sondeo')
+            try:
+                if medir_rafaga:
+                    self.topologia.registrar_medicion(self.ip_local, vecino, 'ancho_banda',
+                                                      self.medir_ancho_banda(vecino, rtt), fuente='sondeo')
+                self.consultar_vecino(vecino)
+            except Exception as e:
+                print(f"[ERROR] No se pudo medir el enlace con {vecino}: {e}")
+
+    def ejecutar(self):
+        """Arranca los servicios y mide periódicamente"""
+        threading.Thread(target=self.servir_eco, daemon=True).start()
+        threading.Thread(target=self.servir_tcp, daemon=True).start()
+        print(f"[Medición] Midiendo enlaces de {self.ip_local} hacia {', '.join(self.vecinos)} "
+              f"(RTT cada {INTERVALO_RTT} s, ancho de banda cada {INTERVALO_RAFAGA} s)")
+
+        ultima_rafaga = 0
+        while True:
+            medir_rafaga = time.time() - ultima_rafaga >= INTERVALO_RAFAGA
+            if medir_rafaga:
+                ultima_rafaga = time.time()
+                self.topologia.podar_historial()
+            self.ronda(medir_rafaga)
+            time.sleep(INTERVALO_RTT)
+
+def es_flujo_parcial(paquete):
+    """
+    Indica si una conexión es una de varias que llevan en paralelo la misma transferencia.
+
+    Su velocidad es sólo una parte de la del enlace, así que no sirve como muestra.
+    """
+    return 'id_transferencia' in paquete and not paquete.get('reanudable')
+
+def registrar_transferencia(origen, destino, n_bytes, segundos):
+    """
+    Guarda el ancho de banda observado en una transferencia real por el enlace origen -> destino.
+
+    La muestra se suma al promedio del enlace en la topología, así cada
+    transferencia actualiza el grafo de ancho de banda sin tráfico de
+    medición adicional.
+
+    Args:
+        origen: IP del nodo que envió
+        destino: IP del nodo que recibió
+        n_bytes: Bytes transferidos
+        segundos: Duración de la transferencia
+    """
+    if n_bytes < MIN_BYTES_MUESTRA or segundos <= 0 or origen == destino:
+        return
+    try:
+        topologia_compartida().registrar_medicion(origen, destino, 'ancho_banda', n_bytes * 8 / segundos / 1e6,
+                                                  fuente='transferencia')
+    except Exception as e:
+        print(f"[ERROR] No se pudo guardar la muestra del enlace {origen} -> {destino}: {e}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Uso: python medicion.py <ip_local> <ip_vecino> [ip_vecino ...]")
+    else:
+        MedidorEnlaces(sys.argv[1], sys.argv[2:]).ejecutar()
@@ -0,0 +1,762 @@
+import os
+import sys
+import json
+import time
+import socket
+import queue
+import struct
+import threading
+from abc import ABC, abstractmethod
+from transporte import enviar_rango, recibir_exacto, escribir_en
+
+PUERTO_MULTIPLEXADO = 5053
+MAX_FILE_SIZE = 3 * 1024 * 1024 * 1024
+
+# Tramas: id del flujo, tipo y longitud del contenido, seguidos del contenido
+TRAMA = struct.Struct('>IBI')
+TRAMA_ABRIR = 1      # Metadatos (JSON) de un archivo nuevo: nombre, tamaño, destino y saltos restantes
+TRAMA_DATOS = 2      # Bytes del archivo, en orden
+TRAMA_FIN = 3        # El emisor terminó de enviar el archivo
+TRAMA_RESPUESTA = 4  # Resultado (JSON) que devuelve el destino final
+TRAMA_CANCELAR = 5   # El emisor abandona el archivo; el destino descarta lo recibido
+DESCARTAR = 0        # Sólo en las colas de reenvío: abandonar el flujo sin responder al emisor
+
+MAX_DATOS_TRAMA = 256 * 1024          # Los archivos grandes se reparten en varias tramas
+MAX_CONTENIDO_TRAMA = 1024 * 1024     # Tramas mayores indican un flujo corrupto
+MAX_FLUJOS_EN_VUELO = 256             # Archivos sin respuesta por conexión antes de esperar
+MAX_TRAMAS_COLA_SALTO = 64            # Tramas pendientes de reenviar a cada siguiente salto
+TIEMPO_ESPERA_COLA = 5                # Segundos que se espera hueco en esa cola antes de dar el flujo por fallido
+TIEMPO_ESPERA_RESPUESTA = 120         # Segundos que el emisor espera las respuestas tras enviar
+
+# Envío de directorios: los archivos pequeños viajan agrupados en lotes
+MAX_TAMANO_LOTE = 64 * 1024           # Archivos mayores se envían en su propio flujo
+MAX_ARCHIVOS_LOTE = 1024
+MAX_BYTES_LOTE = 4 * 1024 * 1024
+MAX_CABECERA_LOTE = 256 * 1024        # JSON de la lista de archivos, muy por debajo de MAX_CONTENIDO_TRAMA
+TIEMPO_ESPERA_CONEXION = 10           # Segundos para abrir una conexión nueva
+
+class ConexionMultiplexada(ABC):
+    """
+    Conexión TCP de larga duración por la que viajan intercaladas las tramas de muchos archivos.
+
+    Cada archivo es un flujo con su propio id. Las tramas se escriben
+    completas bajo un bloqueo, así varios hilos pueden enviar por la misma
+    conexión a la vez; un hilo lector recibe las tramas y las pasa a
+    al_recibir_trama, que implementan las subclases.
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.ip_remota = sock.getpeername()[0]
+        self.bloqueo_envio = threading.Lock()
+        self.cerrada = False
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+    def iniciar(self):
+        threading.Thread(target=self._leer, daemon=True).start()
+        return self
+
+    def enviar_tramas(self, tramas):
+        """Envía varias tramas (id, tipo, contenido) juntas, en un solo envío"""
+        datos = bytearray()
+        for flujo, tipo, contenido in tramas:
+            datos += TRAMA.pack(flujo, tipo, len(contenido))
+            datos += contenido
+        with self.bloqueo_envio:
+            self.sock.sendall(datos)
+
+    def enviar_trama(self, flujo, tipo, contenido=b''):
+        self.enviar_tramas([(flujo, tipo, contenido)])
+
+    def enviar_rango(self, flujo, f, desplazamiento, longitud, al_enviar=None):
+        """Envía un rango de un archivo en tramas de datos (con sendfile donde exista)"""
+        enviados = 0
+        while enviados < longitud:
+            tramo = min(MAX_DATOS_TRAMA, longitud - enviados)
+            with self.bloqueo_envio:
+                self.sock.sendall(TRAMA.pack(flujo, TRAMA_DATOS, tramo))
+                enviar_rango(self.sock, f, desplazamiento + enviados, tramo)
+            enviados += tramo
+            if al_enviar:
+                al_enviar(tramo)
+
+    def _leer(self):
+        error = None
+        try:
+            while True:
+                cabecera = self.sock.recv(TRAMA.size)
+                if not cabecera:
+                    break  # El otro nodo cerró la conexión entre dos tramas
+                if len(cabecera) < TRAMA.size:
+                    cabecera += recibir_exacto(self.sock, TRAMA.size - len(cabecera))
+                flujo, tipo, longitud = TRAMA.unpack(cabecera)
+                if longitud > MAX_CONTENIDO_TRAMA:
+                    raise Exception(f"Trama de {longitud} bytes en el flujo {flujo}")
+                contenido = recibir_exacto(self.sock, longitud) if longitud else b''
+                self.al_recibir_trama(flujo, tipo, contenido)
+        except Exception as e:
+            if not self.cerrada:
+                error = e
+        finally:
+            self.cerrar()
+            self.al_cerrar(error)
+
+    @abstractmethod
+    def al_recibir_trama(self, flujo, tipo, contenido):
+        """Atiende una trama recibida; se llama desde el hilo lector"""
+
+    def al_cerrar(self, error):
+        pass
+
+    def cerrar(self):
+        if self.cerrada:
+            return
+        self.cerrada = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+class Flujo:
+    """Un archivo que se envía por una conexión multiplexada"""
+    def __init__(self, conexion, id_flujo, al_responder=None):
+        self.conexion = conexion
+        self.id = id_flujo
+        self.al_responder = al_responder
+        self.respuesta = None
+        self.respondido = threading.Event()
+
+    def enviar(self, datos):
+        for inicio in range(0, len(datos), MAX_DATOS_TRAMA):
+            self.conexion.enviar_trama(self.id, TRAMA_DATOS, datos[inicio:inicio + MAX_DATOS_TRAMA])
+
+    def enviar_rango(self, f, desplazamiento, longitud, al_enviar=None):
+        self.conexion.enviar_rango(self.id, f, desplazamiento, longitud, al_enviar)
+
+    def terminar(self):
+        self.conexion.enviar_trama(self.id, TRAMA_FIN)
+
+    def cancelar(self, motivo='Cancelado por el emisor'):
+        try:
+            self.conexion.enviar_trama(self.id, TRAMA_CANCELAR)
+        except OSError:
+            pass
+        self._responder({'completo': False, 'error': motivo})
+
+    def esperar_respuesta(self, tiempo=None):
+        """Respuesta del destino final, o None si no llegó en el tiempo indicado"""
+        self.respondido.wait(tiempo)
+        return self.respuesta
+
+    def _responder(self, respuesta):
+        if self.respondido.is_set():
+            return
+        self.respuesta = respuesta
+        self.respondido.set()
+        self.conexion.liberar(self.id)
+        if self.al_responder:
+            self.al_responder(respuesta)
+
+class ConexionSaliente(ConexionMultiplexada):
+    """Lado que abre los flujos: envía archivos y recibe las respuestas"""
+    def __init__(self, sock):
+        super().__init__(sock)
+        self.flujos = {}
+        self.siguiente_id = 1
+        self.bloqueo_flujos = threading.Lock()
+        self.en_vuelo = threading.BoundedSemaphore(MAX_FLUJOS_EN_VUELO)
+
+    def abrir_flujo(self, cabecera, datos=None, al_responder=None):
+        """
+        Abre un flujo para un archivo nuevo.
+
+        Si se pasan datos (archivo pequeño completo), la apertura, los datos
+        y el fin viajan en un solo envío.
+
+        Args:
+            cabecera: Metadatos del archivo (nombre, tamano, destino, ruta restante)
+            datos: Contenido completo del archivo, o None para enviarlo después
+            al_responder: Función opcional que recibe la respuesta del destino
+
+        Returns:
+            El Flujo abierto
+        """
+        # Acotar los archivos sin respuesta para no agotar la memoria de los nodos
+        self.en_vuelo.acquire()
+        with self.bloqueo_flujos:
+            if self.cerrada:
+                self.en_vuelo.release()
+                raise ConnectionError(f"La conexión con {self.ip_remota} está cerrada")
+            flujo = Flujo(self, self.siguiente_id, al_responder)
+            self.flujos[flujo.id] = flujo
+            self.siguiente_id += 1
+
+        tramas = [(flujo.id, TRAMA_ABRIR, json.dumps(cabecera).encode())]
+        if datos is not None:
+            tramas += [(flujo.id, TRAMA_DATOS, datos), (flujo.id, TRAMA_FIN, b'')]
+        try:
+            self.enviar_tramas(tramas)
+        except OSError as e:
+            flujo._responder({'completo': False, 'error': str(e)})
+            raise
+        return flujo
+
+    def liberar(self, id_flujo):
+        with self.bloqueo_flujos:
+            if self.flujos.pop(id_flujo, None) is not None:
+                self.en_vuelo.release()
+
+    def al_recibir_trama(self, id_flujo, tipo, contenido):
+        if tipo != TRAMA_RESPUESTA:
+            raise Exception(f"Trama inesperada de tipo {tipo} desde {self.ip_remota}")
+        with self.bloqueo_flujos:
+            flujo = self.flujos.get(id_flujo)
+        if flujo:
+            flujo._responder(json.loads(bytes(contenido).decode()))
+
+    def al_cerrar(self, error):
+        # Los archivos que no recibieron respuesta fallan todos
+        with self.bloqueo_flujos:
+            pendientes = list(self.flujos.values())
+        for flujo in pendientes:
+            flujo._responder({'completo': False, 'error': f"Conexión con {self.ip_remota} perdida: {error}"})
+
+class PoolConexiones:
+    """
+    Una conexión multiplexada por nodo vecino, abierta la primera vez y reutilizada.
+
+    Si la conexión se cae, la siguiente consulta abre otra.
+    """
+    def __init__(self, puerto=PUERTO_MULTIPLEXADO):
+        self.puerto = puerto
+        self.conexiones = {}
+        self.bloqueo = threading.Lock()
+
+    def conexion(self, ip):
+        with self.bloqueo:
+            conexion = self.conexiones.get(ip)
+            if conexion is None or conexion.cerrada:
+                sock = socket.create_connection((ip, self.puerto), timeout=TIEMPO_ESPERA_CONEXION)
+                sock.settimeout(None)
+                conexion = ConexionSaliente(sock).iniciar()
+                self.conexiones[ip] = conexion
+            return conexion
+
+    def cerrar(self):
+        with self.bloqueo:
+            for conexion in self.conexiones.values():
+                conexion.cerrar()
+            self.conexiones.clear()
+
+# Pool compartido por los módulos de un mismo proceso
+_pool = None
+_bloqueo_pool = threading.Lock()
+
+def pool_compartido():
+    """Devuelve el pool de conexiones del proceso, creándolo la primera vez"""
+    global _pool
+    with _bloqueo_pool:
+        if _pool is None:
+            _pool = PoolConexiones()
+        return _pool
+
+def ruta_segura(nombre):
+    """
+    Convierte la ruta relativa que envía el emisor en una ruta dentro del directorio actual.
+
+    Raises:
+        Exception: Si la ruta es absoluta o sale del directorio actual (.., enlaces simbólicos)
+    """
+    partes = [parte for parte in nombre.replace('\\', '/').split('/') if parte not in ('', '.')]
+    if not partes or nombre.startswith(('/', '\\')) or os.path.splitdrive(partes[0])[0] or '..' in partes:
+        raise Exception(f"Ruta no permitida: '{nombre}'")
+    ruta = os.path.join(*partes)
+    base = os.path.realpath(os.getcwd())
+    if not os.path.realpath(ruta).startswith(base + os.sep):
+        raise Exception(f"Ruta no permitida: '{nombre}'")
+    return ruta
+
+class ArchivosEntrantes:
+    """
+    Archivos destinados a este nodo que llegan por un flujo.
+
+    Un flujo lleva un archivo o un lote de archivos pequeños cuyos
+    contenidos van seguidos, en el orden de la lista de la cabecera. Cada
+    archivo se escribe en un archivo parcial y todos toman su nombre al
+    terminar el flujo, así un lote incompleto no deja archivos a medias.
+    """
+    def __init__(self, entradas, sufijo):
+        """
+        Args:
+            entradas: Lista de (ruta relativa, tamaño); tamaño None es un directorio
+            sufijo: Texto que distingue los archivos parciales de este flujo
+        """
+        self.archivos = []
+        for nombre, tamano in entradas:
+            ruta = ruta_segura(nombre)
+            if tamano is None:
+                os.makedirs(ruta, exist_ok=True)
+                continue
+            if tamano < 0 or tamano > MAX_FILE_SIZE:
+                raise Exception(f"Tamaño no permitido para '{nombre}': {tamano}")
+            if os.path.dirname(ruta):
+                os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            self.archivos.append((ruta, tamano, f"{ruta}.{sufijo}.parcial"))
+        self.tamano = sum(tamano for _, tamano, _ in self.archivos)
+        self.recibidos = 0
+        self.indice = 0       # Archivo que se está escribiendo
+        self.escritos = 0     # Bytes escritos de ese archivo
+        self.fd = None
+
+    def escribir(self, contenido):
+        vista = memoryview(contenido)
+        if self.recibidos + len(vista) > self.tamano:
+            raise Exception("Se recibieron más bytes de los anunciados")
+        self.recibidos += len(vista)
+        while vista:
+            ruta, tamano, parcial = self.archivos[self.indice]
+            if self.fd is None:
+                self.fd = os.open(parcial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+            n = min(len(vista), tamano - self.escritos)
+            escribir_en(self.fd, vista[:n], self.escritos)
+            vista = vista[n:]
+            self.escritos += n
+            if self.escritos == tamano:
+                os.close(self.fd)
+                self.fd = None
+                self.indice += 1
+                self.escritos = 0
+            # Los archivos vacíos no tienen datos: se crean al terminar
+            while self.indice < len(self.archivos) and self.archivos[self.indice][1] == 0:
+                self.indice += 1
+
+    def terminar(self):
+        """Da a cada archivo parcial su nombre definitivo"""
+        if self.recibidos != self.tamano:
+            raise Exception(f"Se recibieron {self.recibidos} de {self.tamano} bytes")
+        for ruta, tamano, parcial in self.archivos:
+            if tamano == 0:
+                open(parcial, 'wb').close()
+            os.replace(parcial, ruta)
+        return len(self.archivos)
+
+    def descartar(self):
+        if self.fd is not None:
+            try:
+                os.close(self.fd)
+            except OSError:
+                pass
+            self.fd = None
+        for _, _, parcial in self.archivos:
+            if os.path.exists(parcial):
+                os.remove(parcial)
+
+class ReenvioSalto:
+    """
+    Cola acotada y hilo escritor hacia un siguiente salto de una conexión entrante.
+
+    El hilo lector de la conexión entrante sólo encola las tramas; este hilo
+    abre los flujos en la conexión del siguiente salto y les pasa los datos.
+    Así un salto lento, o con MAX_FLUJOS_EN_VUELO archivos sin respuesta,
+    sólo detiene a los flujos que van hacia él. Si su cola sigue llena tras
+    TIEMPO_ESPERA_COLA, el flujo falla en lugar de bloquear al lector, y
+    mientras siga llena los flujos nuevos fallan sin volver a esperar.
+    """
+    def __init__(self, entrante, ip):
+        self.entrante = entrante
+        self.ip = ip
+        self.cola = queue.Queue()
+        self.huecos = threading.BoundedSemaphore(MAX_TRAMAS_COLA_SALTO)
+        self.detenido = False
+        self.flujos = {}  # id entrante -> Flujo en la conexión del siguiente salto; None si ya falló
+        threading.Thread(target=self._escribir, daemon=True).start()
+
+    def encolar(self, id_flujo, tipo, contenido=b''):
+        """
+        Encola una trama para el siguiente salto.
+
+        Las cancelaciones no ocupan hueco en la cola, así un flujo siempre
+        se puede abandonar.
+
+        Returns:
+            False si la cola siguió llena (el salto no avanza)
+        """
+        if tipo not in (TRAMA_CANCELAR, DESCARTAR):
+            if not self.huecos.acquire(timeout=0 if self.detenido else TIEMPO_ESPERA_COLA):
+                self.detenido = True
+                return False
+            self.detenido = False
+        self.cola.put((id_flujo, tipo, contenido))
+        return True
+
+    def cerrar(self):
+        """Termina el hilo escritor después de las tramas ya encoladas"""
+        self.cola.put(None)
+
+    def _escribir(self):
+        while True:
+            elemento = self.cola.get()
+            if elemento is None:
+                return
+            id_flujo, tipo, contenido = elemento
+            try:
+                self._reenviar(id_flujo, tipo, contenido)
+            except Exception as e:
+                print(f"[ERROR] Flujo {id_flujo} hacia {self.ip} fallido: {e}")
+                self._abandonar(self.flujos.get(id_flujo))
+                self.flujos[id_flujo] = None
+                self.entrante.responder(id_flujo, {'completo': False, 'error': str(e)})
+                if tipo in (TRAMA_FIN, TRAMA_CANCELAR, DESCARTAR):
+                    del self.flujos[id_flujo]
+            finally:
+                if tipo not in (TRAMA_CANCELAR, DESCARTAR):
+                    self.huecos.release()
+
+    def _reenviar(self, id_flujo, tipo, contenido):
+        if tipo == TRAMA_ABRIR:
+            self.flujos[id_flujo] = self.entrante.pool.conexion(self.ip).abrir_flujo(
+                contenido, al_responder=lambda respuesta: self.entrante.responder(id_flujo, respuesta))
+            return
+        if id_flujo not in self.flujos:
+            return
+        siguiente = self.flujos[id_flujo]
+        if tipo in (TRAMA_FIN, TRAMA_CANCELAR, DESCARTAR):
+            del self.flujos[id_flujo]
+        if siguiente is None:
+            return  # El flujo ya falló y se respondió; se descarta el resto
+        if tipo == TRAMA_DATOS:
+            siguiente.enviar(contenido)
+        elif tipo == TRAMA_FIN:
+            siguiente.terminar()
+        elif tipo == TRAMA_CANCELAR:
+            siguiente.cancelar()
+        elif tipo == DESCARTAR:
+            self._abandonar(siguiente)
+
+    def _abandonar(self, siguiente):
+        if siguiente is not None:
+            siguiente.al_responder = None
+            siguiente.cancelar()
+
+class ConexionEntrante(ConexionMultiplexada):
+    """
+    Lado que recibe los flujos: guarda los archivos destinados a este nodo
+    y reenvía los demás al siguiente salto por el pool de conexiones.
+
+    Los archivos reenviados pasan por un ReenvioSalto por cada siguiente
+    salto, así el hilo lector no se bloquea escribiendo en otro nodo. Las
+    respuestas llegan por la conexión del siguiente salto y se devuelven al
+    emisor por esta misma conexión.
+    """
+    def __init__(self, sock, pool):
+        super().__init__(sock)
+        self.pool = pool
+        self.flujos = {}   # id -> ArchivosEntrantes o ReenvioSalto; None si ya falló
+        self.saltos = {}   # IP del siguiente salto -> ReenvioSalto
+
+    def responder(self, id_flujo, respuesta):
+        try:
+            self.enviar_trama(id_flujo, TRAMA_RESPUESTA, json.dumps(respuesta).encode())
+        except OSError:
+            pass
+
+    def al_recibir_trama(self, id_flujo, tipo, contenido):
+        if tipo == TRAMA_ABRIR:
+            self.abrir(id_flujo, json.loads(bytes(contenido).decode()))
+            return
+        if id_flujo not in self.flujos:
+            raise Exception(f"Trama de tipo {tipo} para el flujo desconocido {id_flujo}")
+
+        destino = self.flujos[id_flujo]
+        if destino is None:
+            # El flujo ya falló y se respondió; se descarta el resto
+            if tipo in (TRAMA_FIN, TRAMA_CANCELAR):
+                del self.flujos[id_flujo]
+            return
+        try:
+            if isinstance(destino, ReenvioSalto):
+                self.reenviar(id_flujo, destino, tipo, contenido)
+            else:
+                self.guardar(id_flujo, destino, tipo, contenido)
+        except Exception as e:
+            print(f"[ERROR] Flujo {id_flujo} desde {self.ip_remota} fallido: {e}")
+            self.descartar(id_flujo)
+            self.flujos[id_flujo] = None
+            self.responder(id_flujo, {'completo': False, 'error': str(e)})
+            if tipo in (TRAMA_FIN, TRAMA_CANCELAR):
+                del self.flujos[id_flujo]
+
+    def abrir(self, id_flujo, cabecera):
+        saltos = cabecera.get('ruta') or []
+        try:
+            if saltos:
+                # Reenviar al siguiente salto con el resto de la ruta
+                if saltos[0] not in self.saltos:
+                    self.saltos[saltos[0]] = ReenvioSalto(self, saltos[0])
+                salto = self.saltos[saltos[0]]
+                if not salto.encolar(id_flujo, TRAMA_ABRIR, dict(cabecera, ruta=saltos[1:])):
+                    raise Exception(f"El siguiente salto {salto.ip} no avanza")
+                self.flujos[id_flujo] = salto
+                return
+
+            # Un lote trae la lista de sus archivos; un archivo suelto, sólo su nombre y tamaño
+            entradas = cabecera['archivos'] if cabecera.get('tipo') == 'lote' else [(cabecera['nombre'], cabecera['tamano'])]
+            self.flujos[id_flujo] = ArchivosEntrantes(entradas, f"{self.ip_remota}.{id_flujo}")
+        except Exception as e:
+            print(f"[ERROR] No se pudo abrir el flujo de '{cabecera.get('nombre')}': {e}")
+            self.flujos[id_flujo] = None
+            self.responder(id_flujo, {'completo': False, 'error': str(e)})
+
+    def guardar(self, id_flujo, archivos, tipo, contenido):
+        """Escribe los archivos destinados a este nodo"""
+        if tipo == TRAMA_DATOS:
+            archivos.escribir(contenido)
+        elif tipo == TRAMA_FIN:
+            del self.flujos[id_flujo]
+            try:
+                cantidad = archivos.terminar()
+            except Exception:
+                archivos.descartar()
+                raise
+            self.responder(id_flujo, {'recibidos': archivos.recibidos, 'archivos': cantidad, 'completo': True})
+        elif tipo == TRAMA_CANCELAR:
+            self.descartar(id_flujo)
+            del self.flujos[id_flujo]
+
+    def reenviar(self, id_flujo, salto, tipo, contenido):
+        """Encola una trama de un archivo reenviado para el siguiente salto"""
+        if not salto.encolar(id_flujo, tipo, contenido):
+            raise Exception(f"El siguiente salto {salto.ip} no avanza")
+        if tipo in (TRAMA_FIN, TRAMA_CANCELAR):
+            del self.flujos[id_flujo]
+
+    def descartar(self, id_flujo):
+        """Abandona un flujo: borra el archivo parcial o cancela el reenvío"""
+        destino = self.flujos.get(id_flujo)
+        if isinstance(destino, ReenvioSalto):
+            destino.encolar(id_flujo, DESCARTAR)
+        elif destino is not None:
+            destino.descartar()
+
+    def al_cerrar(self, error):
+        for id_flujo in list(self.flujos):
+            self.descartar(id_flujo)
+        self.flujos.clear()
+        for salto in self.saltos.values():
+            salto.cerrar()
+        if error:
+            print(f"[Servidor] Conexión multiplexada con {self.ip_remota} cerrada: {error}")
+
+def servir(puerto=PUERTO_MULTIPLEXADO, pool=None):
+    """
+    Atiende conexiones multiplexadas: guarda los archivos para este nodo y reenvía los demás.
+
+    Cada conexión es de larga duración y tiene su propio hilo lector, así
+    que hay tantos hilos como nodos vecinos conectados, no como archivos.
+    """
+    pool = pool or pool_compartido()
+    servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    servidor.bind(('0.0.0.0', puerto))
+    servidor.listen(16)
+    print(f"[Servidor] Esperando conexiones multiplexadas en el puerto {puerto}...")
+    while True:
+        conn, addr = servidor.accept()
+        print(f"[Servidor] Conexión multiplexada desde {addr[0]}")
+        ConexionEntrante(conn, pool).iniciar()
+
+def enviar_archivo(conexion, archivo, cabecera, al_enviar=None):
+    """
+    Abre un flujo y envía un archivo por él, sin esperar la respuesta.
+
+    Args:
+        conexion: ConexionSaliente hacia el primer salto
+        archivo: Ruta local del archivo
+        cabecera: Metadatos del flujo (nombre, destino, ruta restante); se completa el tamaño
+        al_enviar: Función opcional que recibe los bytes de cada bloque enviado
+
+    Returns:
+        El Flujo abierto
+    """
+    tamano = os.path.getsize(archivo)
+    cabecera = dict(cabecera, tamano=tamano)
+    with open(archivo, 'rb') as f:
+        if tamano <= MAX_DATOS_TRAMA:
+            # Archivo pequeño: apertura, datos y fin en un solo envío
+            flujo = conexion.abrir_flujo(cabecera, f.read(tamano))
+            if al_enviar:
+                al_enviar(tamano)
+            return flujo
+        flujo = conexion.abrir_flujo(cabecera)
+        try:
+            flujo.enviar_rango(f, 0, tamano, al_enviar)
+            flujo.terminar()
+        except OSError:
+            flujo.cancelar()
+            raise
+    return flujo
+
+def enviar_lote(conexion, lote, cabecera, al_enviar=None):
+    """
+    Envía varios archivos pequeños en un solo flujo, sin esperar la respuesta.
+
+    La cabecera lleva la lista de archivos (ruta relativa y tamaño) y los
+    contenidos van seguidos en ese orden, así el lote entero cuesta una
+    apertura y una respuesta en lugar de una por archivo.
+
+    Args:
+        conexion: ConexionSaliente hacia el primer salto
+        lote: Lista de (ruta local, ruta relativa, tamaño); tamaño None es un directorio
+        cabecera: Metadatos del flujo (destino, ruta restante)
+        al_enviar: Función opcional que recibe los bytes enviados
+
+    Returns:
+        El Flujo abierto
+    """
+    datos = bytearray()
+    entradas = []
+    for archivo, relativa, tamano in lote:
+        if tamano is not None:
+            with open(archivo, 'rb') as f:
+                contenido = f.read(tamano)
+            # El archivo pudo cambiar desde que se recorrió el directorio
+            tamano = len(contenido)
+            datos += contenido
+        entradas.append((relativa, tamano))
+    cabecera = dict(cabecera, tipo='lote', nombre=f"lote de {len(entradas)} entradas", tamano=len(datos), archivos=entradas)
+    flujo = conexion.abrir_flujo(cabecera, bytes(datos) if len(datos) <= MAX_DATOS_TRAMA else None)
+    if len(datos) > MAX_DATOS_TRAMA:
+        try:
+            flujo.enviar(datos)
+            flujo.terminar()
+        except OSError:
+            flujo.cancelar()
+            raise
+    if al_enviar:
+        al_enviar(len(datos))
+    return flujo
+
+def recorrer_directorio(directorio):
+    """
+    Recorre un árbol de directorios sin cargarlo entero en memoria.
+
+    Los enlaces simbólicos no se siguen, para no salir del árbol ni entrar en ciclos.
+
+    Yields:
+        (ruta local, ruta relativa con '/', tamaño); tamaño None es un directorio.
+        Las rutas relativas empiezan con el nombre del directorio recorrido.
+    """
+    directorio = os.path.normpath(directorio)
+    base = os.path.dirname(os.path.abspath(directorio))
+    pendientes = [directorio]
+    while pendientes:
+        actual = pendientes.pop()
+        yield actual, os.path.relpath(os.path.abspath(actual), base).replace(os.sep, '/'), None
+        with os.scandir(actual) as entradas:
+            for entrada in entradas:
+                if entrada.is_dir(follow_symlinks=False):
+                    pendientes.append(entrada.path)
+                elif entrada.is_file(follow_symlinks=False):
+                    relativa = os.path.relpath(os.path.abspath(entrada.path), base).replace(os.sep, '/')
+                    yield entrada.path, relativa, entrada.stat(follow_symlinks=False).st_size
+
+def enviar_archivos(ruta, archivos, al_enviar=None, pool=None, tiempo_espera=TIEMPO_ESPERA_RESPUESTA):
+    """
+    Envía archivos y directorios completos por la conexión multiplexada con el primer salto de una ruta.
+
+    Los archivos se envían uno tras otro sin esperar la respuesta de cada
+    uno (las respuestas se recogen al final), así muchos archivos pequeños
+    viajan seguidos por una conexión ya abierta en lugar de pagar una
+    conexión nueva y un viaje de ida y vuelta cada uno. Los directorios se
+    recorren a medida que se envían: sus archivos pequeños se agrupan en
+    lotes (hasta MAX_ARCHIVOS_LOTE archivos, MAX_BYTES_LOTE bytes o
+    MAX_CABECERA_LOTE bytes de rutas en la cabecera) y los grandes se
+    envían en su propio flujo; el receptor recrea el árbol.
+
+    Args:
+        ruta: Lista de IPs [origen, ..., destino]; todos los nodos de la ruta
+            deben estar ejecutando el servicio multiplexado
+        archivos: Rutas de los archivos o directorios a enviar
+        al_enviar: Función opcional que recibe los bytes de cada bloque enviado
+        pool: Pool de conexiones (por omisión el del proceso)
+        tiempo_espera: Segundos que se esperan las respuestas tras enviar el
+            último archivo; los flujos sin respuesta se cancelan y fallan
+
+    Returns:
+        Lista de (archivo o lote, respuesta del destino)
+    """
+    pool = pool or pool_compartido()
+    cabecera = {'destino': ruta[-1], 'ruta': ruta[2:]}
+    flujos = []
+
+    def enviar(descripcion, funcion, contenido, cabecera_flujo):
+        try:
+            flujos.append((descripcion, funcion(pool.conexion(ruta[1]), contenido, cabecera_flujo, al_enviar)))
+        except OSError as e:
+            print(f"[ERROR] No se pudo enviar '{descripcion}': {e}")
+            flujos.append((descripcion, None))
+
+    for archivo in archivos:
+        if not os.path.isdir(archivo):
+            enviar(archivo, enviar_archivo, archivo, dict(cabecera, nombre=os.path.basename(archivo)))
+            continue
+
+        lote, bytes_lote, bytes_cabecera = [], 0, 0
+        for local, relativa, tamano in recorrer_directorio(archivo):
+            if tamano is not None and tamano > MAX_TAMANO_LOTE:
+                enviar(local, enviar_archivo, local, dict(cabecera, nombre=relativa))
+                continue
+            # Cada entrada ocupa en la cabecera lo mismo que su JSON más el separador; con rutas
+            # largas la trama de apertura superaría MAX_CONTENIDO_TRAMA y el receptor cortaría
+            # la conexión con todos sus flujos
+            bytes_entrada = len(json.dumps([relativa, tamano])) + 2
+            if lote and (len(lote) >= MAX_ARCHIVOS_LOTE or bytes_lote + (tamano or 0) > MAX_BYTES_LOTE
+                         or bytes_cabecera + bytes_entrada > MAX_CABECERA_LOTE):
+                enviar(f"{lote[0][0]} (+{len(lote) - 1})", enviar_lote, lote, cabecera)
+                lote, bytes_lote, bytes_cabecera = [], 0, 0
+            lote.append((local, relativa, tamano))
+            bytes_lote += tamano or 0
+            bytes_cabecera += bytes_entrada
+        if lote:
+            enviar(f"{lote[0][0]} (+{len(lote) - 1})", enviar_lote, lote, cabecera)
+
+    # Un salto que mantiene la conexión abierta sin responder no debe colgar al emisor
+    limite = time.time() + tiempo_espera
+    resultados = []
+    for descripcion, flujo in flujos:
+        if flujo is None:
+            resultados.append((descripcion, {'completo': False, 'error': 'No enviado'}))
+            continue
+        respuesta = flujo.esperar_respuesta(max(0, limite - time.time()))
+        if respuesta is None:
+            flujo.cancelar(f"Sin respuesta del destino en {tiempo_espera} segundos")
+            respuesta = flujo.respuesta
+        resultados.append((descripcion, respuesta))
+    return resultados
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        servir()
+    elif len(sys.argv) >= 4 and sys.argv[1] == 'enviar':
+        argumentos = sys.argv[2:]
+        saltos = []
+        if '--saltos' in argumentos:
+            posicion = argumentos.index('--saltos')
+            saltos = argumentos[posicion + 1].split(',')
+            del argumentos[posicion:posicion + 2]
+        ip_destino, archivos = argumentos[0], argumentos[1:]
+
+        inicio = time.time()
+        resultados = enviar_archivos(['origen'] + saltos + [ip_destino], archivos)
+        fallidos = [archivo for archivo, respuesta in resultados if not (respuesta or {}).get('completo')]
+        recibidos = sum(respuesta.get('archivos', 1) for _, respuesta in resultados if (respuesta or {}).get('completo'))
+        print(f"[Cliente] {len(resultados) - len(fallidos)} de {len(resultados)} envíos completos "
+              f"({recibidos} archivos) en {time.time() - inicio:.2f} segundos")
+        for archivo in fallidos:
+            print(f"[ERROR] '{archivo}' no llegó: {dict(resultados)[archivo]}")
+        if fallidos:
+            sys.exit(1)
+    else:
+        print("Uso: python multiplexado.py                      (atiende conexiones en el puerto 5053)\n"
+              "     python multiplexado.py enviar <ip_destino> <archivo|directorio> [...] [--saltos ip1,ip2]")
@@ -1,87 +1,595 @@
 import socket
 import json
 import os
+import sys
+import time
+import threading
+import itertools
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from transporte import enviar_rango, recibir_exacto, enviar_mensaje, recibir_mensaje
+from medicion import es_flujo_parcial, registrar_transferencia
+from tabla_rutas import tabla_rutas_compartida
+from topologia import topologia_compartida
+from arbol_expansion import siguiente_salto_arbol
 
 PUERTO_ESCUCHA = 5050
 PUERTO_DESTINO = 5051
 BUFFER_SIZE = 4096
 MAX_FILE_SIZE = 3 * 1024 * 1024 * 1024
 
-def recibir_y_reenviar():
-    servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    servidor.bind(('0.0.0.0', PUERTO_ESCUCHA))
-    servidor.listen(5)
-    print(f"[Servidor] Esperando archivos en el puerto {PUERTO_ESCUCHA}...")
+# Límites de concurrencia del nodo principal
+MAX_CONEXIONES_SIMULTANEAS = 16  # Transferencias entrantes atendidas a la vez
+MAX_REENVIOS_SIMULTANEOS = 8     # Reenvíos salientes hacia los receptores a la vez
+TIEMPO_ESPERA_SOCKET = 60        # Segundos sin datos antes de abandonar una conexión
+
+# Reenvío en corte (cut-through): se abre el destino al llegar los metadatos
+MODO_CUT_THROUGH = True
+MAX_BUFFER_MEMORIA = 8 * 1024 * 1024  # Bytes en memoria antes de desbordar a disco
+
+# Enrutamiento salto a salto: máximo de nodos principales que puede atravesar un archivo
+MAX_SALTOS = 16
+
+# Planificación de los reenvíos: clases de prioridad según el tamaño del archivo
+CLASES_PRIORIDAD = ('interactiva', 'normal', 'masiva')
+TAMANO_INTERACTIVO = 1024 * 1024          # Hasta aquí, clase interactiva (el más corto primero)
+TAMANO_MASIVO = 256 * 1024 * 1024         # Desde aquí (o sin tamaño), clase masiva
+CUPOS_RESERVADOS_INTERACTIVOS = 2         # Conexiones y reenvíos que sólo usan los archivos pequeños
+MAX_BYTES_ADMITIDOS = 2 * MAX_FILE_SIZE   # Bytes anunciados de los archivos admitidos a la vez
+CAPACIDAD_POR_OMISION = 1.0               # Peso de un enlace sin medición de ancho de banda
+TIEMPO_DRENAJE_RECHAZO = 1                # Segundos descartando datos tras responder un rechazo
+
+class BufferDesborde:
+    """
+    Cola FIFO de bytes entre la conexión entrante y la saliente.
+
+    Mientras el destino consume al ritmo del origen los datos se quedan en
+    memoria (como máximo MAX_BUFFER_MEMORIA bytes). Si el destino es más
+    lento, los datos nuevos se escriben en un archivo de desborde y se leen
+    de ahí en orden; al vaciarse el desborde se vuelve a usar la memoria.
+    """
+    def __init__(self, ruta_desborde, max_memoria=MAX_BUFFER_MEMORIA):
+        self.ruta_desborde = ruta_desborde
+        self.max_memoria = max_memoria
+        self.memoria = deque()
+        self.bytes_memoria = 0
+        self.desborde = None
+        self.en_desborde = False
+        self.pos_escritura = 0
+        self.pos_lectura = 0
+        self.cerrado = False
+        self.error = None
+        self.condicion = threading.Condition()
+
+    def escribir(self, datos):
+        """Agrega datos al final de la cola"""
+        with self.condicion:
+            if self.error:
+                raise self.error
+            if not self.en_desborde and self.bytes_memoria + len(datos) <= self.max_memoria:
+                self.memoria.append(datos)
+                self.bytes_memoria += len(datos)
+            else:
+                # El destino va más lento que el origen: desbordar a disco
+                if self.desborde is None:
+                    self.desborde = open(self.ruta_desborde, 'w+b')
+                self.en_desborde = True
+                self.desborde.seek(self.pos_escritura)
+                self.desborde.write(datos)
+                self.pos_escritura += len(datos)
+            self.condicion.notify_all()
+
+    def cerrar(self):
+        """Indica que el origen ya no enviará más datos"""
+        with self.condicion:
+            self.cerrado = True
+            self.condicion.notify_all()
+
+    def abortar(self, error):
+        """Marca la cola como fallida para detener al productor"""
+        with self.condicion:
+            self.error = error
+            self.condicion.notify_all()
+
+    def leer(self):
+        """Devuelve el siguiente bloque de datos, o b'' cuando ya no hay más"""
+        with self.condicion:
+            while not self.memoria and self.pos_lectura == self.pos_escritura and not self.cerrado:
+                self.condicion.wait()
+
+            if self.memoria:
+                datos = self.memoria.popleft()
+                self.bytes_memoria -= len(datos)
+                return datos
+
+            if self.pos_lectura < self.pos_escritura:
+                self.desborde.seek(self.pos_lectura)
+                datos = self.desborde.read(min(BUFFER_SIZE, self.pos_escritura - self.pos_lectura))
+                self.pos_lectura += len(datos)
+                if self.pos_lectura == self.pos_escritura:
+                    # Desborde vaciado: volver a trabajar en memoria
+                    self.desborde.truncate(0)
+                    self.pos_lectura = self.pos_escritura = 0
+                    self.en_desborde = False
+                return datos
+
+            return b""
+
+    def liberar(self):
+        """Cierra y elimina el archivo de desborde si se llegó a crear"""
+        if self.desborde is not None:
+            self.desborde.close()
+            self.desborde = None
+        if os.path.exists(self.ruta_desborde):
+            os.remove(self.ruta_desborde)
+
+class SolicitudReenvio:
+    """Un archivo admitido en el nodo, a la espera de reenviarse o reenviándose"""
+    def __init__(self, clase, tamano, enlace, capacidad):
+        self.clase = clase
+        self.tamano = tamano
+        self.enlace = enlace          # IP del siguiente salto
+        self.capacidad = capacidad    # Ancho de banda medido del enlace (peso en el reparto)
+        self.inicio_virtual = 0       # Orden de reparto justo entre enlaces
+        self.orden = 0
+        self.concedida = False
+        self.bytes_admitidos = tamano
+
+    def prioridad(self):
+        # Interactiva: el más corto primero. Normal y masiva: reparto justo entre enlaces
+        if self.clase == 0:
+            return (0, self.tamano, self.orden)
+        return (self.clase, self.inicio_virtual, self.orden)
+
+class PlanificadorReenvios:
+    """
+    Decide qué archivo se reenvía cuando hay más archivos que cupos de reenvío.
+
+    Cada archivo admitido tiene una clase según su tamaño (CLASES_PRIORIDAD).
+    Los interactivos pasan antes que los demás y, entre ellos, el más
+    corto primero, así un archivo pequeño no espera detrás de uno grande.
+    Los normales y masivos se reparten los cupos entre los enlaces de
+    salida en proporción a su ancho de banda medido (reparto justo
+    ponderado por tiempo virtual): cada archivo avanza el tiempo virtual
+    de su enlace en tamaño / capacidad y se atiende el de menor tiempo.
+
+    Para que los archivos grandes no acaparen el nodo, siempre quedan
+    CUPOS_RESERVADOS_INTERACTIVOS conexiones y reenvíos para los
+    interactivos, y al menos un archivo grande avanza aunque haya muchos
+    pequeños esperando. El control de admisión rechaza los archivos que
+    excederían los cupos de su clase o MAX_BYTES_ADMITIDOS.
+    """
+    def __init__(self, max_reenvios=MAX_REENVIOS_SIMULTANEOS, max_conexiones=MAX_CONEXIONES_SIMULTANEAS):
+        self.max_reenvios = max_reenvios
+        self.max_admitidos_grandes = max(1, max_conexiones - CUPOS_RESERVADOS_INTERACTIVOS)
+        self.max_activos_grandes = max(1, max_reenvios - CUPOS_RESERVADOS_INTERACTIVOS)
+        self.cola = []
+        self.activos = 0
+        self.activos_grandes = 0
+        self.admitidos_grandes = 0
+        self.bytes_admitidos = 0
+        self.tiempo_virtual = 0.0
+        self.fin_enlace = {}   # IP del siguiente salto -> tiempo virtual en que termina su último archivo
+        self.contador = itertools.count()
+        self.condicion = threading.Condition()
 
-    while True:
-        conn, addr = servidor.accept()
-        print(f"[Servidor] Conexión desde {addr[0]}")
+    def admitir(self, paquete, ip_local):
+        """
+        Admite un archivo recién anunciado o lo rechaza.
 
+        Returns:
+            La SolicitudReenvio del archivo
+
+        Raises:
+            Exception: Si el archivo excede los límites del nodo
+        """
+        tamano = paquete.get('tamano')
+        if tamano is not None and tamano > MAX_FILE_SIZE:
+            raise Exception("Archivo excede 3GB")
+        if tamano is None:
+            clase = 2
+        else:
+            clase = 0 if tamano <= TAMANO_INTERACTIVO else 1 if tamano < TAMANO_MASIVO else 2
+        enlace = siguiente_salto(paquete, ip_local)
+        solicitud = SolicitudReenvio(clase, tamano or 0, enlace, capacidad_enlace(ip_local, enlace))
+
+        with self.condicion:
+            if clase > 0 and self.admitidos_grandes >= self.max_admitidos_grandes:
+                raise Exception(f"Nodo ocupado: {self.admitidos_grandes} archivos grandes en curso")
+            if self.bytes_admitidos + solicitud.tamano > MAX_BYTES_ADMITIDOS:
+                raise Exception(f"Nodo ocupado: {self.bytes_admitidos} bytes admitidos")
+            self.bytes_admitidos += solicitud.tamano
+            if clase > 0:
+                self.admitidos_grandes += 1
+        return solicitud
+
+    def terminar(self, solicitud):
+        """Libera lo que reservó la admisión de un archivo"""
+        with self.condicion:
+            self.bytes_admitidos -= solicitud.bytes_admitidos
+            if solicitud.clase > 0:
+                self.admitidos_grandes -= 1
+
+    @contextmanager
+    def turno(self, solicitud):
+        """Espera a que el planificador elija el archivo y ocupa un cupo de reenvío mientras dure"""
+        with self.condicion:
+            solicitud.orden = next(self.contador)
+            if solicitud.clase > 0:
+                # Inicio del archivo en el tiempo virtual: tras el anterior del mismo enlace
+                solicitud.inicio_virtual = max(self.tiempo_virtual, self.fin_enlace.get(solicitud.enlace, 0.0))
+                self.fin_enlace[solicitud.enlace] = (solicitud.inicio_virtual +
+                                                     max(solicitud.tamano, 1) / solicitud.capacidad)
+            self.cola.append(solicitud)
+            self._conceder()
+            while not solicitud.concedida:
+                self.condicion.wait()
         try:
-            # Recibir longitud del JSON (10 bytes)
-            data = conn.recv(10).decode().strip()
-            print(f"[DEBUG] Cabecera recibida: {data}")
-            metadata_len = int(data)
-
-            # Recibir el JSON exacto
-            metadata = b""
-            while len(metadata) < metadata_len:
-                remaining = metadata_len - len(metadata)
-                metadata += conn.recv(remaining)
-
-            paquete = json.loads(metadata.decode())
-            nombre = paquete['nombre']
-            destino_ip = paquete['destino']
-
-            # Guardar archivo temporal
-            temp_path = f"temp_{nombre}"
-            total_recibido = 0
-
-            with open(temp_path, 'wb') as f:
+            yield
+        finally:
+            with self.condicion:
+                self.activos -= 1
+                if solicitud.clase > 0:
+                    self.activos_grandes -= 1
+                self._conceder()
+
+    def _conceder(self):
+        """Asigna los cupos libres a los archivos en cola, en orden de prioridad"""
+        while self.cola and self.activos < self.max_reenvios:
+            grandes = [s for s in self.cola if s.clase > 0]
+            if grandes and self.activos_grandes == 0:
+                # Al menos un archivo grande avanza aunque haya pequeños esperando
+                elegida = min(grandes, key=SolicitudReenvio.prioridad)
+            else:
+                candidatas = [s for s in self.cola if s.clase == 0 or self.activos_grandes < self.max_activos_grandes]
+                if not candidatas:
+                    return
+                elegida = min(candidatas, key=SolicitudReenvio.prioridad)
+            self.cola.remove(elegida)
+            elegida.concedida = True
+            self.activos += 1
+            if elegida.clase > 0:
+                self.activos_grandes += 1
+                self.tiempo_virtual = max(self.tiempo_virtual, elegida.inicio_virtual)
+            self.condicion.notify_all()
+
+def capacidad_enlace(origen, destino):
+    """Ancho de banda (Mbps) del enlace origen -> destino según la topología, o CAPACIDAD_POR_OMISION"""
+    try:
+        grafo = topologia_compartida().grafo_csr()
+        u, v = grafo.indice.get(origen), grafo.indice.get(destino)
+        if u is not None and v is not None:
+            for posicion in range(grafo.inicios[u], grafo.inicios[u + 1]):
+                if grafo.destinos[posicion] == v and grafo.atributos['ancho_banda'][posicion] > 0:
+                    return grafo.atributos['ancho_banda'][posicion]
+    except Exception as e:
+        print(f"[ERROR] No se pudo leer la capacidad del enlace {origen} -> {destino}: {e}")
+    return CAPACIDAD_POR_OMISION
+
+def siguiente_salto(paquete, ip_local):
+    """IP del siguiente salto de un archivo (de su ruta o de la tabla de rutas)"""
+    if paquete.get('salto_a_salto') and not paquete.get('ruta'):
+        return siguiente_salto_tabla(paquete, ip_local)[0]
+    return (paquete.get('ruta') or [paquete['destino']])[0]
+
+def siguiente_salto_tabla(paquete, ip_local):
+    """
+    Siguiente salto de un archivo enrutado salto a salto.
+
+    Los metadatos no llevan la ruta sino la métrica ('salto_a_salto'); el
+    siguiente salto sale de la tabla de rutas de este nodo, o de la red
+    superpuesta del árbol de expansión si la métrica es 'arbol'.
+
+    Returns:
+        IP del siguiente salto y número de saltos que le quedan al archivo
+    """
+    destino = paquete['destino']
+    if paquete['salto_a_salto'] == 'arbol':
+        siguiente_ip = siguiente_salto_arbol(ip_local, destino)
+    else:
+        siguiente_ip = tabla_rutas_compartida().siguiente_salto(ip_local, destino, paquete['salto_a_salto'])
+    if siguiente_ip is None:
+        raise Exception(f"La tabla de rutas de {ip_local} no tiene ruta hacia {destino}")
+    ttl = paquete.get('ttl', MAX_SALTOS) - 1
+    if ttl <= 0 and siguiente_ip != destino:
+        raise Exception(f"Se superó el máximo de {MAX_SALTOS} saltos hacia {destino}")
+    return siguiente_ip, ttl
+
+def conectar_siguiente_salto(paquete, tamano, ip_local=None):
+    """
+    Abre la conexión con el siguiente salto de la ruta y le envía los metadatos.
+
+    El campo 'ruta' de los metadatos lleva los saltos que faltan después de
+    este nodo, terminando en el destino final. Si sólo queda el destino se
+    conecta a su receptor; si quedan más saltos se conecta al nodo principal
+    del siguiente salto y le pasa el resto de la ruta. Si en lugar de la
+    ruta viene 'salto_a_salto', el siguiente salto se busca en la tabla de
+    rutas (ver siguiente_salto_tabla).
+
+    Returns:
+        Socket conectado y la descripción (ip, puerto) del siguiente salto
+    """
+    nombre = paquete['nombre']
+
+    # Los demás campos (p. ej. los de una franja de archivo) se reenvían tal cual
+    campos = {clave: valor for clave, valor in paquete.items() if clave not in ('destino', 'ruta')}
+    campos['nombre'] = nombre
+    campos['tamano'] = tamano
+
+    if paquete.get('salto_a_salto') and not paquete.get('ruta'):
+        siguiente_ip, campos['ttl'] = siguiente_salto_tabla(paquete, ip_local)
+        if siguiente_ip != paquete['destino']:
+            puerto = PUERTO_ESCUCHA
+            campos['destino'] = paquete['destino']
+        else:
+            puerto = PUERTO_DESTINO
+    else:
+        saltos = paquete.get('ruta') or [paquete['destino']]
+        siguiente_ip, resto = saltos[0], saltos[1:]
+        if resto:
+            puerto = PUERTO_ESCUCHA
+            campos['destino'] = paquete['destino']
+            campos['ruta'] = resto
+        else:
+            puerto = PUERTO_DESTINO
+    metadata_envio = json.dumps(campos).encode()
+
+    cliente = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        cliente.settimeout(TIEMPO_ESPERA_SOCKET)
+        cliente.connect((siguiente_ip, puerto))
+        cliente.sendall(f"{len(metadata_envio):<10}".encode())
+        cliente.sendall(metadata_envio)
+    except Exception:
+        cliente.close()
+        raise
+    return cliente, (siguiente_ip, puerto)
+
+def reenviar_en_corte(conn, paquete, planificador, solicitud):
+    """
+    Reenvía el archivo al siguiente salto a medida que llega, sin esperar a tenerlo completo.
+
+    Si el tamaño es None (cuerpo comprimido al vuelo), se reenvía hasta que
+    el emisor cierra la conexión.
+
+    Args:
+        conn: Socket de la conexión entrante (ya sin metadatos)
+        paquete: Metadatos recibidos (nombre, destino, tamaño y ruta restante)
+        planificador: PlanificadorReenvios que reparte los reenvíos salientes
+        solicitud: SolicitudReenvio del archivo, ya admitido
+    """
+    nombre = paquete['nombre']
+    tamano = paquete['tamano']
+
+    with planificador.turno(solicitud):
+        cliente, (siguiente_ip, puerto) = conectar_siguiente_salto(paquete, tamano, conn.getsockname()[0])
+        buffer = BufferDesborde(f"desborde_{threading.get_ident()}_{os.path.basename(nombre)}")
+        resultado = {'enviados': 0, 'error': None, 'duracion': 0}
+
+        def enviar_al_destino():
+            inicio_envio = time.time()
+            try:
                 while True:
-                    chunk = conn.recv(BUFFER_SIZE)
+                    chunk = buffer.leer()
                     if not chunk:
                         break
-                    f.write(chunk)
-                    total_recibido += len(chunk)
-                    if total_recibido > MAX_FILE_SIZE:
-                        print("[ERROR] Archivo excede 3GB")
-                        os.remove(temp_path)
-                        return
+                    cliente.sendall(chunk)
+                    resultado['enviados'] += len(chunk)
+            except Exception as e:
+                resultado['error'] = e
+                buffer.abortar(e)
+            resultado['duracion'] = time.time() - inicio_envio
 
-            print(f"[Servidor] Archivo '{nombre}' recibido ({total_recibido} bytes)")
+        hilo_envio = threading.Thread(target=enviar_al_destino)
+        hilo_envio.start()
 
-            # Reenviar al receptor final
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as cliente:
-                    cliente.connect((destino_ip, PUERTO_DESTINO))
+        total_recibido = 0
+        inicio = time.time()
+        try:
+            while tamano is None or total_recibido < tamano:
+                chunk = conn.recv(BUFFER_SIZE if tamano is None else min(BUFFER_SIZE, tamano - total_recibido))
+                if not chunk:
+                    break
+                buffer.escribir(chunk)
+                total_recibido += len(chunk)
+                if total_recibido > MAX_FILE_SIZE:
+                    raise Exception("Archivo excede 3GB")
+            duracion_entrada = time.time() - inicio
+            buffer.cerrar()
+            hilo_envio.join()
+            if tamano is None and not resultado['error']:
+                # El siguiente salto también reenvía hasta el cierre: avisarle del final
+                cliente.shutdown(socket.SHUT_WR)
+
+            # Devolver al emisor la respuesta del receptor (p. ej. bloques faltantes);
+            # si el emisor cortó antes, cerrar para que el receptor guarde lo recibido
+            if paquete.get('espera_respuesta') and not resultado['error'] and (tamano is None or total_recibido == tamano):
+                enviar_mensaje(conn, recibir_mensaje(cliente))
+        finally:
+            buffer.cerrar()
+            hilo_envio.join()
+            cliente.close()
+            buffer.liberar()
+
+    if resultado['error']:
+        raise Exception(f"Reenvío fallido: {resultado['error']}")
+    if tamano is not None and total_recibido < tamano:
+        raise Exception(f"El emisor cerró la conexión tras {total_recibido} de {tamano} bytes")
 
-                    metadata_envio = json.dumps({
-                        'nombre': nombre,
-                        'tamano': total_recibido
-                    }).encode()
+    # Con el buffer de desborde de por medio, cada lado avanza al ritmo de su propio enlace
+    if not es_flujo_parcial(paquete):
+        ip_local = conn.getsockname()[0]
+        registrar_transferencia(conn.getpeername()[0], ip_local, total_recibido, duracion_entrada)
+        registrar_transferencia(ip_local, siguiente_ip, resultado['enviados'], resultado['duracion'])
 
-                    cliente.sendall(f"{len(metadata_envio):<10}".encode())
-                    cliente.sendall(metadata_envio)
+    print(f"[Servidor] Archivo '{nombre}' reenviado en corte a {siguiente_ip}:{puerto} "
+          f"({resultado['enviados']} bytes)")
 
+def reenviar_almacenando(conn, paquete, planificador, solicitud):
+    """
+    Recibe el archivo completo en disco y después lo reenvía al siguiente salto.
+
+    Se usa con emisores que no anuncian el tamaño en sus metadatos.
+    """
+    nombre = paquete['nombre']
+    # Guardar archivo temporal (el nombre incluye el hilo para no chocar con otra transferencia)
+    temp_path = f"temp_{threading.get_ident()}_{os.path.basename(nombre)}"
+    total_recibido = 0
+    inicio = time.time()
+
+    try:
+        with open(temp_path, 'wb') as f:
+            while True:
+                chunk = conn.recv(BUFFER_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                total_recibido += len(chunk)
+                if total_recibido > MAX_FILE_SIZE:
+                    print("[ERROR] Archivo excede 3GB")
+                    return
+
+        print(f"[Servidor] Archivo '{nombre}' recibido ({total_recibido} bytes)")
+        ip_local = conn.getsockname()[0]
+        if not es_flujo_parcial(paquete):
+            registrar_transferencia(conn.getpeername()[0], ip_local, total_recibido, time.time() - inicio)
+
+        # Reenviar al siguiente salto cuando el planificador le dé turno
+        solicitud.tamano = total_recibido
+        try:
+            with planificador.turno(solicitud):
+                cliente, (siguiente_ip, puerto) = conectar_siguiente_salto(paquete, total_recibido, ip_local)
+                with cliente:
+                    inicio = time.time()
                     with open(temp_path, 'rb') as f:
-                        while True:
-                            chunk = f.read(BUFFER_SIZE)
-                            if not chunk:
-                                break
-                            cliente.sendall(chunk)
+                        enviar_rango(cliente, f, 0, total_recibido)
+                    if not es_flujo_parcial(paquete):
+                        registrar_transferencia(ip_local, siguiente_ip, total_recibido, time.time() - inicio)
 
-                print(f"[Servidor] Archivo reenviado a {destino_ip}:{PUERTO_DESTINO}")
-            except Exception as e:
-                print(f"[ERROR] Reenvío fallido: {e}")
-            finally:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+            print(f"[Servidor] Archivo reenviado a {siguiente_ip}:{puerto}")
+        except Exception as e:
+            print(f"[ERROR] Reenvío fallido: {e}")
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def rechazar(conn, motivo):
+    """
+    Responde a un archivo no admitido con un rechazo (mismo formato que las respuestas del receptor).
+
+    Cerrar con datos sin leer en el socket hace que el sistema corte la
+    conexión con un RST y descarte la respuesta todavía sin enviar; por eso
+    se cierra primero el lado de escritura y se descartan durante un
+    momento los datos que sigue mandando el emisor.
+    """
+    enviar_mensaje(conn, {'completo': False, 'rechazado': True, 'error': motivo})
+    conn.shutdown(socket.SHUT_WR)
+    conn.settimeout(TIEMPO_DRENAJE_RECHAZO)
+    limite = time.time() + TIEMPO_DRENAJE_RECHAZO
+    try:
+        while time.time() < limite and conn.recv(BUFFER_SIZE * 16):
+            pass
+    except OSError:
+        pass
+
+def atender_conexion(conn, addr, planificador):
+    """
+    Recibe un archivo de una conexión y lo reenvía a su destino final.
 
+    Args:
+        conn: Socket de la conexión entrante
+        addr: Dirección del nodo que envía
+        planificador: PlanificadorReenvios que admite y ordena los reenvíos
+    """
+    try:
+        conn.settimeout(TIEMPO_ESPERA_SOCKET)
+
+        # Recibir longitud del JSON (10 bytes)
+        data = recibir_exacto(conn, 10).decode().strip()
+        metadata_len = int(data)
+
+        # Recibir el JSON exacto
+        metadata = recibir_exacto(conn, metadata_len)
+
+        paquete = json.loads(metadata.decode())
+        if paquete.get('salto_a_salto') and not paquete.get('ruta'):
+            print(f"[Servidor] '{paquete['nombre']}' hacia {paquete['destino']}, "
+                  f"salto a salto por {paquete['salto_a_salto']}")
+        else:
+            print(f"[Servidor] '{paquete['nombre']}' hacia {paquete['destino']}, "
+                  f"saltos restantes: {paquete.get('ruta') or [paquete['destino']]}")
+
+        try:
+            solicitud = planificador.admitir(paquete, conn.getsockname()[0])
         except Exception as e:
-            print(f"[ERROR] Fallo al procesar conexión: {e}")
+            print(f"[Servidor] '{paquete['nombre']}' rechazado: {e}")
+            # El emisor ya envió los metadatos (y quizá parte de los datos): responderle
+            # para que no confunda el rechazo con un fallo de la red
+            rechazar(conn, str(e))
+            return
+
+        try:
+            # Con el tamaño en los metadatos se puede reenviar sin esperar al archivo completo
+            # (las consultas que esperan respuesta siempre se reenvían así)
+            if (MODO_CUT_THROUGH or paquete.get('espera_respuesta')) and 'tamano' in paquete:
+                reenviar_en_corte(conn, paquete, planificador, solicitud)
+            else:
+                reenviar_almacenando(conn, paquete, planificador, solicitud)
         finally:
-            conn.close()
+            planificador.terminar(solicitud)
+
+    except Exception as e:
+        print(f"[ERROR] Fallo al procesar conexión de {addr[0]}: {e}")
+    finally:
+        conn.close()
+
+def recibir_y_reenviar(max_conexiones=MAX_CONEXIONES_SIMULTANEAS, max_reenvios=MAX_REENVIOS_SIMULTANEOS):
+    """
+    Acepta transferencias concurrentes y las reenvía a su destino.
+
+    Cada conexión se atiende en un hilo de un pool acotado. Cuando todos los
+    cupos están ocupados el servidor deja de aceptar, de modo que los nuevos
+    emisores esperan en la cola del socket (contrapresión) en lugar de
+    saturar el nodo. El orden de los reenvíos lo decide el planificador
+    (ver PlanificadorReenvios).
+
+    Args:
+        max_conexiones: Número máximo de transferencias atendidas a la vez
+        max_reenvios: Número máximo de reenvíos salientes a la vez
+    """
+    servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    servidor.bind(('0.0.0.0', PUERTO_ESCUCHA))
+    servidor.listen(max(5, max_conexiones))
+    print(f"[Servidor] Esperando archivos en el puerto {PUERTO_ESCUCHA} "
+          f"(máx. {max_conexiones} conexiones, {max_reenvios} reenvíos simultáneos)...")
+
+    cupos = threading.BoundedSemaphore(max_conexiones)
+    planificador = PlanificadorReenvios(max_reenvios, max_conexiones)
+
+    def atender_y_liberar(conn, addr):
+        try:
+            atender_conexion(conn, addr, planificador)
+        finally:
+            cupos.release()
+
+    with ThreadPoolExecutor(max_workers=max_conexiones) as pool:
+        while True:
+            # No aceptar más conexiones hasta que haya un cupo libre
+            cupos.acquire()
+            try:
+                conn, addr = servidor.accept()
+            except Exception:
+                cupos.release()
+                raise
+            print(f"[Servidor] Conexión desde {addr[0]}")
+            pool.submit(atender_y_liberar, conn, addr)
 
 if __name__ == "__main__":
-    recibir_y_reenviar()
+    if len(sys.argv) > 3:
+        print("Uso: python nodo_principal.py [max_conexiones] [max_reenvios]")
+    else:
+        max_conexiones = int(sys.argv[1]) if len(sys.argv) > 1 else MAX_CONEXIONES_SIMULTANEAS
+        max_reenvios = int(sys.argv[2]) if len(sys.argv) > 2 else MAX_REENVIOS_SIMULTANEOS
+        recibir_y_reenviar(max_conexiones, max_reenvios)
@@ -2,24 +2,204 @@ import socket
 import json
 import sys
 import os
+import math
+import time
+import hashlib
+import threading
+import uuid
+import mmap
+from transporte import enviar_rango, recibir_mensaje
+from delta import calcular_delta, tamano_cuerpo, enviar_delta
+from compresion import codecs, elegir_codec, enviar_comprimido
+from medicion import registrar_transferencia
+from concurrent.futures import ThreadPoolExecutor
+from tabla_rutas import rutas_alternativas, PlanificadorRutas
+from topologia import topologia_compartida
+from multiplexado import enviar_archivos
 
-BUFFER_SIZE = 4096
 PUERTO_NODO_PRINCIPAL = 5050
+PUERTO_RECEPTOR = 5051
 
-def enviar_archivo(ip_nodo_principal, ip_destino, nombre_archivo):
+# Tamaño mínimo de cada franja al repartir un archivo entre varias rutas
+TAMANO_MINIMO_FRANJA = 8 * 1024 * 1024
+
+# Flujos TCP paralelos por transferencia
+VENTANA_TCP = 64 * 1024               # Ventana efectiva que se supone por conexión
+MAX_FLUJOS_PARALELOS = 8
+TAMANO_MINIMO_FLUJO = 1024 * 1024     # No abrir flujos para menos de esto
+
+# Transferencias reanudables
+TAMANO_BLOQUE_REANUDACION = 4 * 1024 * 1024
+MAX_INTENTOS = 5
+ESPERA_REINTENTO = 3  # Segundos entre intentos
+
+# Envío delta: si los datos nuevos superan esta fracción del archivo, se envía completo
+MAX_PROPORCION_LITERAL = 0.5
+
+# Envíos planificados: transferencias que están en curso a la vez
+MAX_ENVIOS_PLANIFICADOS = 8
+
+def flujos_paralelos(ancho_banda_mbps, latencia_ms, tamano):
+    """
+    Número de conexiones TCP paralelas para llenar un enlace.
+
+    Una sola conexión transmite como máximo una ventana por viaje de ida y
+    vuelta, así que hacen falta producto ancho de banda-retardo / ventana
+    conexiones para aprovechar el enlace.
+
+    Args:
+        ancho_banda_mbps: Ancho de banda del cuello de botella de la ruta
+        latencia_ms: Latencia total de la ruta
+        tamano: Tamaño del archivo en bytes
+
+    Returns:
+        Número de flujos entre 1 y MAX_FLUJOS_PARALELOS
+    """
+    producto_bdp = ancho_banda_mbps * 1e6 / 8 * latencia_ms / 1000.0
+    flujos = math.ceil(producto_bdp / VENTANA_TCP)
+    flujos = min(flujos, MAX_FLUJOS_PARALELOS, int(tamano // TAMANO_MINIMO_FLUJO))
+    return max(1, flujos)
+
+def flujos_para_ruta(ruta, tamano):
+    """
+    Número de conexiones paralelas para una ruta según sus pesos en la topología.
+
+    Usa el cuello de botella y la latencia total de la ruta (ver
+    flujos_paralelos). Si el primer nodo no está en la topología (origen
+    desconocido) se cuenta desde el segundo; si falta algún otro enlace,
+    un solo flujo.
+
+    Args:
+        ruta: Lista de IPs [origen, ..., destino]
+        tamano: Tamaño del archivo en bytes
+    """
+    grafo_latencia, grafo_ancho_banda = topologia_compartida().grafos()
+    if ruta[0] not in grafo_latencia:
+        ruta = ruta[1:]
+    enlaces = list(zip(ruta, ruta[1:]))
+    if not enlaces or any(v not in grafo_latencia.get(u, {}) or v not in grafo_ancho_banda.get(u, {})
+                          for u, v in enlaces):
+        return 1
+    return flujos_paralelos(min(grafo_ancho_banda[u][v] for u, v in enlaces),
+                            sum(grafo_latencia[u][v] for u, v in enlaces), tamano)
+
+def ip_local_hacia(ip):
+    """IP de este nodo en la interfaz por la que se llega a ip (el connect UDP no envía nada)"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect((ip, PUERTO_NODO_PRINCIPAL))
+            return s.getsockname()[0]
+    except OSError:
+        return None
+
+def recibir_respuesta(s):
+    """
+    Recibe la respuesta del receptor final a un envío que la pidió ('espera_respuesta').
+
+    Raises:
+        Exception: Si un nodo principal de la ruta rechazó el archivo
+    """
+    respuesta = recibir_mensaje(s)
+    if respuesta.get('rechazado'):
+        raise Exception(f"Un nodo principal rechazó el archivo: {respuesta['error']}")
+    return respuesta
+
+def comprobar_rechazo(s):
+    """
+    Espera a que el primer salto cierre la conexión de un envío sin respuesta del receptor.
+
+    Un nodo principal que no admite el archivo (ocupado o demasiado grande)
+    responde con un rechazo antes de cerrar; si cierra sin responder, el
+    archivo fue admitido.
+
+    Raises:
+        Exception: Si el primer salto rechazó el archivo
+    """
+    try:
+        s.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass  # La conexión ya está cortada, pero la respuesta puede haber llegado antes
+    try:
+        respuesta = recibir_mensaje(s)
+    except Exception:
+        return
+    if respuesta.get('rechazado'):
+        raise Exception(f"El nodo principal rechazó el archivo: {respuesta['error']}")
+
+def enviar_archivo(ip_nodo_principal, ip_destino, nombre_archivo, saltos=None, flujos=1, reanudable=False,
+                   delta=False, compresion=None, ancho_banda=None, salto_a_salto=None, intentos=MAX_INTENTOS,
+                   confirmar=False):
+    """
+    Envía un archivo al destino final a través de uno o varios nodos principales.
+
+    Args:
+        ip_nodo_principal: IP del primer nodo principal de la ruta
+        ip_destino: IP del receptor final
+        nombre_archivo: Ruta del archivo a enviar
+        saltos: Nodos principales intermedios después del primero (en orden)
+        flujos: Número de conexiones TCP paralelas, cada una con un rango del archivo
+        reanudable: Si True, ante un corte se reintenta enviando sólo lo que falta
+        delta: Si True y el receptor ya tiene una versión del archivo, sólo se
+            envían los bloques nuevos o modificados
+        compresion: Nombre del codec, 'auto' para elegirlo según el ancho de
+            banda y una muestra del archivo, o None para no comprimir
+        ancho_banda: Cuello de botella de la ruta (Mbps), para compresion='auto'
+        salto_a_salto: Métrica ('latencia' o 'ancho_banda') con la que cada nodo
+            principal elige el siguiente salto en su tabla de rutas, o 'arbol'
+            para seguir el árbol de expansión; sólo en el envío simple (sin
+            saltos explícitos, flujos, reanudación, delta ni compresión)
+        intentos: Intentos de un envío reanudable antes de darlo por fallido
+        confirmar: Si True, se espera la confirmación del receptor final
+            ('espera_respuesta') en lugar de dar el envío por hecho al
+            entregarlo al primer nodo principal
+
+    Returns:
+        True si el primer nodo principal recibió el archivo sin rechazarlo (con
+        confirmar, al receptor final; los envíos reanudables y delta
+        siempre esperan la confirmación del receptor)
+    """
     if not os.path.exists(nombre_archivo):
         print(f"[ERROR] El archivo '{nombre_archivo}' no existe.")
-        return
+        return False
+
+    # El origen no se usa para conectar, sólo completa la ruta
+    ruta = ['origen', ip_nodo_principal] + list(saltos or []) + [ip_destino]
+    if delta and os.path.getsize(nombre_archivo) > 0:
+        if enviar_archivo_delta(ruta, nombre_archivo):
+            return True
+        print("[Cliente] Se envía el archivo completo")
+    if compresion == 'auto':
+        compresion = elegir_codec(nombre_archivo, ancho_banda)
+        print(f"[Cliente] Compresión elegida: {compresion or 'ninguna'}")
+    if compresion:
+        return enviar_archivo_comprimido(ruta, nombre_archivo, compresion, confirmar=confirmar)
+    if reanudable and os.path.getsize(nombre_archivo) > 0:
+        return enviar_archivo_reanudable(ruta, nombre_archivo, intentos)
+    if flujos > 1:
+        return enviar_archivo_paralelo(ruta, nombre_archivo, flujos, confirmar=confirmar)
+
+    # Saltos que le quedan al archivo después del primer nodo principal
+    ruta = list(saltos or []) + [ip_destino]
 
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.connect((ip_nodo_principal, PUERTO_NODO_PRINCIPAL))
 
             # Crear metadatos
-            metadata = json.dumps({
-                'nombre': nombre_archivo,
-                'destino': ip_destino
-            }).encode()
+            # El tamaño permite al nodo principal reenviar sin esperar al archivo completo
+            campos = {
+                'nombre': os.path.basename(nombre_archivo),
+                'destino': ip_destino,
+                'tamano': os.path.getsize(nombre_archivo),
+                'ruta': ruta
+            }
+            if salto_a_salto and not saltos:
+                # Los nodos principales eligen cada salto con su tabla de rutas
+                del campos['ruta']
+                campos['salto_a_salto'] = salto_a_salto
+            if confirmar:
+                campos['espera_respuesta'] = True
+            metadata = json.dumps(campos).encode()
 
             # Enviar longitud del JSON (10 bytes)
             s.sendall(f"{len(metadata):<10}".encode())
@@ -27,24 +207,624 @@ def enviar_archivo(ip_nodo_principal, ip_destino, nombre_archivo):
             # Enviar metadatos
             s.sendall(metadata)
 
-            # Enviar archivo
-            with open(nombre_archivo, 'rb') as f:
-                while True:
-                    chunk = f.read(BUFFER_SIZE)
-                    if not chunk:
-                        break
-                    s.sendall(chunk)
+            # Enviar archivo (sin copias en espacio de usuario si hay sendfile)
+            inicio = time.time()
+            try:
+                with open(nombre_archivo, 'rb') as f:
+                    enviar_rango(s, f, 0, os.path.getsize(nombre_archivo))
+            except OSError:
+                # Un nodo principal que rechaza el archivo responde y corta sin leer el resto
+                comprobar_rechazo(s)
+                raise
+            registrar_transferencia(s.getsockname()[0], ip_nodo_principal,
+                                    os.path.getsize(nombre_archivo), time.time() - inicio)
+
+            # Un nodo principal que cae más adelante en la ruta cierra la conexión sin respuesta
+            if confirmar:
+                if not recibir_respuesta(s).get('completo'):
+                    print("[ERROR] El receptor no confirmó el archivo completo")
+                    return False
+            else:
+                comprobar_rechazo(s)
 
-            print("[Cliente] Archivo enviado correctamente al nodo principal")
+            if 'ruta' in campos:
+                print(f"[Cliente] Archivo enviado correctamente al nodo principal "
+                      f"(ruta: {' -> '.join([ip_nodo_principal] + ruta)})")
+            else:
+                print(f"[Cliente] Archivo enviado correctamente al nodo principal {ip_nodo_principal} "
+                      f"(salto a salto por {salto_a_salto})")
+            return True
 
     except Exception as e:
         print(f"[ERROR] No se pudo enviar el archivo: {e}")
+        return False
+
+def enviar_archivo_con_respaldo(ip_nodo_principal, ip_destino, nombre_archivo, alternativas, **opciones):
+    """
+    Envía un archivo por la primera de varias rutas precalculadas que funcione.
+
+    Cada envío espera la confirmación del receptor final: si un nodo
+    principal de la ruta (no sólo el primero) o el receptor no responde,
+    rechaza el archivo o la conexión se corta, se pasa a la siguiente
+    alternativa sin recalcular rutas. Con
+    reanudable=True la siguiente ruta continúa desde los bloques que ya
+    llegaron al receptor (el id de la transferencia sólo depende del
+    archivo y del destino), y cada ruta salvo la última tiene un solo
+    intento.
+
+    Args:
+        ip_nodo_principal: IP del primer nodo principal (común a todas las rutas)
+        ip_destino: IP del receptor final
+        nombre_archivo: Ruta del archivo a enviar
+        alternativas: Listas de saltos intermedios, en orden de preferencia
+        opciones: Los demás argumentos de enviar_archivo
+
+    Returns:
+        True si el receptor confirmó el archivo por alguna de las rutas
+    """
+    for i, saltos in enumerate(alternativas):
+        if i > 0:
+            print(f"[Cliente] Reintentando por la ruta alternativa "
+                  f"{' -> '.join([ip_nodo_principal] + list(saltos) + [ip_destino])}")
+        intentos = MAX_INTENTOS if i == len(alternativas) - 1 else 1
+        if enviar_archivo(ip_nodo_principal, ip_destino, nombre_archivo, saltos, intentos=intentos,
+                          **dict(opciones, confirmar=True)):
+            return True
+    return False
+
+def conectar_ruta(ruta, paquete):
+    """
+    Conecta con el primer salto de una ruta y le envía los metadatos.
+
+    Si la ruta es directa (origen y destino) se conecta al receptor; si no,
+    al nodo principal del primer salto, indicando los saltos restantes.
+
+    Args:
+        ruta: Lista de IPs [origen, ..., destino]
+        paquete: Metadatos del archivo (nombre, tamaño, etc.)
+
+    Returns:
+        Socket conectado
+    """
+    campos = dict(paquete)
+    if len(ruta) == 2:
+        direccion = (ruta[1], PUERTO_RECEPTOR)
+    else:
+        direccion = (ruta[1], PUERTO_NODO_PRINCIPAL)
+        campos['destino'] = ruta[-1]
+        campos['ruta'] = ruta[2:]
+
+    metadata = json.dumps(campos).encode()
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.connect(direccion)
+        s.sendall(f"{len(metadata):<10}".encode())
+        s.sendall(metadata)
+    except Exception:
+        s.close()
+        raise
+    return s
+
+def enviar_segmento(ruta, nombre_archivo, desplazamiento, longitud, paquete, al_enviar=None):
+    """
+    Envía los bytes [desplazamiento, desplazamiento + longitud) del archivo por una ruta.
+
+    al_enviar, si se indica, se llama con el número de bytes de cada bloque enviado.
+
+    Returns:
+        La respuesta del receptor si los metadatos piden una ('espera_respuesta'), si no None
+
+    Raises:
+        Exception: Si el envío falla o un nodo principal rechaza la franja
+    """
+    with conectar_ruta(ruta, dict(paquete, tamano=longitud, desplazamiento=desplazamiento)) as s:
+        try:
+            with open(nombre_archivo, 'rb') as f:
+                enviar_rango(s, f, desplazamiento, longitud, al_enviar)
+        except OSError:
+            comprobar_rechazo(s)
+            raise
+        if paquete.get('espera_respuesta'):
+            return recibir_respuesta(s)
+        comprobar_rechazo(s)
+    return None
+
+def repartir_franjas(tamano, rutas):
+    """
+    Reparte un archivo en franjas contiguas proporcionales al ancho de banda de cada ruta.
+
+    Las rutas cuya franja quedaría por debajo de TAMANO_MINIMO_FRANJA se descartan.
+
+    Args:
+        tamano: Tamaño del archivo en bytes
+        rutas: Lista de (cuello de botella, ruta), de mayor a menor ancho de banda
+
+    Returns:
+        Lista de (ruta, desplazamiento, longitud)
+    """
+    rutas = list(rutas)
+    while len(rutas) > 1:
+        total_ancho = sum(cuello for cuello, _ in rutas)
+        if tamano * rutas[-1][0] / total_ancho >= TAMANO_MINIMO_FRANJA:
+            break
+        rutas.pop()
+
+    total_ancho = sum(cuello for cuello, _ in rutas)
+    franjas = []
+    desplazamiento = 0
+    for i, (cuello, ruta) in enumerate(rutas):
+        if i == len(rutas) - 1:
+            longitud = tamano - desplazamiento
+        else:
+            longitud = int(tamano * cuello / total_ancho)
+        franjas.append((ruta, desplazamiento, longitud))
+        desplazamiento += longitud
+    return franjas
+
+def enviar_franjas(franjas, nombre_archivo, al_enviar=None, confirmar=False):
+    """
+    Envía en paralelo las franjas de un archivo, cada una por su ruta.
+
+    Todas las franjas comparten un id de transferencia para que el receptor
+    las escriba en el mismo archivo y lo reensamble al completarse.
+
+    Args:
+        franjas: Lista de (ruta, desplazamiento, longitud)
+        nombre_archivo: Ruta del archivo a enviar
+        al_enviar: Función opcional que recibe los bytes de cada bloque enviado
+        confirmar: Si True, cada franja espera a que el receptor confirme sus bytes
+
+    Returns:
+        True si todas las franjas se enviaron (con confirmar, si llegaron al receptor)
+    """
+    paquete = {
+        'nombre': os.path.basename(nombre_archivo),
+        'id_transferencia': uuid.uuid4().hex,
+        'tamano_total': os.path.getsize(nombre_archivo)
+    }
+    if confirmar:
+        paquete['espera_respuesta'] = True
+    bloqueo = threading.Lock()
+    errores = []
+
+    def notificar(n_bytes):
+        with bloqueo:
+            al_enviar(n_bytes)
+
+    def enviar(ruta, desplazamiento, longitud):
+        try:
+            respuesta = enviar_segmento(ruta, nombre_archivo, desplazamiento, longitud, paquete,
+                                        notificar if al_enviar else None)
+            if confirmar and respuesta['recibidos'] != longitud:
+                raise Exception(f"El receptor confirmó {respuesta['recibidos']} de {longitud} bytes")
+            print(f"[Cliente] Franja de {longitud} bytes enviada por {' -> '.join(ruta[1:])}")
+        except Exception as e:
+            errores.append(e)
+            print(f"[ERROR] Franja por {' -> '.join(ruta[1:])} fallida: {e}")
+
+    hilos = [threading.Thread(target=enviar, args=franja) for franja in franjas]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    return not errores
+
+def enviar_archivos_planificados(ip_origen, envios, max_simultaneos=MAX_ENVIOS_PLANIFICADOS):
+    """
+    Envía varios archivos a la vez repartiendo sus rutas según la carga de los enlaces.
+
+    Las rutas salen de un PlanificadorRutas: en lugar de mandar todos los
+    archivos por la misma ruta óptima, cada uno toma la que termina antes
+    contando lo que ya llevan sus enlaces. Los archivos empiezan de mayor a
+    menor; la ruta de cada uno se decide al empezar, con el plan rehecho
+    cada vez que termina otro. Un envío termina cuando el receptor final
+    confirma el archivo (o falla), no cuando lo acepta el primer nodo
+    principal: hasta entonces su carga sigue en los enlaces de la ruta.
+
+    Args:
+        ip_origen: IP de este nodo en la topología
+        envios: Lista de (IP del receptor, ruta del archivo)
+        max_simultaneos: Transferencias en curso a la vez
+
+    Returns:
+        Lista de (archivo, ruta usada, True si el receptor lo confirmó)
+    """
+    planificador = PlanificadorRutas()
+    tamanos = [os.path.getsize(archivo) for _, archivo in envios]
+    planificador.agregar([(i, ip_origen, destino, tamanos[i]) for i, (destino, _) in enumerate(envios)])
+    print(f"[Cliente] {len(envios)} archivos planificados, tiempo estimado {planificador.makespan:.2f} segundos")
+
+    def enviar(i):
+        archivo = envios[i][1]
+        ruta = planificador.iniciar(i)
+        if not ruta:
+            print(f"[ERROR] No hay ruta de {ip_origen} a {envios[i][0]} en la topología")
+            return archivo, None, False
+        try:
+            inicio = time.time()
+            respuesta = enviar_segmento(ruta, archivo, 0, tamanos[i],
+                                        {'nombre': os.path.basename(archivo), 'espera_respuesta': True},
+                                        lambda n_bytes: planificador.avanzar(i, n_bytes))
+            if not respuesta.get('completo'):
+                raise Exception(f"El receptor confirmó {respuesta.get('recibidos', 0)} de {tamanos[i]} bytes")
+            print(f"[Cliente] '{archivo}' enviado por {' -> '.join(ruta)} en {time.time() - inicio:.2f} segundos")
+            return archivo, ruta, True
+        except Exception as e:
+            print(f"[ERROR] '{archivo}' no se pudo enviar por {' -> '.join(ruta)}: {e}")
+            return archivo, ruta, False
+        finally:
+            planificador.terminar(i)
+
+    # El pool atiende los envíos en el orden en que se encolan: primero los más grandes
+    orden = sorted(range(len(envios)), key=lambda i: -tamanos[i])
+    with ThreadPoolExecutor(max_workers=max_simultaneos) as pool:
+        return list(pool.map(enviar, orden))
+
+def enviar_archivo_multiruta(rutas, nombre_archivo, al_enviar=None):
+    """
+    Envía un archivo repartido en franjas por varias rutas en paralelo.
+
+    Cada franja viaja por su propia ruta y el receptor la escribe en su
+    desplazamiento; cuando llegan todas, reensambla el archivo.
+
+    Args:
+        rutas: Lista de (cuello de botella, ruta [origen, ..., destino]),
+            idealmente sin aristas en común (ver rutas.rutas_disjuntas)
+        nombre_archivo: Ruta del archivo a enviar
+        al_enviar: Función opcional que recibe los bytes de cada bloque enviado
+
+    Returns:
+        True si todas las franjas se enviaron
+    """
+    if not os.path.exists(nombre_archivo):
+        print(f"[ERROR] El archivo '{nombre_archivo}' no existe.")
+        return False
+    if not rutas:
+        print("[ERROR] No hay rutas para enviar el archivo")
+        return False
+
+    franjas = repartir_franjas(os.path.getsize(nombre_archivo), rutas)
+    if not enviar_franjas(franjas, nombre_archivo, al_enviar):
+        return False
+    print(f"[Cliente] Archivo enviado en {len(franjas)} franjas por rutas paralelas")
+    return True
+
+def enviar_archivo_paralelo(ruta, nombre_archivo, flujos, al_enviar=None, confirmar=False):
+    """
+    Envía un archivo por una sola ruta usando varias conexiones TCP paralelas.
+
+    En enlaces con mucha latencia una conexión no llena el enlace; cada
+    conexión lleva un rango contiguo del archivo y el receptor escribe cada
+    rango en su posición.
+
+    Args:
+        ruta: Lista de IPs [origen, ..., destino]
+        nombre_archivo: Ruta del archivo a enviar
+        flujos: Número de conexiones (ver flujos_paralelos)
+        al_enviar: Función opcional que recibe los bytes de cada bloque enviado
+        confirmar: Si True, cada rango espera la confirmación del receptor
+
+    Returns:
+        True si todos los rangos se enviaron
+    """
+    tamano = os.path.getsize(nombre_archivo)
+    flujos = max(1, min(flujos, tamano))
+    longitud = tamano // flujos
+    franjas = []
+    for i in range(flujos):
+        desplazamiento = i * longitud
+        franjas.append((ruta, desplazamiento, tamano - desplazamiento if i == flujos - 1 else longitud))
+
+    if not enviar_franjas(franjas, nombre_archivo, al_enviar, confirmar):
+        return False
+    print(f"[Cliente] Archivo enviado en {flujos} flujos paralelos por {' -> '.join(ruta[1:])}")
+    return True
+
+def id_reanudable(nombre_archivo, ip_destino):
+    """
+    Identificador estable de una transferencia reanudable.
+
+    Depende del archivo (nombre, tamaño y fecha de modificación) y del
+    destino, así que un reintento, aunque sea desde otro proceso, continúa
+    la misma transferencia; si el archivo cambia, empieza otra.
+    """
+    info = os.stat(nombre_archivo)
+    clave = f"{os.path.basename(nombre_archivo)}:{info.st_size}:{info.st_mtime_ns}:{ip_destino}"
+    return hashlib.sha1(clave.encode()).hexdigest()[:16]
+
+def consultar_faltantes(ruta, paquete):
+    """Pregunta al receptor qué rangos del archivo le faltan"""
+    consulta = dict(paquete, tipo='consulta_reanudacion', tamano=0, espera_respuesta=True)
+    with conectar_ruta(ruta, consulta) as s:
+        return recibir_respuesta(s)['faltantes']
+
+def enviar_archivo_reanudable(ruta, nombre_archivo, intentos=MAX_INTENTOS):
+    """
+    Envía un archivo de forma reanudable.
+
+    El archivo se divide en bloques (el manifiesto: tamaño total y tamaño
+    de bloque). Antes de enviar se pregunta al receptor qué bloques le
+    faltan según su punto de control y sólo se envían esos; si la conexión
+    se corta, el siguiente intento vuelve a preguntar y continúa desde ahí.
+
+    Args:
+        ruta: Lista de IPs [origen, ..., destino]
+        nombre_archivo: Ruta del archivo a enviar
+        intentos: Número máximo de intentos
+
+    Returns:
+        True si el receptor confirmó el archivo completo
+    """
+    paquete = {
+        'nombre': os.path.basename(nombre_archivo),
+        'id_transferencia': id_reanudable(nombre_archivo, ruta[-1]),
+        'tamano_total': os.path.getsize(nombre_archivo),
+        'tamano_bloque': TAMANO_BLOQUE_REANUDACION,
+        'reanudable': True,
+        'espera_respuesta': True
+    }
+
+    for intento in range(1, intentos + 1):
+        try:
+            faltantes = consultar_faltantes(ruta, paquete)
+            if not faltantes:
+                print("[Cliente] El receptor ya tiene el archivo completo")
+                return True
+            print(f"[Cliente] Intento {intento}: faltan {sum(longitud for _, longitud in faltantes)} bytes "
+                  f"en {len(faltantes)} rangos")
+
+            for desplazamiento, longitud in faltantes:
+                respuesta = enviar_segmento(ruta, nombre_archivo, desplazamiento, longitud, paquete)
+                if respuesta and respuesta.get('completo'):
+                    print(f"[Cliente] Archivo enviado correctamente por {' -> '.join(ruta[1:])}")
+                    return True
+        except Exception as e:
+            print(f"[ERROR] Intento {intento} interrumpido: {e}")
+            if intento < intentos:
+                time.sleep(ESPERA_REINTENTO)
+
+    print(f"[ERROR] No se pudo completar el envío tras {intentos} intentos")
+    return False
+
+def enviar_archivo_comprimido(ruta, nombre_archivo, codec, al_enviar=None, confirmar=False):
+    """
+    Envía un archivo comprimiéndolo al vuelo.
+
+    El archivo se comprime por bloques en un pool de hilos mientras se
+    envían los bloques ya comprimidos, así la CPU y la red trabajan a la
+    vez. Como el tamaño comprimido no se conoce de antemano, el cuerpo va
+    en tramas y termina con una trama de fin.
+
+    Args:
+        ruta: Lista de IPs [origen, ..., destino]
+        nombre_archivo: Ruta del archivo a enviar
+        codec: Nombre del codec (ver compresion.codecs)
+        al_enviar: Función opcional que recibe los bytes originales de cada bloque enviado
+        confirmar: Si True, se espera la confirmación del receptor final
+
+    Returns:
+        True si el archivo se envió (con confirmar, si el receptor lo recibió completo)
+    """
+    if codec not in codecs:
+        print(f"[ERROR] Codec de compresión desconocido: {codec}")
+        return False
+
+    tamano = os.path.getsize(nombre_archivo)
+    paquete = {
+        'nombre': os.path.basename(nombre_archivo),
+        'tamano': None,
+        'tamano_total': tamano,
+        'compresion': codec
+    }
+    if confirmar:
+        paquete['espera_respuesta'] = True
+    try:
+        with conectar_ruta(ruta, paquete) as s:
+            try:
+                with open(nombre_archivo, 'rb') as f:
+                    enviados = enviar_comprimido(s, f, codec, al_enviar)
+            except OSError:
+                comprobar_rechazo(s)
+                raise
+            if confirmar:
+                # Sin tamaño en los metadatos, los nodos principales reenvían hasta el cierre
+                s.shutdown(socket.SHUT_WR)
+                if not recibir_respuesta(s).get('completo'):
+                    raise Exception("El receptor no confirmó el archivo completo")
+            else:
+                comprobar_rechazo(s)
+    except Exception as e:
+        print(f"[ERROR] No se pudo enviar el archivo comprimido: {e}")
+        return False
+
+    print(f"[Cliente] Archivo enviado con {codec} por {' -> '.join(ruta[1:])}: "
+          f"{enviados} bytes por la red para {tamano} bytes")
+    return True
+
+def consultar_indice(ruta, nombre_archivo):
+    """Pide al receptor el índice de bloques de la versión del archivo que ya tiene"""
+    consulta = {'nombre': os.path.basename(nombre_archivo), 'tipo': 'consulta_firmas',
+                'tamano': 0, 'espera_respuesta': True}
+    with conectar_ruta(ruta, consulta) as s:
+        return recibir_respuesta(s)
+
+def enviar_archivo_delta(ruta, nombre_archivo):
+    """
+    Envía sólo las diferencias con la versión del archivo que ya tiene el receptor.
+
+    Se pide al receptor el índice de bloques (firma débil desplazable y
+    firma fuerte) de su copia, se buscan esos bloques en el archivo local
+    y sólo viajan los datos que no están allí; el receptor copia el resto
+    de su archivo y verifica el resultado con el SHA-256 del original.
+
+    Args:
+        ruta: Lista de IPs [origen, ..., destino]
+        nombre_archivo: Ruta del archivo a enviar
+
+    Returns:
+        True si el receptor reconstruyó el archivo; False si no tiene una
+        versión previa, el archivo cambió demasiado o el envío falló
+    """
+    tamano = os.path.getsize(nombre_archivo)
+    try:
+        indice = consultar_indice(ruta, nombre_archivo)
+        if not indice['firmas']:
+            print("[Cliente] El receptor no tiene una versión previa del archivo")
+            return False
+
+        with open(nombre_archivo, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+            operaciones = calcular_delta(datos, indice['firmas'], indice['tamano_bloque'], indice['tamano_base'],
+                                         max_literal=int(tamano * MAX_PROPORCION_LITERAL))
+            if operaciones is None:
+                print("[Cliente] El archivo cambió demasiado para un envío delta")
+                return False
+            resumen = hashlib.sha256(datos).hexdigest()
+
+            paquete = {
+                'nombre': os.path.basename(nombre_archivo),
+                'delta': True,
+                'tamano': tamano_cuerpo(operaciones),
+                'tamano_total': tamano,
+                'tamano_bloque': indice['tamano_bloque'],
+                'version_base': indice['version_base'],
+                'resumen': resumen,
+                'espera_respuesta': True
+            }
+            with conectar_ruta(ruta, paquete) as s:
+                enviar_delta(s, f, operaciones)
+                respuesta = recibir_respuesta(s)
+    except Exception as e:
+        print(f"[ERROR] Envío delta fallido: {e}")
+        return False
+
+    if not respuesta.get('completo'):
+        print("[ERROR] El receptor no pudo reconstruir el archivo a partir del delta")
+        return False
+    print(f"[Cliente] Archivo enviado con delta por {' -> '.join(ruta[1:])}: "
+          f"{paquete['tamano']} de {tamano} bytes")
+    return True
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Uso: python nodos.py <ip_nodo_principal> <ip_destino_final> <archivo>")
+    argumentos = sys.argv[1:]
+    reanudable = '--reanudable' in argumentos
+    if reanudable:
+        argumentos.remove('--reanudable')
+    delta = '--delta' in argumentos
+    if delta:
+        argumentos.remove('--delta')
+    compresion = None
+    if '--comprimir' in argumentos:
+        posicion = argumentos.index('--comprimir')
+        # El codec es opcional: sin él se elige automáticamente
+        if posicion + 1 < len(argumentos) and (argumentos[posicion + 1] in codecs or argumentos[posicion + 1] == 'auto'):
+            compresion = argumentos[posicion + 1]
+            del argumentos[posicion:posicion + 2]
+        else:
+            compresion = 'auto'
+            del argumentos[posicion]
+    ancho_banda = None
+    if '--ancho-banda' in argumentos:
+        posicion = argumentos.index('--ancho-banda')
+        ancho_banda = float(argumentos[posicion + 1])
+        del argumentos[posicion:posicion + 2]
+    salto_a_salto = None
+    if '--salto-a-salto' in argumentos:
+        posicion = argumentos.index('--salto-a-salto')
+        # La métrica es opcional: por omisión, latencia ('arbol' sigue la red superpuesta del árbol de expansión)
+        if posicion + 1 < len(argumentos) and argumentos[posicion + 1] in ('latencia', 'ancho_banda', 'arbol'):
+            salto_a_salto = argumentos[posicion + 1]
+            del argumentos[posicion:posicion + 2]
+        else:
+            salto_a_salto = 'latencia'
+            del argumentos[posicion]
+    ruta_por = None
+    if '--ruta-optima' in argumentos:
+        posicion = argumentos.index('--ruta-optima')
+        # La métrica es opcional: por omisión, latencia
+        if posicion + 1 < len(argumentos) and argumentos[posicion + 1] in ('latencia', 'ancho_banda'):
+            ruta_por = argumentos[posicion + 1]
+            del argumentos[posicion:posicion + 2]
+        else:
+            ruta_por = 'latencia'
+            del argumentos[posicion]
+    planificar = '--planificar' in argumentos
+    if planificar:
+        argumentos.remove('--planificar')
+    confirmar = '--confirmar' in argumentos
+    if confirmar:
+        argumentos.remove('--confirmar')
+    flujos = 1
+    if '--flujos' in argumentos:
+        posicion = argumentos.index('--flujos')
+        # 'auto' calcula los flujos con el ancho de banda y la latencia de la ruta en la topología
+        flujos = argumentos[posicion + 1] if argumentos[posicion + 1] == 'auto' else int(argumentos[posicion + 1])
+        del argumentos[posicion:posicion + 2]
+
+    # Cada archivo se envía de un solo modo: delta, comprimido, reanudable o en flujos paralelos;
+    # salto a salto sólo con el envío simple, que es el único que no lleva la ruta en los metadatos
+    modos = [opcion for opcion, activa in (('--delta', delta), ('--comprimir', compresion),
+                                           ('--reanudable', reanudable), ('--flujos', flujos == 'auto' or flujos > 1)) if activa]
+    if salto_a_salto:
+        modos += ['--salto-a-salto'] + (['--ruta-optima'] if ruta_por else [])
+        if len(argumentos) > 3 and not planificar:
+            modos.append('saltos explícitos')
+    if len(modos) > 1:
+        print(f"[ERROR] No se pueden combinar {', '.join(modos)}")
+        sys.exit(2)
+
+    if len(argumentos) < 3:
+        print("Uso: python nodos.py <ip_nodo_principal> <ip_destino_final> <archivo|directorio> [ip_salto ...] "
+              "[--flujos N|auto] [--reanudable] [--delta] [--comprimir [codec]] [--ancho-banda MBPS] [--salto-a-salto [latencia|ancho_banda|arbol]] "
+              "[--ruta-optima [latencia|ancho_banda]] [--confirmar]\n"
+              "     python nodos.py --planificar <ip_origen> <ip_destino_final> <archivo> [archivo ...]")
+    elif planificar:
+        # Varios archivos a la vez, con las rutas repartidas según la carga de los enlaces
+        ip_origen, ip_destino = argumentos[0], argumentos[1]
+        resultados = enviar_archivos_planificados(ip_origen, [(ip_destino, archivo) for archivo in argumentos[2:]])
+        if not all(enviado for _, _, enviado in resultados):
+            sys.exit(1)
     else:
-        ip_nodo = sys.argv[1]
-        ip_destino = sys.argv[2]
-        archivo = sys.argv[3]
-        enviar_archivo(ip_nodo, ip_destino, archivo)
+        ip_nodo = argumentos[0]
+        ip_destino = argumentos[1]
+        archivo = argumentos[2]
+        saltos = argumentos[3:]
+        if flujos == 'auto' and os.path.isfile(archivo):
+            # Con la ruta que se va a usar: la de los saltos indicados o la mejor de la topología
+            saltos_ruta = saltos
+            if ruta_por and not saltos:
+                candidatas = rutas_alternativas(ip_nodo, ip_destino, ruta_por)
+                saltos_ruta = candidatas[0][1][1:-1] if candidatas else []
+            flujos = flujos_para_ruta([ip_local_hacia(ip_nodo), ip_nodo] + saltos_ruta + [ip_destino],
+                                      os.path.getsize(archivo))
+            print(f"[Cliente] Flujos paralelos según la ruta: {flujos}")
+        elif flujos == 'auto':
+            flujos = 1
+        opciones = dict(flujos=flujos, reanudable=reanudable, delta=delta, compresion=compresion,
+                        ancho_banda=ancho_banda, salto_a_salto=salto_a_salto, confirmar=confirmar)
+        if ruta_por and not saltos and os.path.isdir(archivo):
+            alternativas = [ruta[1:-1] for _, ruta in rutas_alternativas(ip_nodo, ip_destino, ruta_por)]
+            saltos = alternativas[0] if alternativas else []
+        if os.path.isdir(archivo):
+            # Un directorio viaja por el servicio multiplexado: sus archivos pequeños en
+            # lotes por una conexión persistente con cada salto, y el receptor recrea el árbol
+            inicio = time.time()
+            resultados = enviar_archivos(['origen', ip_nodo] + saltos + [ip_destino], [archivo])
+            fallidos = [nombre for nombre, respuesta in resultados if not respuesta.get('completo')]
+            for nombre in fallidos:
+                print(f"[ERROR] '{nombre}' no llegó: {dict(resultados)[nombre].get('error')}")
+            print(f"[Cliente] Directorio enviado en {len(resultados)} envíos ({len(fallidos)} fallidos) "
+                  f"en {time.time() - inicio:.2f} segundos")
+            enviado = not fallidos
+        elif ruta_por and not saltos:
+            # Saltos intermedios de la mejor ruta desde el primer nodo principal según la
+            # topología, con las siguientes mejores como respaldo
+            alternativas = [ruta[1:-1] for _, ruta in rutas_alternativas(ip_nodo, ip_destino, ruta_por)]
+            if not alternativas:
+                print(f"[ERROR] No hay ruta de {ip_nodo} a {ip_destino} en la topología")
+                sys.exit(1)
+            enviado = enviar_archivo_con_respaldo(ip_nodo, ip_destino, archivo, alternativas, **opciones)
+        else:
+            enviado = enviar_archivo(ip_nodo, ip_destino, archivo, saltos, **opciones)
+        if not enviado:
+            sys.exit(1)
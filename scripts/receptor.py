@@ -1,72 +1,513 @@
 import socket
 import json
 import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from transporte import recibir_exacto, recibir_a_archivo, enviar_mensaje
+from delta import tamano_bloque_delta, firmas_archivo, resumen_archivo, aplicar_delta
+from compresion import codecs, recibir_comprimido
+from medicion import es_flujo_parcial, registrar_transferencia
 
 PUERTO_ESCUCHA = 5051
-BUFFER_SIZE = 4096
 MAX_FILE_SIZE = 3 * 1024 * 1024 * 1024  # 3GB
 
-def recibir_archivo():
-    servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    servidor.bind(('0.0.0.0', PUERTO_ESCUCHA))
-    servidor.listen(5)
-    print(f"[Receptor] Esperando archivos en el puerto {PUERTO_ESCUCHA}...")
+# Límites de concurrencia del receptor
+MAX_CONEXIONES_SIMULTANEAS = 32  # Transferencias atendidas a la vez
+MAX_ESCRITURAS_SIMULTANEAS = 8   # Transferencias escribiendo en disco a la vez
+TIEMPO_ESPERA_SOCKET = 60        # Segundos sin datos antes de abandonar una conexión
+
+# Bytes recibidos de cada archivo que llega en franjas (varias rutas o varias conexiones)
+franjas_recibidas = {}
+bloqueo_franjas = threading.Lock()
+
+# Puntos de control de las transferencias reanudables en curso
+puntos_control = {}
+GUARDAR_CADA_BLOQUES = 16  # Bloques escritos entre dos guardados del punto de control
+
+# Índices de bloques de los archivos ya recibidos, para los envíos delta
+indices_firmas = {}
+bloqueo_firmas = threading.Lock()
+
+# Banderas de apertura (O_BINARY sólo existe en Windows)
+BANDERAS_ESCRITURA = os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+BANDERAS_LECTURA = os.O_RDONLY | getattr(os, 'O_BINARY', 0)
+
+class PuntoControl:
+    """
+    Bloques ya escritos en disco de una transferencia reanudable.
+
+    Se guarda junto al archivo parcial (mismo nombre terminado en .json)
+    para que, si la conexión se corta o el receptor se reinicia, el emisor
+    pueda pedir sólo los bloques que faltan. Se usa siempre bajo
+    bloqueo_franjas.
+    """
+    def __init__(self, ruta_parcial, tamano_total, tamano_bloque):
+        self.ruta = ruta_parcial + ".json"
+        self.tamano_total = tamano_total
+        self.tamano_bloque = tamano_bloque
+        self.total_bloques = -(-tamano_total // tamano_bloque)
+        self.completados = set()
+
+        # Sólo vale el punto de control si el archivo parcial sigue en disco
+        if os.path.exists(self.ruta) and os.path.exists(ruta_parcial):
+            with open(self.ruta) as f:
+                datos = json.load(f)
+            if datos['tamano_total'] == tamano_total and datos['tamano_bloque'] == tamano_bloque:
+                for inicio, fin in datos['completados']:
+                    self.completados.update(range(inicio, fin))
+
+    def marcar(self, bloques):
+        """Marca bloques como escritos"""
+        self.completados.update(bloques)
+
+    def completo(self):
+        return len(self.completados) >= self.total_bloques
+
+    def _tramos(self, incluidos):
+        """Agrupa en tramos [inicio, fin) los bloques consecutivos que cumplen incluidos(bloque)"""
+        tramos = []
+        for bloque in range(self.total_bloques):
+            if not incluidos(bloque):
+                continue
+            if tramos and tramos[-1][1] == bloque:
+                tramos[-1][1] = bloque + 1
+            else:
+                tramos.append([bloque, bloque + 1])
+        return tramos
+
+    def faltantes(self):
+        """Rangos [desplazamiento, longitud] de los bloques que aún no están escritos"""
+        rangos = []
+        for inicio, fin in self._tramos(lambda bloque: bloque not in self.completados):
+            desplazamiento = inicio * self.tamano_bloque
+            rangos.append([desplazamiento, min(fin * self.tamano_bloque, self.tamano_total) - desplazamiento])
+        return rangos
+
+    def guardar(self):
+        """Escribe el punto de control de forma atómica"""
+        temporal = self.ruta + ".tmp"
+        with open(temporal, 'w') as f:
+            json.dump({
+                'tamano_total': self.tamano_total,
+                'tamano_bloque': self.tamano_bloque,
+                'completados': self._tramos(lambda bloque: bloque in self.completados)
+            }, f)
+        os.replace(temporal, self.ruta)
+
+    def eliminar(self):
+        if os.path.exists(self.ruta):
+            os.remove(self.ruta)
+
+class SeguimientoBloques:
+    """
+    Confirma en el punto de control los bloques de una franja reanudable a medida que se escriben.
+
+    Antes de marcar un bloque se sincronizan los datos con el disco, para
+    que el punto de control nunca declare escrito algo que se perdería con
+    un corte de luz.
+    """
+    def __init__(self, punto, fd, desplazamiento):
+        self.punto = punto
+        self.fd = fd
+        self.desplazamiento = desplazamiento
+        self.recibidos = 0
+        self.siguiente_bloque = -(-desplazamiento // punto.tamano_bloque)
+
+    def _bloques_escritos(self):
+        fin = self.desplazamiento + self.recibidos
+        if fin >= self.punto.tamano_total:
+            return self.punto.total_bloques
+        return fin // self.punto.tamano_bloque
 
-    while True:
-        conn, addr = servidor.accept()
-        print(f"[Receptor] Conexión desde {addr[0]}")
+    def al_recibir(self, n_bytes):
+        self.recibidos += n_bytes
+        if self._bloques_escritos() - self.siguiente_bloque >= GUARDAR_CADA_BLOQUES:
+            self.confirmar()
 
+    def confirmar(self):
+        hasta = self._bloques_escritos()
+        if hasta <= self.siguiente_bloque:
+            return
+        if hasattr(os, 'fdatasync'):
+            os.fdatasync(self.fd)
+        else:
+            os.fsync(self.fd)
+        with bloqueo_franjas:
+            self.punto.marcar(range(self.siguiente_bloque, hasta))
+            self.punto.guardar()
+        self.siguiente_bloque = hasta
+
+def ruta_parcial(paquete):
+    return f"{paquete['nombre']}.{paquete['id_transferencia']}.parcial"
+
+def obtener_punto_control(paquete):
+    """Devuelve (creándolo o cargándolo de disco) el punto de control de una transferencia reanudable"""
+    validar_franja(paquete)
+    with bloqueo_franjas:
+        punto = puntos_control.get(paquete['id_transferencia'])
+        if punto is None:
+            punto = PuntoControl(ruta_parcial(paquete), paquete['tamano_total'], paquete['tamano_bloque'])
+            puntos_control[paquete['id_transferencia']] = punto
+        return punto
+
+def finalizar_reanudable(paquete, punto):
+    """Si ya están todos los bloques, deja el archivo con su nombre final y borra el punto de control"""
+    with bloqueo_franjas:
+        if not punto.completo() or puntos_control.get(paquete['id_transferencia']) is not punto:
+            return False
+        del puntos_control[paquete['id_transferencia']]
+        os.replace(ruta_parcial(paquete), paquete['nombre'])
+        punto.eliminar()
+    print(f"[Receptor] Archivo '{paquete['nombre']}' completo ({paquete['tamano_total']} bytes)")
+    return True
+
+def abrir_destino(paquete):
+    """
+    Abre el archivo donde se escriben los datos recibidos.
+
+    Un archivo completo se escribe directamente con su nombre. Una franja
+    (parte de un archivo enviado por varias rutas o por varias conexiones)
+    se escribe en su desplazamiento dentro de un archivo parcial compartido
+    por todas las franjas de la misma transferencia; la primera franja en
+    llegar reserva el tamaño completo del archivo.
+
+    Returns:
+        Descriptor del archivo y desplazamiento donde empieza a escribir
+
+    Raises:
+        Exception: Si el tamaño total excede MAX_FILE_SIZE o la franja no cabe en él
+    """
+    if 'id_transferencia' not in paquete:
+        fd = os.open(paquete['nombre'], BANDERAS_ESCRITURA | os.O_CREAT | os.O_TRUNC, 0o644)
+        reservar_espacio(fd, paquete['tamano'])
+        return fd, 0
+
+    # El tamaño total viene del emisor: validarlo antes de reservar el espacio en disco
+    validar_franja(paquete)
+
+    # Las demás franjas esperan a que la primera termine de reservar el espacio
+    with bloqueo_franjas:
         try:
-            data = conn.recv(10).decode().strip()
-            print(f"[DEBUG] Longitud de metadatos recibida: {data}")
-            metadata_len = int(data)
-
-            metadata = b""
-            # Recibir JSON metadata con control de bytes extra
-            while len(metadata) < metadata_len:
-                received = conn.recv(BUFFER_SIZE)
-                if not received:
-                    raise Exception("Conexión cerrada inesperadamente")
-                metadata += received
-
-            # Aquí puede haber bytes extra en metadata (más allá del JSON)
-            json_bytes = metadata[:metadata_len]
-            extra_bytes = metadata[metadata_len:]  # bytes que corresponden al archivo, recibidos junto con el JSON
+            fd = os.open(ruta_parcial(paquete), BANDERAS_ESCRITURA | os.O_CREAT | os.O_EXCL, 0o644)
+            reservar_espacio(fd, paquete['tamano_total'])
+        except FileExistsError:
+            fd = os.open(ruta_parcial(paquete), BANDERAS_ESCRITURA)
+    return fd, paquete['desplazamiento']
+
+def validar_franja(paquete):
+    """Comprueba que una franja cabe en el archivo anunciado y que éste no excede MAX_FILE_SIZE"""
+    tamano_total = paquete['tamano_total']
+    if tamano_total > MAX_FILE_SIZE:
+        raise Exception("Archivo excede 3GB")
+    desplazamiento = paquete.get('desplazamiento', 0)
+    if desplazamiento < 0 or desplazamiento + paquete['tamano'] > tamano_total:
+        raise Exception(f"Franja [{desplazamiento}, {desplazamiento + paquete['tamano']}) "
+                        f"fuera del archivo de {tamano_total} bytes")
+
+def reservar_espacio(fd, tamano):
+    """Reserva en disco el tamaño final del archivo antes de escribirlo"""
+    try:
+        os.posix_fallocate(fd, 0, tamano)
+    except (AttributeError, OSError):
+        # Sin posix_fallocate (Windows) o sistema de archivos que no lo soporta
+        os.ftruncate(fd, tamano)
+
+def registrar_franja(paquete, total_recibido):
+    """
+    Suma los bytes de una franja y, si ya llegaron todas, deja el archivo con su nombre final.
+
+    Returns:
+        True si con esta franja el archivo quedó completo
+    """
+    id_transferencia = paquete['id_transferencia']
+    with bloqueo_franjas:
+        recibidos = franjas_recibidas.get(id_transferencia, 0) + total_recibido
+        if recibidos < paquete['tamano_total']:
+            franjas_recibidas[id_transferencia] = recibidos
+            print(f"[Receptor] Franja de '{paquete['nombre']}' recibida "
+                  f"({recibidos}/{paquete['tamano_total']} bytes del archivo)")
+            return False
+
+        franjas_recibidas.pop(id_transferencia, None)
+        os.replace(ruta_parcial(paquete), paquete['nombre'])
+    print(f"[Receptor] Archivo '{paquete['nombre']}' reensamblado correctamente ({recibidos} bytes)")
+    return True
+
+def version_archivo(info):
+    """Identifica una versión de un archivo por su tamaño y fecha de modificación"""
+    return f"{info.st_size}:{info.st_mtime_ns}"
+
+def indice_base(nombre):
+    """
+    Índice de bloques del archivo que el receptor ya tiene con ese nombre.
+
+    El índice se calcula una vez por versión del archivo y se reutiliza en
+    los siguientes envíos delta mientras el archivo no cambie.
+
+    Returns:
+        Diccionario con las firmas, el tamaño de bloque, el tamaño y la
+        versión del archivo base (firmas vacías si no hay archivo base)
+    """
+    if not os.path.isfile(nombre) or os.path.getsize(nombre) == 0:
+        return {'firmas': []}
+
+    info = os.stat(nombre)
+    version = version_archivo(info)
+    with bloqueo_firmas:
+        indice = indices_firmas.get(nombre)
+    if indice is None or indice['version_base'] != version:
+        tamano_bloque = tamano_bloque_delta(info.st_size)
+        indice = {
+            'firmas': firmas_archivo(nombre, tamano_bloque),
+            'tamano_bloque': tamano_bloque,
+            'tamano_base': info.st_size,
+            'version_base': version
+        }
+        with bloqueo_firmas:
+            indices_firmas[nombre] = indice
+    return indice
 
+def recibir_delta(conn, paquete, escrituras):
+    """
+    Reconstruye un archivo a partir de la versión que ya se tiene y de un delta.
+
+    El archivo nuevo se arma en un temporal copiando los bloques que no
+    cambiaron del archivo base y escribiendo los datos nuevos; sólo
+    reemplaza al archivo base si su SHA-256 coincide con el del emisor.
+
+    Returns:
+        True si el archivo quedó reconstruido
+    """
+    nombre = paquete['nombre']
+    temporal = f"{nombre}.delta_{threading.get_ident()}.parcial"
+    with escrituras:
+        try:
+            fd_base = os.open(nombre, BANDERAS_LECTURA)
+        except FileNotFoundError:
+            fd_base = None
+        try:
+            # El archivo base tiene que ser el mismo que indexó el emisor
+            if fd_base is None or version_archivo(os.fstat(fd_base)) != paquete['version_base']:
+                print(f"[Receptor] El archivo base de '{nombre}' cambió; se descarta el delta")
+                return False
+
+            fd = os.open(temporal, BANDERAS_ESCRITURA | os.O_CREAT | os.O_TRUNC, 0o644)
             try:
-                metadata_decoded = json_bytes.decode()
-                print(f"[DEBUG] Metadatos recibidos: {metadata_decoded}")
-                paquete = json.loads(metadata_decoded)
-            except Exception as e:
-                print(f"[ERROR] Fallo al decodificar JSON: {e}")
-                conn.close()
-                continue
+                reservar_espacio(fd, paquete['tamano_total'])
+                escritos = aplicar_delta(conn, fd, fd_base, paquete['tamano'], paquete['tamano_bloque'],
+                                         os.fstat(fd_base).st_size)
+            finally:
+                os.close(fd)
+        except Exception:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        finally:
+            if fd_base is not None:
+                os.close(fd_base)
+
+        if escritos != paquete['tamano_total'] or resumen_archivo(temporal) != paquete['resumen']:
+            os.remove(temporal)
+            print(f"[ERROR] La reconstrucción de '{nombre}' no coincide con el original")
+            return False
+        os.replace(temporal, nombre)
 
-            nombre = paquete['nombre']
-            tamano = paquete['tamano']
+    print(f"[Receptor] Archivo '{nombre}' reconstruido con delta "
+          f"({paquete['tamano']} bytes recibidos de {escritos})")
+    return True
 
-            with open(nombre, 'wb') as f:
-                total_recibido = 0
+def recibir_archivo_comprimido(conn, paquete, escrituras):
+    """
+    Recibe un archivo enviado comprimido por bloques y lo descomprime al vuelo.
 
-                # Primero escribe los bytes extra (de archivo) ya recibidos
-                if extra_bytes:
-                    f.write(extra_bytes)
-                    total_recibido += len(extra_bytes)
+    El archivo se escribe en un temporal que sólo toma su nombre final si
+    llegaron todas las tramas con el tamaño anunciado.
+    """
+    nombre = paquete['nombre']
+    if paquete['compresion'] not in codecs:
+        raise Exception(f"Codec de compresión no disponible: {paquete['compresion']}")
+
+    temporal = f"{nombre}.comprimido_{threading.get_ident()}.parcial"
+    with escrituras:
+        fd = os.open(temporal, BANDERAS_ESCRITURA | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            reservar_espacio(fd, paquete['tamano_total'])
+            escritos = recibir_comprimido(conn, fd, paquete['compresion'])
+            if escritos != paquete['tamano_total']:
+                raise Exception(f"Se recibieron {escritos} de {paquete['tamano_total']} bytes")
+        except Exception:
+            os.close(fd)
+            os.remove(temporal)
+            raise
+        os.close(fd)
+        os.replace(temporal, nombre)
 
-                # Ahora sigue recibiendo el resto del archivo
-                while total_recibido < tamano:
-                    chunk = conn.recv(BUFFER_SIZE)
-                    if not chunk:
-                        break
-                    f.write(chunk)
-                    total_recibido += len(chunk)
+    print(f"[Receptor] Archivo '{nombre}' recibido comprimido con {paquete['compresion']} "
+          f"({escritos} bytes)")
+    return escritos
 
-            print(f"[Receptor] Archivo '{nombre}' recibido correctamente ({total_recibido} bytes)")
+def atender_conexion(conn, addr, escrituras):
+    """
+    Recibe un archivo (o una franja) de una conexión.
 
+    Args:
+        conn: Socket de la conexión entrante
+        addr: Dirección del nodo que envía
+        escrituras: Semáforo que limita las transferencias escribiendo en disco a la vez
+    """
+    try:
+        # Un emisor detenido o una conexión medio abierta no puede retener un cupo de escritura
+        conn.settimeout(TIEMPO_ESPERA_SOCKET)
+
+        data = recibir_exacto(conn, 10).decode().strip()
+        metadata_len = int(data)
+
+        # Recibir exactamente el JSON; los datos del archivo quedan en el socket
+        json_bytes = recibir_exacto(conn, metadata_len)
+
+        try:
+            metadata_decoded = json_bytes.decode()
+            paquete = json.loads(metadata_decoded)
         except Exception as e:
-            print(f"[ERROR] Fallo al recibir archivo: {e}")
+            print(f"[ERROR] Fallo al decodificar JSON: {e}")
+            return
+
+        nombre = paquete['nombre']
+        tamano = paquete['tamano']
+
+        # El emisor de una transferencia reanudable pregunta qué bloques faltan
+        if paquete.get('tipo') == 'consulta_reanudacion':
+            punto = obtener_punto_control(paquete)
+            with bloqueo_franjas:
+                faltantes = punto.faltantes()
+            print(f"[Receptor] A '{nombre}' le faltan {sum(longitud for _, longitud in faltantes)} bytes")
+            enviar_mensaje(conn, {'faltantes': faltantes})
+            return
+
+        # El emisor de un envío delta pide el índice de bloques del archivo que ya tenemos
+        if paquete.get('tipo') == 'consulta_firmas':
+            indice = indice_base(nombre)
+            print(f"[Receptor] Índice de '{nombre}' enviado ({len(indice['firmas'])} bloques)")
+            enviar_mensaje(conn, indice)
+            return
+
+        # El tamaño del cuerpo comprimido no se conoce de antemano
+        if paquete.get('compresion'):
+            if paquete['tamano_total'] > MAX_FILE_SIZE:
+                raise Exception("Archivo excede 3GB")
+            escritos = recibir_archivo_comprimido(conn, paquete, escrituras)
+            if paquete.get('espera_respuesta'):
+                enviar_mensaje(conn, {'recibidos': escritos, 'completo': True})
+            return
+
+        if tamano > MAX_FILE_SIZE:
+            raise Exception("Archivo excede 3GB")
+
+        if paquete.get('delta'):
+            if paquete['tamano_total'] > MAX_FILE_SIZE:
+                raise Exception("Archivo excede 3GB")
+            completo = recibir_delta(conn, paquete, escrituras)
+            enviar_mensaje(conn, {'recibidos': tamano, 'completo': completo})
+            return
+
+        reanudable = paquete.get('reanudable')
+        # Mientras no haya cupo de escritura los datos esperan en el socket
+        with escrituras:
+            fd, desplazamiento = abrir_destino(paquete)
+            try:
+                seguimiento = None
+                if reanudable:
+                    seguimiento = SeguimientoBloques(obtener_punto_control(paquete), fd, desplazamiento)
+
+                # Recibir el archivo directamente en su posición del archivo destino
+                inicio = time.time()
+                try:
+                    total_recibido = recibir_a_archivo(conn, fd, desplazamiento, tamano,
+                                                       seguimiento.al_recibir if seguimiento else None)
+                finally:
+                    # Aunque la conexión se haya cortado o agotado su tiempo, guardar los bloques que sí llegaron
+                    if seguimiento:
+                        seguimiento.confirmar()
+                duracion = time.time() - inicio
+
+                # Si el emisor cortó antes, no dejar el espacio reservado de más
+                if total_recibido < tamano and 'id_transferencia' not in paquete:
+                    os.ftruncate(fd, total_recibido)
+            finally:
+                os.close(fd)
+
+        # La velocidad de la transferencia es una muestra del enlace por el que llegó
+        if not es_flujo_parcial(paquete):
+            registrar_transferencia(addr[0], conn.getsockname()[0], total_recibido, duracion)
+
+        if reanudable:
+            completo = finalizar_reanudable(paquete, seguimiento.punto)
+            if total_recibido < tamano:
+                print(f"[Receptor] Franja de '{nombre}' interrumpida ({total_recibido}/{tamano} bytes); "
+                      f"se puede reanudar")
+                return
+            enviar_mensaje(conn, {'recibidos': total_recibido, 'completo': completo})
+        else:
+            if 'id_transferencia' in paquete:
+                completo = registrar_franja(paquete, total_recibido)
+            else:
+                completo = total_recibido == tamano
+                print(f"[Receptor] Archivo '{nombre}' recibido correctamente ({total_recibido} bytes)")
+            # Confirmación de extremo a extremo: el emisor sabe que los datos llegaron al destino
+            if paquete.get('espera_respuesta') and total_recibido == tamano:
+                enviar_mensaje(conn, {'recibidos': total_recibido, 'completo': completo})
+
+    except Exception as e:
+        print(f"[ERROR] Fallo al recibir archivo de {addr[0]}: {e}")
+    finally:
+        conn.close()
+
+def recibir_archivo(max_conexiones=MAX_CONEXIONES_SIMULTANEAS, max_escrituras=MAX_ESCRITURAS_SIMULTANEAS):
+    """
+    Acepta transferencias de varios emisores a la vez.
+
+    Cada conexión se atiende en un hilo de un pool acotado y escribe en su
+    propio descriptor de archivo. Un semáforo global limita cuántas
+    transferencias escriben en disco al mismo tiempo.
+
+    Args:
+        max_conexiones: Número máximo de transferencias atendidas a la vez
+        max_escrituras: Número máximo de transferencias escribiendo en disco a la vez
+    """
+    servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    servidor.bind(('0.0.0.0', PUERTO_ESCUCHA))
+    servidor.listen(max(5, max_conexiones))
+    print(f"[Receptor] Esperando archivos en el puerto {PUERTO_ESCUCHA} "
+          f"(máx. {max_conexiones} conexiones, {max_escrituras} escrituras simultáneas)...")
+
+    cupos = threading.BoundedSemaphore(max_conexiones)
+    escrituras = threading.BoundedSemaphore(max_escrituras)
+
+    def atender_y_liberar(conn, addr):
+        try:
+            atender_conexion(conn, addr, escrituras)
         finally:
-            conn.close()
+            cupos.release()
+
+    with ThreadPoolExecutor(max_workers=max_conexiones) as pool:
+        while True:
+            # No aceptar más conexiones hasta que haya un cupo libre
+            cupos.acquire()
+            try:
+                conn, addr = servidor.accept()
+            except Exception:
+                cupos.release()
+                raise
+            print(f"[Receptor] Conexión desde {addr[0]}")
+            pool.submit(atender_y_liberar, conn, addr)
 
 if __name__ == "__main__":
-    recibir_archivo()
+    if len(sys.argv) > 3:
+        print("Uso: python receptor.py [max_conexiones] [max_escrituras]")
+    else:
+        max_conexiones = int(sys.argv[1]) if len(sys.argv) > 1 else MAX_CONEXIONES_SIMULTANEAS
+        max_escrituras = int(sys.argv[2]) if len(sys.argv) > 2 else MAX_ESCRITURAS_SIMULTANEAS
+        recibir_archivo(max_conexiones, max_escrituras)
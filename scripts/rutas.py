@@ -0,0 +1,663 @@
+import heapq
+from array import array
+from grafo import como_csr
+
+# Costo fijo (s) de pasar por cada nodo principal intermedio: conexión al
+# siguiente salto, lectura de metadatos y arranque del reenvío
+SOBRECARGA_POR_SALTO = 0.05
+
+# Rutas de menor latencia que se suman a las candidatas al repartir varias transferencias
+K_RUTAS_PLAN = 4
+
+# Implementación del algoritmo de Dijkstra
+def dijkstra(grafo, inicio, fin, use_latency=True):
+    """
+    Implementación del algoritmo de Dijkstra para encontrar la ruta más corta.
+
+    Args:
+        grafo: Diccionario de diccionarios con pesos (latencia o ancho de banda),
+            o un GrafoCSR
+        inicio: Nodo inicial
+        fin: Nodo final
+        use_latency: Si True, minimiza latencia; si False, maximiza ancho de banda
+
+    Returns:
+        Distancia total y lista de nodos que forman la ruta
+        (latencia total, o ancho de banda mínimo de la ruta si use_latency es False)
+    """
+    # Para ancho de banda se busca la ruta con el mayor cuello de botella
+    if not use_latency:
+        return dijkstra_ancho_banda(grafo, inicio, fin)
+
+    return _camino_minimo(grafo, inicio, fin)
+
+def _camino_minimo(grafo, inicio, fin, ancho_minimo=None, grafo_ancho_banda=None, peso_extra=0):
+    """
+    Dijkstra clásico que suma los pesos de las aristas.
+
+    Si se indica ancho_minimo, sólo se usan las aristas cuyo ancho de banda en
+    grafo_ancho_banda sea al menos ese valor. peso_extra se suma a cada arista.
+    """
+    if ancho_minimo is not None:
+        csr = como_csr(grafo, ancho_banda=grafo_ancho_banda)
+    else:
+        csr = como_csr(grafo)
+    if inicio not in csr.indice or fin not in csr.indice:
+        return float('inf'), []
+    distancia, ruta, _ = _camino_minimo_csr(csr, csr.indice[inicio], csr.indice[fin], ancho_minimo, peso_extra)
+    return distancia, [csr.nodos[nodo] for nodo in ruta]
+
+def _camino_minimo_csr(csr, inicio, fin, ancho_minimo=None, peso_extra=0, retiradas=None, bloqueados=None):
+    """
+    Dijkstra sobre un GrafoCSR con ids enteros.
+
+    Con ancho_minimo se descartan las aristas cuyo atributo 'ancho_banda'
+    sea menor. retiradas marca con 1 las posiciones de las aristas que no
+    se pueden usar y bloqueados los nodos por los que no se puede pasar.
+
+    Returns:
+        Distancia, lista de ids de la ruta y lista de posiciones de sus aristas
+    """
+    n = csr.num_nodos()
+    inicios, destinos, pesos = csr.inicios, csr.destinos, csr.pesos
+    anchos = csr.atributos.get('ancho_banda') if ancho_minimo is not None else None
+
+    # Inicializar
+    distancias = [float('inf')] * n
+    distancias[inicio] = 0
+    # Los nodos bloqueados se tratan como ya visitados
+    visitados = bytearray(bloqueados) if bloqueados is not None else bytearray(n)
+    padres = array('l', [-1]) * n
+    aristas_padre = array('l', [-1]) * n
+    cola_prioridad = [(0, inicio)]
+
+    while cola_prioridad:
+        # Obtener el nodo de menor distancia
+        distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
+
+        # Si llegamos al destino, terminamos
+        if nodo_actual == fin:
+            break
+
+        # Si ya visitamos el nodo, continuamos
+        if visitados[nodo_actual]:
+            continue
+
+        # Marcar como visitado
+        visitados[nodo_actual] = 1
+
+        # Explorar vecinos (un tramo contiguo de los arreglos)
+        for posicion in range(inicios[nodo_actual], inicios[nodo_actual + 1]):
+            # Descartar aristas más angostas que el ancho mínimo pedido
+            if anchos is not None and anchos[posicion] < ancho_minimo:
+                continue
+            if retiradas is not None and retiradas[posicion]:
+                continue
+            vecino = destinos[posicion]
+            # Si el vecino no ha sido visitado
+            if not visitados[vecino]:
+                nueva_distancia = distancia_actual + pesos[posicion] + peso_extra
+                # Si encontramos un camino más corto
+                if nueva_distancia < distancias[vecino]:
+                    distancias[vecino] = nueva_distancia
+                    padres[vecino] = nodo_actual
+                    aristas_padre[vecino] = posicion
+                    heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+
+    ruta, aristas = _reconstruir_ruta(padres, aristas_padre, inicio, fin)
+
+    # Si no hay ruta
+    if not ruta:
+        return float('inf'), [], []
+
+    return distancias[fin], ruta, aristas
+
+def dijkstra_ancho_banda(grafo, inicio, fin):
+    """
+    Ruta de mayor ancho de banda (widest path).
+
+    Variante de Dijkstra que maximiza el ancho de banda mínimo de la ruta
+    (su cuello de botella) en lugar de sumar pesos. A igual cuello de
+    botella se prefiere la ruta con menos saltos.
+
+    Args:
+        grafo: Diccionario de diccionarios con anchos de banda (Mbps), o un GrafoCSR
+        inicio: Nodo inicial
+        fin: Nodo final
+
+    Returns:
+        Ancho de banda del cuello de botella y lista de nodos que forman la ruta
+    """
+    csr = como_csr(grafo)
+    if inicio not in csr.indice or fin not in csr.indice:
+        return 0, []
+    ancho, ruta, _ = _ancho_banda_csr(csr, csr.indice[inicio], csr.indice[fin])
+    return ancho, [csr.nodos[nodo] for nodo in ruta]
+
+def _ancho_banda_csr(csr, inicio, fin, retiradas=None, bloqueados=None):
+    """
+    Ruta de mayor cuello de botella sobre un GrafoCSR con ids enteros.
+
+    retiradas, si se indica, marca con 1 las posiciones de las aristas que
+    no se pueden usar, y bloqueados los nodos por los que no se puede pasar.
+
+    Returns:
+        Cuello de botella, lista de ids de la ruta y lista de posiciones de sus aristas
+    """
+    n = csr.num_nodos()
+    inicios, destinos, pesos = csr.inicios, csr.destinos, csr.pesos
+
+    anchos = [0] * n
+    anchos[inicio] = float('inf')
+    saltos = [float('inf')] * n
+    saltos[inicio] = 0
+    visitados = bytearray(bloqueados) if bloqueados is not None else bytearray(n)
+    padres = array('l', [-1]) * n
+    aristas_padre = array('l', [-1]) * n
+    # Cola de máximos: se guarda el ancho en negativo
+    cola_prioridad = [(-anchos[inicio], 0, inicio)]
+
+    while cola_prioridad:
+        _, saltos_actual, nodo_actual = heapq.heappop(cola_prioridad)
+
+        if nodo_actual == fin:
+            break
+
+        if visitados[nodo_actual]:
+            continue
+
+        visitados[nodo_actual] = 1
+
+        for posicion in range(inicios[nodo_actual], inicios[nodo_actual + 1]):
+            vecino = destinos[posicion]
+            ancho = pesos[posicion]
+            if visitados[vecino] or ancho <= 0 or (retiradas is not None and retiradas[posicion]):
+                continue
+            nuevo_ancho = min(anchos[nodo_actual], ancho)
+            nuevos_saltos = saltos_actual + 1
+            # Mejor cuello de botella, o el mismo con menos saltos
+            if (nuevo_ancho > anchos[vecino] or
+                    (nuevo_ancho == anchos[vecino] and nuevos_saltos < saltos[vecino])):
+                anchos[vecino] = nuevo_ancho
+                saltos[vecino] = nuevos_saltos
+                padres[vecino] = nodo_actual
+                aristas_padre[vecino] = posicion
+                heapq.heappush(cola_prioridad, (-nuevo_ancho, nuevos_saltos, vecino))
+
+    ruta, aristas = _reconstruir_ruta(padres, aristas_padre, inicio, fin)
+
+    if not ruta or len(ruta) < 2:
+        return 0, ruta, aristas
+
+    return anchos[fin], ruta, aristas
+
+def tiempo_estimado(ruta, grafo_latencia, grafo_ancho_banda, tamano_bytes, sobrecarga_salto=0):
+    """
+    Estima el tiempo (s) de transferir tamano_bytes por una ruta.
+
+    Suma las latencias (ms) de cada salto, el tiempo de enviar el archivo al
+    ancho de banda del cuello de botella (Mbps) y la sobrecarga de cada nodo
+    principal intermedio.
+    """
+    if len(ruta) < 2:
+        return 0.0
+    latencia_ms = sum(grafo_latencia[ruta[i]][ruta[i+1]] for i in range(len(ruta) - 1))
+    cuello = min(grafo_ancho_banda[ruta[i]][ruta[i+1]] for i in range(len(ruta) - 1))
+    return _tiempo(latencia_ms, cuello, len(ruta), tamano_bytes, sobrecarga_salto)
+
+def _tiempo(latencia_ms, cuello, num_nodos, tamano_bytes, sobrecarga_salto):
+    """Tiempo estimado (s) de una ruta de num_nodos nodos con esa latencia total y ese cuello de botella"""
+    if cuello <= 0:
+        return float('inf')
+    return latencia_ms / 1000.0 + tamano_bytes * 8 / (cuello * 1e6) + sobrecarga_salto * (num_nodos - 2)
+
+def rutas_candidatas(grafo_latencia, grafo_ancho_banda, inicio, fin, sobrecarga_salto=SOBRECARGA_POR_SALTO):
+    """
+    Rutas candidatas a ser la de menor tiempo estimado, para cualquier tamaño de archivo.
+
+    Para cada ancho de banda posible como cuello de botella se busca la ruta
+    que minimiza latencia + sobrecarga usando sólo aristas al menos así de
+    anchas. No dependen del tamaño, así que se pueden calcular una vez y
+    ordenar después para cada archivo (ver ordenar_por_tiempo).
+
+    Args:
+        grafo_latencia: Diccionario de diccionarios con latencias (ms), o un
+            GrafoCSR con el atributo 'ancho_banda'
+        grafo_ancho_banda: Diccionario de diccionarios con anchos de banda (Mbps)
+            (se ignora si grafo_latencia ya es un GrafoCSR)
+        inicio: Nodo inicial
+        fin: Nodo final
+        sobrecarga_salto: Segundos que agrega cada nodo principal intermedio
+
+    Returns:
+        Lista de (ruta, latencia total, cuello de botella)
+    """
+    # Un solo grafo CSR para todas las búsquedas: latencia como peso y ancho de banda como atributo
+    csr = como_csr(grafo_latencia, ancho_banda=grafo_ancho_banda)
+    if inicio not in csr.indice or fin not in csr.indice:
+        return []
+    anchos = csr.atributos['ancho_banda']
+    umbrales = sorted({ancho for ancho in anchos if ancho > 0}, reverse=True)
+
+    candidatas = {}
+    for umbral in umbrales:
+        _, ids, aristas = _camino_minimo_csr(csr, csr.indice[inicio], csr.indice[fin], umbral,
+                                             peso_extra=sobrecarga_salto * 1000)
+        ruta = tuple(csr.nodos[nodo] for nodo in ids)
+        if len(ruta) < 2 or ruta in candidatas:
+            continue
+        latencia = sum(csr.pesos[posicion] for posicion in aristas)
+        cuello = min(anchos[posicion] for posicion in aristas)
+        candidatas[ruta] = (ruta, latencia, cuello)
+    return list(candidatas.values())
+
+def ordenar_por_tiempo(candidatas, tamano_bytes, sobrecarga_salto=SOBRECARGA_POR_SALTO):
+    """
+    Ordena las rutas candidatas por su tiempo estimado para un tamaño de archivo.
+
+    Returns:
+        Lista de (tiempo estimado, ruta, latencia total, cuello de botella),
+        de menor a mayor tiempo
+    """
+    resultado = [(_tiempo(latencia, cuello, len(ruta), tamano_bytes, sobrecarga_salto), list(ruta), latencia, cuello)
+                 for ruta, latencia, cuello in candidatas]
+    return sorted(resultado, key=lambda candidata: (candidata[0], len(candidata[1])))
+
+def rutas_por_tiempo_estimado(grafo_latencia, grafo_ancho_banda, inicio, fin, tamano_bytes,
+                              sobrecarga_salto=SOBRECARGA_POR_SALTO):
+    """
+    Rutas candidatas ordenadas por tiempo estimado de transferencia.
+
+    El tiempo de una ruta es su latencia total, más tamaño / cuello de botella,
+    más la sobrecarga de cada nodo principal intermedio. La mejor de las
+    candidatas (ver rutas_candidatas) es la ruta óptima. Así los archivos
+    pequeños toman la ruta de menor latencia y los grandes la de mayor capacidad.
+
+    Args:
+        grafo_latencia: Diccionario de diccionarios con latencias (ms)
+        grafo_ancho_banda: Diccionario de diccionarios con anchos de banda (Mbps)
+        inicio: Nodo inicial
+        fin: Nodo final
+        tamano_bytes: Tamaño del archivo a transferir
+        sobrecarga_salto: Segundos que agrega cada nodo principal intermedio
+
+    Returns:
+        Lista de (tiempo estimado, ruta, latencia total, cuello de botella),
+        de menor a mayor tiempo
+    """
+    candidatas = rutas_candidatas(grafo_latencia, grafo_ancho_banda, inicio, fin, sobrecarga_salto)
+    return ordenar_por_tiempo(candidatas, tamano_bytes, sobrecarga_salto)
+
+def ruta_menor_tiempo(grafo_latencia, grafo_ancho_banda, inicio, fin, tamano_bytes,
+                      sobrecarga_salto=SOBRECARGA_POR_SALTO):
+    """
+    Ruta con el menor tiempo estimado de transferencia para un tamaño de archivo.
+
+    Returns:
+        Tiempo estimado en segundos y lista de nodos que forman la ruta
+    """
+    candidatas = rutas_por_tiempo_estimado(grafo_latencia, grafo_ancho_banda, inicio, fin,
+                                           tamano_bytes, sobrecarga_salto)
+    if not candidatas:
+        return float('inf'), []
+    tiempo, ruta, _, _ = candidatas[0]
+    return tiempo, ruta
+
+def rutas_disjuntas(grafo_ancho_banda, inicio, fin, max_rutas=None):
+    """
+    Rutas sin aristas en común, de mayor a menor ancho de banda.
+
+    Toma repetidamente la ruta de mayor cuello de botella y retira sus
+    aristas del grafo, hasta que no queda ruta o se llega a max_rutas.
+
+    Args:
+        grafo_ancho_banda: Diccionario de diccionarios con anchos de banda (Mbps), o un GrafoCSR
+        inicio: Nodo inicial
+        fin: Nodo final
+        max_rutas: Número máximo de rutas a devolver (None = todas)
+
+    Returns:
+        Lista de (cuello de botella, ruta)
+    """
+    csr = como_csr(grafo_ancho_banda)
+    if inicio not in csr.indice or fin not in csr.indice:
+        return []
+    # Aristas ya usadas por alguna ruta, marcadas por su posición
+    retiradas = bytearray(csr.num_aristas())
+    rutas = []
+    while max_rutas is None or len(rutas) < max_rutas:
+        cuello, ruta, aristas = _ancho_banda_csr(csr, csr.indice[inicio], csr.indice[fin], retiradas)
+        if len(ruta) < 2 or cuello <= 0:
+            break
+        rutas.append((cuello, [csr.nodos[nodo] for nodo in ruta]))
+        for posicion in aristas:
+            retiradas[posicion] = 1
+    return rutas
+
+def k_rutas_mas_cortas(grafo, inicio, fin, k, use_latency=True):
+    """
+    Las k mejores rutas sin ciclos entre dos nodos (algoritmo de Yen).
+
+    Cada ruta nueva se obtiene desviando alguna de las ya encontradas: para
+    cada nodo de la última ruta (nodo de desvío) se conserva el tramo
+    anterior, se retiran las aristas que usaron las rutas con ese mismo
+    tramo y se bloquean los nodos del tramo; la mejor continuación desde el
+    nodo de desvío es una candidata. La mejor candidata pendiente es la
+    siguiente ruta.
+
+    Args:
+        grafo: Diccionario de diccionarios con pesos (latencia o ancho de banda),
+            o un GrafoCSR
+        inicio: Nodo inicial
+        fin: Nodo final
+        k: Número máximo de rutas
+        use_latency: Si True, minimiza latencia; si False, maximiza ancho de banda
+
+    Returns:
+        Lista de (latencia total o cuello de botella, ruta), de mejor a peor
+    """
+    csr = como_csr(grafo)
+    if inicio not in csr.indice or fin not in csr.indice or inicio == fin or k < 1:
+        return []
+    origen, destino = csr.indice[inicio], csr.indice[fin]
+
+    def buscar(desde, retiradas, bloqueados):
+        if use_latency:
+            _, ids, aristas = _camino_minimo_csr(csr, desde, destino, retiradas=retiradas, bloqueados=bloqueados)
+        else:
+            _, ids, aristas = _ancho_banda_csr(csr, desde, destino, retiradas, bloqueados)
+        return ids, aristas
+
+    def valor(aristas):
+        if use_latency:
+            return sum(csr.pesos[posicion] for posicion in aristas)
+        return min(csr.pesos[posicion] for posicion in aristas)
+
+    def clave(aristas):
+        # Menor es mejor: latencia, o ancho de banda en negativo; a igualdad, menos saltos
+        return (valor(aristas) if use_latency else -valor(aristas), len(aristas))
+
+    ids, aristas = buscar(origen, None, None)
+    if len(ids) < 2:
+        return []
+    encontradas = [(ids, aristas)]
+    candidatas = []
+    vistas = {tuple(ids)}
+
+    while len(encontradas) < k:
+        ultima_ids, ultima_aristas = encontradas[-1]
+        for i in range(len(ultima_ids) - 1):
+            tramo_ids, tramo_aristas = ultima_ids[:i + 1], ultima_aristas[:i]
+
+            retiradas = bytearray(csr.num_aristas())
+            for ruta_ids, ruta_aristas in encontradas:
+                if ruta_ids[:i + 1] == tramo_ids:
+                    retiradas[ruta_aristas[i]] = 1
+            bloqueados = bytearray(csr.num_nodos())
+            for nodo in tramo_ids[:-1]:
+                bloqueados[nodo] = 1
+
+            desvio_ids, desvio_aristas = buscar(ultima_ids[i], retiradas, bloqueados)
+            if len(desvio_ids) < 2:
+                continue
+            ruta_ids = tramo_ids + desvio_ids[1:]
+            if tuple(ruta_ids) in vistas:
+                continue
+            vistas.add(tuple(ruta_ids))
+            ruta_aristas = tramo_aristas + desvio_aristas
+            heapq.heappush(candidatas, (clave(ruta_aristas), ruta_ids, ruta_aristas))
+
+        if not candidatas:
+            break
+        _, ids, aristas = heapq.heappop(candidatas)
+        encontradas.append((ids, aristas))
+
+    return [(valor(aristas), [csr.nodos[nodo] for nodo in ids]) for ids, aristas in encontradas]
+
+def max_rutas_disjuntas(grafo, inicio, fin, use_latency=True, nodos_disjuntos=False):
+    """
+    El mayor número posible de rutas sin aristas (o sin nodos) en común.
+
+    Se resuelve como un flujo de costo mínimo con capacidad 1 en cada
+    arista: cada camino de aumento suma una ruta, y entre los conjuntos
+    con el máximo de rutas se elige el de menor costo total (latencia, o
+    1 / ancho de banda para preferir enlaces anchos). Con nodos_disjuntos
+    cada nodo intermedio se divide en entrada y salida unidas por una
+    arista de capacidad 1, así ningún nodo principal lleva dos rutas.
+
+    A diferencia de rutas_disjuntas (que toma vorazmente la ruta más ancha
+    y retira sus aristas), aquí nunca se pierden rutas por una mala
+    primera elección.
+
+    Args:
+        grafo: Diccionario de diccionarios con pesos (latencia o ancho de banda),
+            o un GrafoCSR
+        inicio: Nodo inicial
+        fin: Nodo final
+        use_latency: Si True, los pesos son latencias; si False, anchos de banda
+        nodos_disjuntos: Si True, las rutas no comparten nodos intermedios
+
+    Returns:
+        Lista de (latencia total o cuello de botella, ruta), de mejor a peor
+    """
+    csr = como_csr(grafo)
+    if inicio not in csr.indice or fin not in csr.indice or inicio == fin:
+        return []
+    n = csr.num_nodos()
+    origen, destino = csr.indice[inicio], csr.indice[fin]
+
+    # Red de flujo: listas de adyacencia de aristas; la arista e y su inversa e ^ 1
+    adyacentes = [[] for _ in range(2 * n if nodos_disjuntos else n)]
+    hacia, capacidad, costo, posicion_original = [], [], [], []
+
+    def agregar(u, v, costo_arista, posicion):
+        for a, b, cap, c in ((u, v, 1, costo_arista), (v, u, 0, -costo_arista)):
+            adyacentes[a].append(len(hacia))
+            hacia.append(b)
+            capacidad.append(cap)
+            costo.append(c)
+            posicion_original.append(posicion)
+
+    def salida(nodo):
+        # Con nodos disjuntos, el nodo v entra por v y sale por v + n
+        return nodo + n if nodos_disjuntos and nodo not in (origen, destino) else nodo
+
+    if nodos_disjuntos:
+        for nodo in range(n):
+            if nodo not in (origen, destino):
+                agregar(nodo, nodo + n, 0, -1)
+    for u, v, posicion in csr.aristas_con_posicion():
+        peso = csr.pesos[posicion]
+        if u == v or v == origen or u == destino or (not use_latency and peso <= 0):
+            continue
+        agregar(salida(u), v, peso if use_latency else 1.0 / peso, posicion)
+
+    # Caminos de aumento más baratos con Dijkstra sobre costos reducidos (potenciales)
+    total = len(adyacentes)
+    potencial = [0.0] * total
+    while True:
+        distancias = [float('inf')] * total
+        distancias[origen] = 0.0
+        arista_padre = [-1] * total
+        cola_prioridad = [(0.0, origen)]
+        while cola_prioridad:
+            distancia_actual, nodo_actual = heapq.heappop(cola_prioridad)
+            if distancia_actual > distancias[nodo_actual]:
+                continue
+            for e in adyacentes[nodo_actual]:
+                if capacidad[e] <= 0:
+                    continue
+                vecino = hacia[e]
+                reducido = costo[e] + potencial[nodo_actual] - potencial[vecino]
+                nueva_distancia = distancia_actual + max(reducido, 0.0)
+                if nueva_distancia < distancias[vecino]:
+                    distancias[vecino] = nueva_distancia
+                    arista_padre[vecino] = e
+                    heapq.heappush(cola_prioridad, (nueva_distancia, vecino))
+        if distancias[destino] == float('inf'):
+            break
+        for nodo in range(total):
+            potencial[nodo] += min(distancias[nodo], distancias[destino])
+        nodo = destino
+        while nodo != origen:
+            e = arista_padre[nodo]
+            capacidad[e] -= 1
+            capacidad[e ^ 1] += 1
+            nodo = hacia[e ^ 1]
+
+    # Descomponer el flujo en rutas: seguir desde el origen las aristas con flujo
+    usadas = set()
+    rutas = []
+    while True:
+        nodo, aristas = origen, []
+        while nodo != destino:
+            siguiente = None
+            for e in adyacentes[nodo]:
+                if e % 2 == 0 and capacidad[e] == 0 and e not in usadas:
+                    siguiente = e
+                    break
+            if siguiente is None:
+                break
+            usadas.add(siguiente)
+            if posicion_original[siguiente] != -1:
+                aristas.append(posicion_original[siguiente])
+            nodo = hacia[siguiente]
+        if nodo != destino:
+            break
+        rutas.append(_quitar_ciclos(csr, origen, aristas))
+
+    resultado = []
+    for aristas in rutas:
+        if use_latency:
+            valor = sum(csr.pesos[posicion] for posicion in aristas)
+        else:
+            valor = min(csr.pesos[posicion] for posicion in aristas)
+        ruta = [inicio] + [csr.nodos[csr.destinos[posicion]] for posicion in aristas]
+        resultado.append((valor, ruta))
+    resultado.sort(key=lambda r: (r[0] if use_latency else -r[0], len(r[1])))
+    return resultado
+
+def rutas_para_plan(grafo_latencia, grafo_ancho_banda, inicio, fin, k=K_RUTAS_PLAN,
+                    sobrecarga_salto=SOBRECARGA_POR_SALTO):
+    """
+    Rutas entre las que asignar_rutas elige la de cada transferencia.
+
+    Son las candidatas a menor tiempo (ver rutas_candidatas), que cubren
+    cada cuello de botella posible, más las k de menor latencia (ver
+    k_rutas_mas_cortas), que dan rutas distintas para repartir la carga
+    cuando la mejor ya está ocupada.
+
+    Returns:
+        Lista de rutas (tuplas de IPs) sin repetir
+    """
+    csr = como_csr(grafo_latencia, ancho_banda=grafo_ancho_banda)
+    rutas = {ruta: None for ruta, _, _ in rutas_candidatas(csr, None, inicio, fin, sobrecarga_salto)}
+    for _, ruta in k_rutas_mas_cortas(csr, inicio, fin, k):
+        rutas.setdefault(tuple(ruta), None)
+    return list(rutas)
+
+def asignar_rutas(grafo_latencia, grafo_ancho_banda, transferencias, carga=None, rutas=None,
+                  sobrecarga_salto=SOBRECARGA_POR_SALTO):
+    """
+    Asigna una ruta a cada una de varias transferencias simultáneas, repartiendo la carga entre los enlaces.
+
+    Con Dijkstra por separado todas las transferencias eligen la misma
+    ruta y saturan sus enlaces. Aquí se asignan de mayor a menor (LPT) y
+    cada una toma la ruta en la que terminaría antes contando los bytes que
+    ya llevan sus enlaces: un enlace con carga bytes y ancho de banda B
+    termina de pasar un archivo de tamaño t en (carga + t) * 8 / B, y la
+    transferencia termina cuando termina su enlace más lento, más la
+    latencia y la sobrecarga de la ruta. Así se busca el menor tiempo en
+    que terminan todas (makespan).
+
+    Args:
+        grafo_latencia: Diccionario de diccionarios con latencias (ms), o un
+            GrafoCSR con el atributo 'ancho_banda'
+        grafo_ancho_banda: Diccionario de diccionarios con anchos de banda (Mbps)
+            (se ignora si grafo_latencia ya es un GrafoCSR)
+        transferencias: Lista de (id, origen, destino, tamaño en bytes)
+        carga: Diccionario {(u, v): bytes} con lo que ya llevan los enlaces
+            (transferencias en curso); no se modifica
+        rutas: Función opcional (origen, destino) -> rutas candidatas, para
+            reutilizar las ya calculadas (por omisión rutas_para_plan)
+        sobrecarga_salto: Segundos que agrega cada nodo principal intermedio
+
+    Returns:
+        Diccionario {id: (tiempo estimado de fin, ruta)} y el makespan estimado.
+        Las transferencias sin ruta no aparecen en el diccionario.
+    """
+    csr = como_csr(grafo_latencia, ancho_banda=grafo_ancho_banda)
+    latencias, anchos = {}, {}
+    for u, v, posicion in csr.aristas_con_posicion():
+        latencias[csr.nodos[u], csr.nodos[v]] = csr.pesos[posicion]
+        anchos[csr.nodos[u], csr.nodos[v]] = csr.atributos['ancho_banda'][posicion]
+
+    carga = dict(carga or {})
+    if rutas is None:
+        rutas = lambda origen, destino: rutas_para_plan(csr, None, origen, destino, sobrecarga_salto=sobrecarga_salto)
+    candidatas = {}
+    asignadas = {}
+
+    def fijo(ruta):
+        """Latencia y sobrecarga de la ruta (s), que no dependen de la carga"""
+        latencia = sum(latencias[ruta[i], ruta[i + 1]] for i in range(len(ruta) - 1))
+        return latencia / 1000.0 + sobrecarga_salto * (len(ruta) - 2)
+
+    for id_transferencia, origen, destino, tamano in sorted(transferencias, key=lambda t: -t[3]):
+        if (origen, destino) not in candidatas:
+            candidatas[origen, destino] = [(fijo(ruta), ruta, [(ruta[i], ruta[i + 1]) for i in range(len(ruta) - 1)])
+                                           for ruta in rutas(origen, destino)
+                                           if all(anchos.get((ruta[i], ruta[i + 1]), 0) > 0 for i in range(len(ruta) - 1))]
+        mejor = None
+        for base, ruta, enlaces in candidatas[origen, destino]:
+            fin = base + max((carga.get(enlace, 0) + tamano) * 8 / (anchos[enlace] * 1e6) for enlace in enlaces)
+            if mejor is None or (fin, len(ruta)) < (mejor[0], len(mejor[1])):
+                mejor = (fin, ruta, enlaces)
+        if mejor is None:
+            continue
+        for enlace in mejor[2]:
+            carga[enlace] = carga.get(enlace, 0) + tamano
+        asignadas[id_transferencia] = mejor
+
+    # Con todas asignadas, cada una termina cuando sus enlaces terminan de pasar toda su carga
+    resultado = {}
+    for id_transferencia, (_, ruta, enlaces) in asignadas.items():
+        fin = fijo(ruta) + max(carga[enlace] * 8 / (anchos[enlace] * 1e6) for enlace in enlaces)
+        resultado[id_transferencia] = (fin, list(ruta))
+    makespan = max((fin for fin, _ in resultado.values()), default=0.0)
+    return resultado, makespan
+
+def _quitar_ciclos(csr, origen, aristas):
+    """Quita de una ruta (lista de posiciones de aristas) los ciclos que vuelven a un nodo ya visitado"""
+    resultado = []
+    posiciones_nodo = {origen: 0}
+    for posicion in aristas:
+        destino = csr.destinos[posicion]
+        if destino in posiciones_nodo:
+            del resultado[posiciones_nodo[destino]:]
+            posiciones_nodo = {nodo: i for nodo, i in posiciones_nodo.items() if i <= len(resultado)}
+        else:
+            resultado.append(posicion)
+            posiciones_nodo[destino] = len(resultado)
+    return resultado
+
+def _reconstruir_ruta(padres, aristas_padre, inicio, fin):
+    """
+    Reconstruye la ruta desde los padres; devuelve ([], []) si no se llegó al destino.
+
+    Returns:
+        Lista de ids de los nodos y lista de posiciones de las aristas de la ruta
+    """
+    ruta = [fin]
+    aristas = []
+    nodo_actual = fin
+    while padres[nodo_actual] != -1:
+        aristas.append(aristas_padre[nodo_actual])
+        nodo_actual = padres[nodo_actual]
+        ruta.append(nodo_actual)
+    ruta.reverse()
+    aristas.reverse()
+
+    if ruta[0] != inicio:
+        return [], []
+    return ruta, aristas
@@ -0,0 +1,531 @@
+import sys
+import heapq
+import threading
+from array import array
+from collections import OrderedDict
+from grafo import como_csr
+from topologia import topologia_compartida
+from rutas import (dijkstra, rutas_candidatas, ordenar_por_tiempo, k_rutas_mas_cortas, max_rutas_disjuntas,
+                   rutas_para_plan, asignar_rutas)
+
+INFINITO = float('inf')
+
+# Si cambian más pesos a la vez, sale más barato recalcular la tabla entera
+MAX_CAMBIOS_INCREMENTALES = 32
+
+# Rutas calculadas que se guardan en la caché (las menos usadas se descartan)
+MAX_RUTAS_CACHE = 1024
+
+# Rutas de respaldo que se calculan junto con la óptima
+K_RUTAS_ALTERNATIVAS = 4
+
+class Metrica:
+    """
+    Cómo se acumulan los pesos de una métrica a lo largo de una ruta.
+
+    Todas las métricas se tratan como costos a minimizar: la latencia se
+    suma y el ancho de banda se guarda en negativo, de modo que el cuello
+    de botella de la ruta es el máximo de los costos de sus aristas.
+    """
+    def __init__(self, origen, extender, valida, valor):
+        self.origen = origen        # Costo de la ruta vacía (del destino a sí mismo)
+        self.extender = extender    # (costo de la ruta, peso de la arista) -> costo con la arista
+        self.valida = valida        # Si una arista con ese peso se puede usar
+        self.valor = valor          # Costo -> valor que se muestra (ms o Mbps)
+
+METRICAS = {
+    'latencia': Metrica(0.0, lambda costo, peso: costo + peso, lambda peso: peso >= 0,
+                        lambda costo: costo),
+    'ancho_banda': Metrica(-INFINITO, lambda costo, peso: max(costo, -peso), lambda peso: peso > 0,
+                           lambda costo: -costo if costo < INFINITO else 0),
+}
+
+class TablaRutas:
+    """
+    Tablas de siguiente salto de todos los pares origen/destino, para cada métrica.
+
+    Para cada destino se guarda el árbol de rutas óptimas hacia él (un
+    Dijkstra sobre las aristas invertidas): costos[metrica][destino][u] es
+    el costo de la mejor ruta de u al destino y siguientes[metrica][destino][u]
+    el primer salto de esa ruta. Consultar el siguiente salto es indexar dos
+    arreglos (O(1)), así que un nodo principal puede hacerlo en cada reenvío.
+
+    Cuando cambia el peso de una arista sólo se reparan los árboles que la
+    usan: si la arista mejora, la mejora se propaga desde su origen; si
+    empeora y estaba en el árbol, se recalculan sólo los nodos cuya ruta
+    pasaba por ella (el subárbol que cuelga de la arista).
+    """
+    def __init__(self, csr):
+        self.bloqueo = threading.RLock()
+        self._construir(csr)
+
+    @classmethod
+    def desde_grafos(cls, grafo_latencia, grafo_ancho_banda):
+        """Construye la tabla a partir de los diccionarios de latencia (ms) y ancho de banda (Mbps)"""
+        return cls(como_csr(grafo_latencia, ancho_banda=grafo_ancho_banda))
+
+    def _construir(self, csr):
+        """Calcula desde cero los árboles de todos los destinos"""
+        self.csr = csr
+        self.nodos = list(csr.nodos)
+        self.indice = dict(csr.indice)
+        self.inicios = csr.inicios
+        self.destinos = csr.destinos
+        self.entrantes = csr.entrantes()
+        self.posiciones = {(u, v): posicion for u, v, posicion in csr.aristas_con_posicion()}
+        # Copias de los pesos: el grafo de la topología es compartido y no se modifica
+        self.pesos = {'latencia': array('d', csr.pesos),
+                      'ancho_banda': array('d', csr.atributos['ancho_banda'])}
+
+        n = len(self.nodos)
+        self.costos = {metrica: [None] * n for metrica in METRICAS}
+        self.siguientes = {metrica: [None] * n for metrica in METRICAS}
+        for metrica in METRICAS:
+            for destino in range(n):
+                self._calcular(metrica, destino)
+
+    def _calcular(self, metrica, destino):
+        """Árbol completo de rutas óptimas hacia un destino"""
+        n = len(self.nodos)
+        costos = [INFINITO] * n
+        costos[destino] = METRICAS[metrica].origen
+        self.costos[metrica][destino] = costos
+        self.siguientes[metrica][destino] = array('l', [-1]) * n
+        self._propagar(metrica, destino, [(costos[destino], 0, destino)])
+
+    def _propagar(self, metrica, destino, cola, permitidos=None):
+        """
+        Dijkstra sobre las aristas invertidas a partir de los nodos de la cola.
+
+        Args:
+            cola: Lista de (costo, saltos, nodo) ya asignados en costos
+            permitidos: Si se indica, sólo se actualizan los nodos marcados con 1
+        """
+        m = METRICAS[metrica]
+        pesos = self.pesos[metrica]
+        costos = self.costos[metrica][destino]
+        siguientes = self.siguientes[metrica][destino]
+        inicios, origenes, posiciones = self.entrantes
+
+        heapq.heapify(cola)
+        while cola:
+            costo, saltos, v = heapq.heappop(cola)
+            # Entrada vieja: el nodo ya mejoró después de meterla en la cola
+            if costo > costos[v]:
+                continue
+            for i in range(inicios[v], inicios[v + 1]):
+                u = origenes[i]
+                if permitidos is not None and not permitidos[u]:
+                    continue
+                peso = pesos[posiciones[i]]
+                if not m.valida(peso):
+                    continue
+                nuevo = m.extender(costo, peso)
+                if nuevo < costos[u]:
+                    costos[u] = nuevo
+                    siguientes[u] = v
+                    heapq.heappush(cola, (nuevo, saltos + 1, u))
+
+    def _cambiar_peso(self, metrica, u, v, posicion, peso):
+        """Aplica el nuevo peso de la arista u -> v y repara los árboles afectados"""
+        m = METRICAS[metrica]
+        if self.pesos[metrica][posicion] == peso:
+            return
+        self.pesos[metrica][posicion] = peso
+
+        for destino in range(len(self.nodos)):
+            costos = self.costos[metrica][destino]
+            siguientes = self.siguientes[metrica][destino]
+            nuevo = m.extender(costos[v], peso) if m.valida(peso) else INFINITO
+            if nuevo < costos[u]:
+                # La arista mejora la ruta de u: u sale ahora por v y la mejora
+                # llega a los nodos que pasan por u
+                costos[u] = nuevo
+                siguientes[u] = v
+                self._propagar(metrica, destino, [(nuevo, 0, u)])
+            elif siguientes[u] == v and nuevo > costos[u]:
+                # La arista estaba en el árbol y empeoró
+                self._reparar_subarbol(metrica, destino, u)
+
+    def _reparar_subarbol(self, metrica, destino, raiz):
+        """
+        Recalcula los nodos cuya ruta hacia el destino pasaba por raiz.
+
+        Los demás nodos conservan su costo (una arista que empeora no mejora
+        ninguna ruta), así que cada nodo afectado parte de su mejor salida
+        directa hacia un nodo no afectado y el Dijkstra se limita al subárbol.
+        """
+        m = METRICAS[metrica]
+        pesos = self.pesos[metrica]
+        costos = self.costos[metrica][destino]
+        siguientes = self.siguientes[metrica][destino]
+        inicios, origenes, _ = self.entrantes
+
+        afectados = bytearray(len(self.nodos))
+        afectados[raiz] = 1
+        subarbol = [raiz]
+        for v in subarbol:
+            for i in range(inicios[v], inicios[v + 1]):
+                u = origenes[i]
+                if siguientes[u] == v and not afectados[u]:
+                    afectados[u] = 1
+                    subarbol.append(u)
+
+        for u in subarbol:
+            costos[u] = INFINITO
+            siguientes[u] = -1
+
+        cola = []
+        for u in subarbol:
+            for posicion in range(self.inicios[u], self.inicios[u + 1]):
+                v = self.destinos[posicion]
+                if afectados[v] or not m.valida(pesos[posicion]):
+                    continue
+                nuevo = m.extender(costos[v], pesos[posicion])
+                if nuevo < costos[u]:
+                    costos[u] = nuevo
+                    siguientes[u] = v
+            if costos[u] < INFINITO:
+                cola.append((costos[u], 0, u))
+        self._propagar(metrica, destino, cola, afectados)
+
+    def actualizar_arista(self, origen, destino, metrica, peso):
+        """
+        Cambia el peso de un enlace y actualiza las tablas de forma incremental.
+
+        Args:
+            origen: IP del nodo de salida
+            destino: IP del nodo de llegada
+            metrica: 'latencia' o 'ancho_banda'
+            peso: Nuevo peso (ms o Mbps)
+
+        Returns:
+            False si el enlace no está en la tabla (hay que reconstruirla)
+        """
+        with self.bloqueo:
+            u, v = self.indice.get(origen), self.indice.get(destino)
+            posicion = self.posiciones.get((u, v))
+            if posicion is None:
+                return False
+            self._cambiar_peso(metrica, u, v, posicion, peso)
+            return True
+
+    def sincronizar(self, csr):
+        """
+        Pone la tabla al día con un grafo nuevo de la misma red.
+
+        Si sólo cambiaron pesos se aplican uno a uno; si cambiaron los nodos
+        o los enlaces, o demasiados pesos a la vez, se recalcula entera.
+
+        Returns:
+            Número de pesos actualizados, o -1 si se recalculó la tabla entera
+        """
+        with self.bloqueo:
+            if csr is self.csr:
+                return 0
+            cambios = self._cambios(csr)
+            if cambios is None or len(cambios) > MAX_CAMBIOS_INCREMENTALES:
+                self._construir(csr)
+                return -1
+            for metrica, u, v, posicion, peso in cambios:
+                self._cambiar_peso(metrica, u, v, posicion, peso)
+            self.csr = csr
+            return len(cambios)
+
+    def _cambios(self, csr):
+        """Pesos que difieren entre la tabla y csr, o None si cambió la estructura de la red"""
+        if csr.nodos != self.nodos or csr.num_aristas() != len(self.posiciones):
+            return None
+        anchos = csr.atributos['ancho_banda']
+        cambios = []
+        for u, v, nueva in csr.aristas_con_posicion():
+            posicion = self.posiciones.get((u, v))
+            if posicion is None:
+                return None
+            if csr.pesos[nueva] != self.pesos['latencia'][posicion]:
+                cambios.append(('latencia', u, v, posicion, csr.pesos[nueva]))
+            if anchos[nueva] != self.pesos['ancho_banda'][posicion]:
+                cambios.append(('ancho_banda', u, v, posicion, anchos[nueva]))
+        return cambios
+
+    def siguiente_salto(self, origen, destino, metrica='latencia'):
+        """IP del siguiente salto de origen hacia destino, o None si no hay ruta"""
+        with self.bloqueo:
+            try:
+                salto = self.siguientes[metrica][self.indice[destino]][self.indice[origen]]
+            except KeyError:
+                return None
+            return self.nodos[salto] if salto != -1 else None
+
+    def valor(self, origen, destino, metrica='latencia'):
+        """Latencia total (ms) o cuello de botella (Mbps) de la mejor ruta"""
+        with self.bloqueo:
+            costo = self.costos[metrica][self.indice[destino]][self.indice[origen]]
+            return METRICAS[metrica].valor(costo)
+
+    def ruta(self, origen, destino, metrica='latencia'):
+        """
+        Ruta completa siguiendo los siguientes saltos.
+
+        Returns:
+            Valor de la ruta (ver valor) y lista de IPs [origen, ..., destino],
+            vacía si no hay ruta
+        """
+        with self.bloqueo:
+            if origen not in self.indice or destino not in self.indice:
+                return METRICAS[metrica].valor(INFINITO), []
+            fin = self.indice[destino]
+            siguientes = self.siguientes[metrica][fin]
+            nodo = self.indice[origen]
+            ruta = [nodo]
+            while nodo != fin:
+                nodo = siguientes[nodo]
+                if nodo == -1 or len(ruta) > len(self.nodos):
+                    return METRICAS[metrica].valor(INFINITO), []
+                ruta.append(nodo)
+            return self.valor(origen, destino, metrica), [self.nodos[nodo] for nodo in ruta]
+
+    def tabla(self, origen, metrica='latencia'):
+        """Tabla de rutas de un nodo: {destino: siguiente salto}"""
+        with self.bloqueo:
+            return {destino: self.siguiente_salto(origen, destino, metrica)
+                    for destino in self.nodos if destino != origen}
+
+class CacheRutas:
+    """
+    Caché LRU de rutas calculadas sobre el grafo de la topología.
+
+    Las claves llevan el origen, el destino, el tipo de ruta y la versión
+    de la topología. Cuando la topología genera un grafo nuevo (cambió la
+    versión de algún enlace o caducaron mediciones) la caché se vacía, así
+    que nunca devuelve una ruta calculada con pesos viejos. Si se llena,
+    se descartan las rutas usadas hace más tiempo.
+    """
+    def __init__(self, max_entradas=MAX_RUTAS_CACHE):
+        self.max_entradas = max_entradas
+        self.entradas = OrderedDict()
+        self.grafo = None
+        self.aciertos = 0
+        self.fallos = 0
+        self.bloqueo = threading.Lock()
+
+    def obtener(self, clave, grafo, calcular):
+        """
+        Devuelve el valor guardado para clave o lo calcula con calcular().
+
+        Args:
+            clave: Tupla (origen, destino, tipo de ruta, versión, ...)
+            grafo: Grafo con el que se calcula; si no es el de las rutas
+                guardadas, la caché se vacía
+            calcular: Función sin argumentos que calcula el valor
+        """
+        with self.bloqueo:
+            if grafo is not self.grafo:
+                self.entradas.clear()
+                self.grafo = grafo
+            elif clave in self.entradas:
+                self.entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self.entradas[clave]
+            self.fallos += 1
+
+        # El cálculo se hace fuera del bloqueo para no frenar las demás consultas
+        valor = calcular()
+        with self.bloqueo:
+            if grafo is self.grafo:
+                self.entradas[clave] = valor
+                if len(self.entradas) > self.max_entradas:
+                    self.entradas.popitem(last=False)
+        return valor
+
+    def invalidar(self):
+        """Descarta todas las rutas guardadas"""
+        with self.bloqueo:
+            self.entradas.clear()
+            self.grafo = None
+
+# Caché compartida por los módulos de un mismo proceso
+cache_rutas = CacheRutas()
+
+def _grafo_actual():
+    """Grafo CSR de la topología compartida y su versión"""
+    topologia = topologia_compartida()
+    version = topologia.version()
+    return topologia.grafo_csr(), version
+
+def ruta_optima(inicio, fin, metrica='latencia'):
+    """
+    Ruta óptima entre dos nodos de la topología (Dijkstra con caché).
+
+    Args:
+        inicio: IP del nodo inicial
+        fin: IP del nodo final
+        metrica: 'latencia' (minimiza la suma) o 'ancho_banda' (maximiza el cuello de botella)
+
+    Returns:
+        Latencia total o cuello de botella, y lista de nodos de la ruta
+    """
+    csr, version = _grafo_actual()
+    grafo = csr if metrica == 'latencia' else csr.con_pesos('ancho_banda')
+    valor, ruta = cache_rutas.obtener((inicio, fin, metrica, version), csr,
+                                      lambda: dijkstra(grafo, inicio, fin, metrica == 'latencia'))
+    return valor, list(ruta)
+
+def rutas_por_tiempo(inicio, fin, tamano_bytes):
+    """
+    Rutas ordenadas por tiempo estimado para un archivo de tamano_bytes (ver rutas.rutas_por_tiempo_estimado).
+
+    Las rutas candidatas no dependen del tamaño, así que se guardan en la
+    caché y sólo se ordenan de nuevo para cada archivo.
+    """
+    csr, version = _grafo_actual()
+    candidatas = cache_rutas.obtener((inicio, fin, 'tiempo', version), csr,
+                                     lambda: rutas_candidatas(csr, None, inicio, fin))
+    return ordenar_por_tiempo(candidatas, tamano_bytes)
+
+def rutas_alternativas(inicio, fin, metrica='latencia', k=K_RUTAS_ALTERNATIVAS):
+    """
+    Las k mejores rutas sin ciclos (ver rutas.k_rutas_mas_cortas), con caché.
+
+    Se calculan junto con la ruta óptima para que, si un nodo principal de
+    ella no responde, el emisor pase a la siguiente sin recalcular nada.
+
+    Returns:
+        Lista de (latencia total o cuello de botella, ruta), de mejor a peor
+    """
+    csr, version = _grafo_actual()
+    grafo = csr if metrica == 'latencia' else csr.con_pesos('ancho_banda')
+    rutas = cache_rutas.obtener((inicio, fin, 'alternativas', version, metrica, k), csr,
+                                lambda: k_rutas_mas_cortas(grafo, inicio, fin, k, metrica == 'latencia'))
+    return [(valor, list(ruta)) for valor, ruta in rutas]
+
+def rutas_disjuntas_optimas(inicio, fin, metrica='ancho_banda', nodos_disjuntos=False):
+    """
+    El mayor conjunto de rutas sin aristas (o nodos) en común (ver rutas.max_rutas_disjuntas), con caché.
+
+    Returns:
+        Lista de (latencia total o cuello de botella, ruta), de mejor a peor
+    """
+    csr, version = _grafo_actual()
+    grafo = csr if metrica == 'latencia' else csr.con_pesos('ancho_banda')
+    rutas = cache_rutas.obtener((inicio, fin, 'disjuntas', version, metrica, nodos_disjuntos), csr,
+                                lambda: max_rutas_disjuntas(grafo, inicio, fin, metrica == 'latencia', nodos_disjuntos))
+    return [(valor, list(ruta)) for valor, ruta in rutas]
+
+class PlanificadorRutas:
+    """
+    Rutas de un conjunto de transferencias simultáneas, repartidas según la carga de los enlaces.
+
+    Las transferencias pendientes (que aún no empiezan) se planifican todas
+    juntas con rutas.asignar_rutas, contando como carga de cada enlace los
+    bytes que les faltan a las transferencias en curso. Cada vez que llegan
+    transferencias nuevas o termina una en curso se vuelve a planificar,
+    así las pendientes pasan a los enlaces que se van liberando.
+    """
+    def __init__(self):
+        self.pendientes = {}   # id -> (origen, destino, tamaño)
+        self.en_curso = {}     # id -> [ruta, bytes que faltan]
+        self.rutas = {}        # id -> ruta planificada de cada pendiente
+        self.makespan = 0.0    # Tiempo estimado (s) en que terminan todas las pendientes
+        self.bloqueo = threading.Lock()
+
+    def agregar(self, transferencias):
+        """
+        Agrega transferencias pendientes y vuelve a planificar.
+
+        Args:
+            transferencias: Lista de (id, origen, destino, tamaño en bytes)
+
+        Returns:
+            Diccionario {id: ruta} de las transferencias pendientes
+        """
+        with self.bloqueo:
+            for id_transferencia, origen, destino, tamano in transferencias:
+                self.pendientes[id_transferencia] = (origen, destino, tamano)
+            self._planificar()
+            return dict(self.rutas)
+
+    def iniciar(self, id_transferencia):
+        """Marca una transferencia como en curso y devuelve su ruta (None si no tiene)"""
+        with self.bloqueo:
+            _, _, tamano = self.pendientes.pop(id_transferencia)
+            ruta = self.rutas.pop(id_transferencia, None)
+            if ruta:
+                self.en_curso[id_transferencia] = [ruta, tamano]
+            return ruta
+
+    def avanzar(self, id_transferencia, enviados):
+        """Descuenta de la carga de una transferencia en curso los bytes ya enviados"""
+        with self.bloqueo:
+            if id_transferencia in self.en_curso:
+                self.en_curso[id_transferencia][1] = max(0, self.en_curso[id_transferencia][1] - enviados)
+
+    def terminar(self, id_transferencia):
+        """
+        Quita una transferencia en curso y vuelve a planificar las pendientes.
+
+        Returns:
+            Diccionario {id: ruta} de las transferencias pendientes
+        """
+        with self.bloqueo:
+            self.en_curso.pop(id_transferencia, None)
+            self._planificar()
+            return dict(self.rutas)
+
+    def _planificar(self):
+        if not self.pendientes:
+            self.rutas, self.makespan = {}, 0.0
+            return
+        csr, version = _grafo_actual()
+        carga = {}
+        for ruta, faltan in self.en_curso.values():
+            for i in range(len(ruta) - 1):
+                carga[ruta[i], ruta[i + 1]] = carga.get((ruta[i], ruta[i + 1]), 0) + faltan
+
+        # Las rutas candidatas de cada par no dependen de la carga: se guardan en la caché
+        def rutas(origen, destino):
+            return cache_rutas.obtener((origen, destino, 'plan', version), csr,
+                                       lambda: rutas_para_plan(csr, None, origen, destino))
+
+        transferencias = [(id_transferencia, origen, destino, tamano)
+                          for id_transferencia, (origen, destino, tamano) in self.pendientes.items()]
+        asignacion, self.makespan = asignar_rutas(csr, None, transferencias, carga, rutas)
+        self.rutas = {id_transferencia: ruta for id_transferencia, (_, ruta) in asignacion.items()}
+
+# Tabla compartida por los módulos de un mismo proceso
+_tabla = None
+_bloqueo_tabla = threading.Lock()
+
+def tabla_rutas_compartida():
+    """
+    Devuelve la tabla de rutas del proceso, al día con la topología compartida.
+
+    La topología sólo genera un grafo nuevo cuando cambian sus mediciones,
+    así que mientras tanto la consulta no recalcula nada.
+    """
+    global _tabla
+    csr = topologia_compartida().grafo_csr()
+    with _bloqueo_tabla:
+        if _tabla is None:
+            _tabla = TablaRutas(csr)
+        else:
+            _tabla.sincronizar(csr)
+        return _tabla
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3) or (len(sys.argv) == 3 and sys.argv[2] not in METRICAS):
+        print("Uso: python tabla_rutas.py <ip_origen> [latencia|ancho_banda]")
+        sys.exit(1)
+
+    origen = sys.argv[1]
+    metrica = sys.argv[2] if len(sys.argv) == 3 else 'latencia'
+    nodos = topologia_compartida().nodos()
+    tabla = tabla_rutas_compartida()
+    unidad = 'ms' if metrica == 'latencia' else 'Mbps'
+    print(f"[Topología] Tabla de rutas de {nodos.get(origen, origen)} ({origen}) por {metrica}")
+    for destino, salto in tabla.tabla(origen, metrica).items():
+        if salto is None:
+            print(f"{nodos.get(destino, destino)} ({destino}): sin ruta")
+        else:
+            print(f"{nodos.get(destino, destino)} ({destino}): siguiente salto {nodos.get(salto, salto)} ({salto}), "
+                  f"{tabla.valor(origen, destino, metrica):g} {unidad}")
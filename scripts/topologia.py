@@ -0,0 +1,338 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+from grafo import GrafoCSR
+
+ARCHIVO_TOPOLOGIA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'topologia.db')
+
+MAX_ANTIGUEDAD = 600          # Segundos tras los que una medición ya no se usa
+ALFA_EWMA = 0.3               # Peso de cada muestra nueva en el promedio
+UMBRAL_CAMBIO_PESO = 0.1      # Cambio relativo de un peso que hace falta para publicar una versión nueva
+MAX_HISTORIAL_DIAS = 30       # Días de historial de mediciones que se conservan
+TAMANO_MMAP = 256 * 1024 * 1024
+
+METRICAS = ('latencia', 'ancho_banda')
+
+# Topología medida con iperf3 al montar la VPN; sólo se usa para crear la base
+NODOS_INICIALES = {
+    '100.101.1.1': 'Marco',
+    '100.101.1.2': 'Poncho',
+    '100.101.1.3': 'Alberto',
+    '100.101.1.4': 'Raúl'
+}
+
+# Latencias (ms)
+LATENCIA_INICIAL = {
+    '100.101.1.1': {'100.101.1.2': 109, '100.101.1.3': 199, '100.101.1.4': 75},
+    '100.101.1.2': {'100.101.1.1': 78, '100.101.1.3': 78, '100.101.1.4': 275},
+    '100.101.1.3': {'100.101.1.1': 56, '100.101.1.2': 117, '100.101.1.4': 174},
+    '100.101.1.4': {'100.101.1.1': 115, '100.101.1.2': 115, '100.101.1.3': 205}
+}
+
+# Anchos de banda (Mbps)
+ANCHO_BANDA_INICIAL = {
+    '100.101.1.1': {'100.101.1.2': 23.2, '100.101.1.3': 23.1, '100.101.1.4': 26.2},
+    '100.101.1.2': {'100.101.1.1': 80.0, '100.101.1.3': 3.95, '100.101.1.4': 11.3},
+    '100.101.1.3': {'100.101.1.1': 22.0, '100.101.1.2': 2.08, '100.101.1.4': 21.7},
+    '100.101.1.4': {'100.101.1.1': 83.1, '100.101.1.2': 4.58, '100.101.1.3': 6.46}
+}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS nodos (
+    ip TEXT PRIMARY KEY,
+    nombre TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS enlaces (
+    origen TEXT NOT NULL,
+    destino TEXT NOT NULL,
+    metrica TEXT NOT NULL,
+    referencia REAL,
+    valor REAL,
+    instante REAL,
+    publicado REAL,
+    PRIMARY KEY (origen, destino, metrica)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS historial (
+    origen TEXT NOT NULL,
+    destino TEXT NOT NULL,
+    metrica TEXT NOT NULL,
+    valor REAL NOT NULL,
+    instante REAL NOT NULL,
+    fuente TEXT
+);
+CREATE INDEX IF NOT EXISTS historial_enlace ON historial (origen, destino, metrica, instante);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+"""
+
+class Topologia:
+    """
+    Almacén en disco (SQLite) de la topología y las métricas de la red.
+
+    Guarda los nodos, el valor de referencia y el último valor medido
+    (suavizado con EWMA) de la latencia y el ancho de banda de cada
+    enlace, y el historial de muestras. Cada cambio de nodos o enlaces, y
+    cada medición que mueve el peso de un enlace más de UMBRAL_CAMBIO_PESO
+    respecto al último publicado, incrementa una versión global, así los
+    lectores (grafos, tablas y caché de rutas) sólo se rehacen cuando algo
+    cambió de verdad y no con cada sondeo. La base usa WAL, de modo que el router, el servicio de
+    medición, los nodos principales y el receptor pueden leer y escribir
+    a la vez desde procesos distintos, y las lecturas van por mmap.
+
+    Cada hilo usa su propia conexión, que se abre la primera vez que la necesita.
+    """
+    def __init__(self, ruta=ARCHIVO_TOPOLOGIA):
+        self.ruta = ruta
+        self.local = threading.local()
+        self.bloqueo = threading.Lock()
+        self.cache_grafos = None
+        self.cache_csr = None
+
+    def conexion(self):
+        conexion = getattr(self.local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute(f"PRAGMA mmap_size={TAMANO_MMAP}")
+            conexion.executescript(ESQUEMA)
+            self._migrar(conexion)
+            self.local.conexion = conexion
+            self._inicializar(conexion)
+        return conexion
+
+    def _migrar(self, conexion):
+        """Agrega a una base creada por una versión anterior las columnas que le faltan"""
+        columnas = {fila[1] for fila in conexion.execute("PRAGMA table_info(enlaces)")}
+        if 'publicado' not in columnas:
+            try:
+                conexion.execute("ALTER TABLE enlaces ADD COLUMN publicado REAL")
+            except sqlite3.OperationalError:
+                pass  # Otro proceso la agregó a la vez
+
+    def _inicializar(self, conexion):
+        """Crea la topología inicial si la base está vacía"""
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            if conexion.execute("SELECT COUNT(*) FROM nodos").fetchone()[0] == 0:
+                conexion.executemany("INSERT INTO nodos VALUES (?, ?)", NODOS_INICIALES.items())
+                for metrica, grafo in (('latencia', LATENCIA_INICIAL), ('ancho_banda', ANCHO_BANDA_INICIAL)):
+                    conexion.executemany(
+                        "INSERT INTO enlaces (origen, destino, metrica, referencia) VALUES (?, ?, ?, ?)",
+                        [(u, v, metrica, peso) for u, vecinos in grafo.items() for v, peso in vecinos.items()])
+                conexion.execute("INSERT OR IGNORE INTO meta VALUES ('version', 1)")
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+
+    def _incrementar_version(self, conexion):
+        conexion.execute("INSERT INTO meta VALUES ('version', 1) "
+                         "ON CONFLICT(clave) DO UPDATE SET valor = valor + 1")
+
+    def version(self):
+        """Versión global de la topología: cambia con cada nodo o enlace nuevo y con cada cambio notable de un peso"""
+        fila = self.conexion().execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()
+        return fila[0] if fila else 0
+
+    def nodos(self):
+        """Diccionario {ip: nombre} de los nodos de la red"""
+        return dict(self.conexion().execute("SELECT ip, nombre FROM nodos ORDER BY ip"))
+
+    def agregar_nodo(self, ip, nombre):
+        conexion = self.conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        conexion.execute("INSERT INTO nodos VALUES (?, ?) ON CONFLICT(ip) DO UPDATE SET nombre = excluded.nombre",
+                         (ip, nombre))
+        self._incrementar_version(conexion)
+        conexion.execute("COMMIT")
+
+    def definir_enlace(self, origen, destino, latencia=None, ancho_banda=None):
+        """Fija los valores de referencia de un enlace (los que se usan sin mediciones recientes)"""
+        conexion = self.conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        for metrica, referencia in (('latencia', latencia), ('ancho_banda', ancho_banda)):
+            if referencia is not None:
+                conexion.execute(
+                    "INSERT INTO enlaces (origen, destino, metrica, referencia) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(origen, destino, metrica) DO UPDATE SET referencia = excluded.referencia",
+                    (origen, destino, metrica, referencia))
+        self._incrementar_version(conexion)
+        conexion.execute("COMMIT")
+
+    def registrar_medicion(self, origen, destino, metrica, muestra, instante=None, fuente=None, suavizar=True):
+        """
+        Incorpora una medición de un enlace.
+
+        Args:
+            origen: IP del nodo de salida del enlace
+            destino: IP del nodo de llegada
+            metrica: 'latencia' (ms) o 'ancho_banda' (Mbps)
+            muestra: Valor medido
+            instante: Momento de la medición (por defecto, ahora)
+            fuente: Origen de la muestra ('sondeo', 'transferencia', un vecino...)
+            suavizar: Si True se promedia con el valor anterior (EWMA); si
+                False (mediciones ya suavizadas por otro nodo) sólo se
+                reemplaza si es más reciente
+
+        Returns:
+            True si la medición cambió la versión de la topología
+        """
+        instante = instante or time.time()
+        conexion = self.conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            anterior = conexion.execute(
+                "SELECT valor, instante, publicado FROM enlaces WHERE origen = ? AND destino = ? AND metrica = ?",
+                (origen, destino, metrica)).fetchone()
+            valor_anterior, instante_anterior, publicado = anterior if anterior else (None, None, None)
+            if not suavizar and instante_anterior is not None and instante <= instante_anterior:
+                conexion.execute("COMMIT")
+                return False
+            valor = muestra
+            if suavizar and valor_anterior is not None:
+                valor = ALFA_EWMA * muestra + (1 - ALFA_EWMA) * valor_anterior
+
+            # Sólo se publica una versión nueva si el peso que usan los grafos cambia de verdad: si
+            # la medición anterior había caducado (se usaba la referencia) o si el valor se alejó
+            # más de UMBRAL_CAMBIO_PESO del último publicado. Así un sondeo cada pocos segundos no
+            # vacía la caché de rutas ni resincroniza las tablas cada vez.
+            caducada = instante_anterior is None or time.time() - instante_anterior >= MAX_ANTIGUEDAD
+            cambia = caducada or publicado is None or abs(valor - publicado) > UMBRAL_CAMBIO_PESO * abs(publicado)
+            if cambia:
+                publicado = valor
+            conexion.execute(
+                "INSERT INTO enlaces (origen, destino, metrica, valor, instante, publicado) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(origen, destino, metrica) DO UPDATE SET valor = excluded.valor, "
+                "instante = excluded.instante, publicado = excluded.publicado",
+                (origen, destino, metrica, valor, instante, publicado))
+            conexion.execute("INSERT INTO historial VALUES (?, ?, ?, ?, ?, ?)",
+                             (origen, destino, metrica, muestra, instante, fuente))
+            if cambia:
+                self._incrementar_version(conexion)
+            conexion.execute("COMMIT")
+            return cambia
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+
+    def mediciones(self, origen):
+        """
+        Últimas mediciones de los enlaces que salen de un nodo.
+
+        Returns:
+            {'latencia': {destino: [valor, instante]}, 'ancho_banda': {...}}
+        """
+        resultado = {metrica: {} for metrica in METRICAS}
+        for destino, metrica, valor, instante in self.conexion().execute(
+                "SELECT destino, metrica, valor, instante FROM enlaces "
+                "WHERE origen = ? AND valor IS NOT NULL", (origen,)):
+            resultado[metrica][destino] = [valor, instante]
+        return resultado
+
+    def historial(self, origen, destino, metrica, desde=0):
+        """Muestras de un enlace a partir del instante desde, en orden"""
+        return self.conexion().execute(
+            "SELECT valor, instante, fuente FROM historial "
+            "WHERE origen = ? AND destino = ? AND metrica = ? AND instante >= ? ORDER BY instante",
+            (origen, destino, metrica, desde)).fetchall()
+
+    def podar_historial(self, dias=MAX_HISTORIAL_DIAS):
+        self.conexion().execute("DELETE FROM historial WHERE instante < ?", (time.time() - dias * 86400,))
+
+    def grafos(self, max_antiguedad=MAX_ANTIGUEDAD):
+        """
+        Grafos de latencia y ancho de banda con los pesos actuales.
+
+        Cada enlace toma su valor medido publicado (el que cambió la
+        versión por última vez) si la medición es de hace menos de
+        max_antiguedad segundos y, si no, su valor de referencia. El
+        resultado se reutiliza mientras la versión no cambie y ninguna
+        medición haya caducado.
+
+        Returns:
+            (grafo_latencia, grafo_ancho_banda), diccionarios de diccionarios
+            que el llamador puede modificar
+        """
+        ahora = time.time()
+        version = self.version()
+        with self.bloqueo:
+            cache = self.cache_grafos
+        if cache and cache[0] == version and cache[1] == max_antiguedad and ahora < cache[2]:
+            return _copiar(cache[3]), _copiar(cache[4])
+
+        nodos = self.nodos()
+        grafos = {metrica: {ip: {} for ip in nodos} for metrica in METRICAS}
+        limite = ahora - max_antiguedad
+        caduca = float('inf')
+        for origen, destino, metrica, referencia, valor, instante in self.conexion().execute(
+                "SELECT origen, destino, metrica, referencia, COALESCE(publicado, valor), instante FROM enlaces"):
+            if origen not in nodos or destino not in nodos or origen == destino:
+                continue
+            if valor is not None and instante >= limite:
+                peso = round(valor, 2)
+                caduca = min(caduca, instante + max_antiguedad)
+            elif referencia is not None:
+                peso = referencia
+            else:
+                continue
+            grafos[metrica][origen][destino] = peso
+
+        with self.bloqueo:
+            self.cache_grafos = (version, max_antiguedad, caduca, grafos['latencia'], grafos['ancho_banda'])
+        return _copiar(grafos['latencia']), _copiar(grafos['ancho_banda'])
+
+    def grafo_csr(self, max_antiguedad=MAX_ANTIGUEDAD):
+        """
+        Grafo de la red en formato CSR: latencia como peso y ancho de banda como atributo.
+
+        Se reconstruye sólo cuando cambian los grafos; mientras tanto todos
+        los llamadores comparten el mismo (no se debe modificar).
+        """
+        version = self.version()
+        with self.bloqueo:
+            cache = self.cache_csr
+        if cache and cache[0] == version and cache[1] == max_antiguedad and time.time() < cache[2]:
+            return cache[3]
+        grafo_latencia, grafo_ancho_banda = self.grafos(max_antiguedad)
+        csr = GrafoCSR.desde_diccionario(grafo_latencia, ancho_banda=grafo_ancho_banda)
+        with self.bloqueo:
+            self.cache_csr = (version, max_antiguedad, self.cache_grafos[2], csr)
+        return csr
+
+def _copiar(grafo):
+    return {u: dict(vecinos) for u, vecinos in grafo.items()}
+
+# Instancia compartida por los módulos de un mismo proceso
+_topologia = None
+_bloqueo_topologia = threading.Lock()
+
+def topologia_compartida():
+    """Devuelve la topología del proceso, abriéndola la primera vez"""
+    global _topologia
+    with _bloqueo_topologia:
+        if _topologia is None:
+            _topologia = Topologia()
+        return _topologia
+
+if __name__ == "__main__":
+    topologia = topologia_compartida()
+    if len(sys.argv) == 4 and sys.argv[1] == 'nodo':
+        topologia.agregar_nodo(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 6 and sys.argv[1] == 'enlace':
+        topologia.definir_enlace(sys.argv[2], sys.argv[3], float(sys.argv[4]), float(sys.argv[5]))
+    elif len(sys.argv) > 1:
+        print("Uso: python topologia.py [nodo <ip> <nombre> | enlace <ip_origen> <ip_destino> <latencia_ms> <ancho_banda_mbps>]")
+        sys.exit(1)
+
+    nodos = topologia.nodos()
+    grafo_latencia, grafo_ancho_banda = topologia.grafos()
+    print(f"[Topología] Versión {topologia.version()}, {len(nodos)} nodos")
+    for origen in grafo_latencia:
+        for destino, latencia in grafo_latencia[origen].items():
+            print(f"{nodos[origen]} ({origen}) -> {nodos[destino]} ({destino}): "
+                  f"{latencia} ms, {grafo_ancho_banda[origen].get(destino)} Mbps")
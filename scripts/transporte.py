@@ -0,0 +1,236 @@
+import os
+import json
+import select
+import socket
+
+# Bytes por llamada a sendfile; acotarlo permite informar el progreso
+BLOQUE_ENVIO = 4 * 1024 * 1024
+# Buffer del envío con copia, para sistemas sin sendfile
+BUFFER_RESPALDO = 256 * 1024
+# Capacidad pedida para la tubería de splice (Linux)
+TAMANO_TUBERIA = 1024 * 1024
+
+def enviar_rango(sock, f, desplazamiento, longitud, al_enviar=None):
+    """
+    Envía un rango de un archivo abierto por un socket.
+
+    Donde el sistema tiene sendfile el núcleo copia los datos del archivo
+    al socket directamente, sin pasar por Python. Si no, se usa un envío con
+    un buffer reutilizable.
+
+    Args:
+        sock: Socket conectado
+        f: Archivo abierto en modo binario
+        desplazamiento: Primer byte a enviar
+        longitud: Número de bytes a enviar
+        al_enviar: Función opcional que recibe los bytes de cada bloque enviado
+    """
+    if not hasattr(os, 'sendfile'):
+        _enviar_rango_con_buffer(sock, f, desplazamiento, longitud, al_enviar)
+        return
+
+    enviados = 0
+    while enviados < longitud:
+        enviado = sock.sendfile(f, desplazamiento + enviados, min(BLOQUE_ENVIO, longitud - enviados))
+        if enviado == 0:
+            raise Exception("El archivo se acortó durante el envío")
+        enviados += enviado
+        if al_enviar:
+            al_enviar(enviado)
+
+def _enviar_rango_con_buffer(sock, f, desplazamiento, longitud, al_enviar=None):
+    """Envía un rango de un archivo leyendo bloques en un buffer reutilizable"""
+    buffer = bytearray(BUFFER_RESPALDO)
+    vista = memoryview(buffer)
+    f.seek(desplazamiento)
+    restante = longitud
+    while restante > 0:
+        leidos = f.readinto(vista[:min(len(buffer), restante)])
+        if not leidos:
+            raise Exception("El archivo se acortó durante el envío")
+        sock.sendall(vista[:leidos])
+        restante -= leidos
+        if al_enviar:
+            al_enviar(leidos)
+
+def recibir_exacto(sock, n):
+    """
+    Recibe exactamente n bytes en un buffer preasignado.
+
+    Raises:
+        Exception: Si la conexión se cierra antes de recibir los n bytes
+    """
+    buffer = bytearray(n)
+    vista = memoryview(buffer)
+    recibidos = 0
+    while recibidos < n:
+        leidos = sock.recv_into(vista[recibidos:])
+        if not leidos:
+            raise Exception("Conexión cerrada inesperadamente")
+        recibidos += leidos
+    return buffer
+
+def enviar_mensaje(sock, mensaje):
+    """Envía un diccionario como JSON precedido de su longitud (10 bytes)"""
+    datos = json.dumps(mensaje).encode()
+    sock.sendall(f"{len(datos):<10}".encode() + datos)
+
+def recibir_mensaje(sock):
+    """Recibe un diccionario enviado con enviar_mensaje"""
+    longitud = int(recibir_exacto(sock, 10).decode().strip())
+    return json.loads(recibir_exacto(sock, longitud).decode())
+
+def recibir_a_archivo(sock, fd, desplazamiento, longitud, al_recibir=None):
+    """
+    Recibe hasta longitud bytes del socket y los escribe en el archivo a partir de desplazamiento.
+
+    En Linux los datos pasan del socket al archivo con splice a través de una
+    tubería, sin copiarse a Python. En otros sistemas se reciben con
+    recv_into sobre un buffer reutilizable y se escriben con pwrite. En los
+    dos casos se respeta el tiempo de espera del socket.
+
+    Args:
+        sock: Socket conectado
+        fd: Descriptor del archivo destino (abierto para escritura)
+        desplazamiento: Posición del archivo donde se escribe el primer byte
+        longitud: Número de bytes esperados
+        al_recibir: Función opcional que recibe los bytes de cada bloque recibido
+
+    Returns:
+        Bytes recibidos (menos que longitud si el emisor cerró la conexión antes)
+
+    Raises:
+        socket.timeout: Si pasa el tiempo de espera del socket sin recibir datos
+    """
+    recibidos = 0
+    if hasattr(os, 'splice'):
+        try:
+            recibidos = _recibir_con_splice(sock, fd, desplazamiento, longitud, al_recibir)
+        except _SpliceNoSoportado as e:
+            # Sistema de archivos sin soporte: seguir con la copia normal
+            recibidos = e.recibidos
+        else:
+            return recibidos
+
+    return recibidos + _recibir_con_buffer(sock, fd, desplazamiento + recibidos,
+                                           longitud - recibidos, al_recibir)
+
+class _SpliceNoSoportado(Exception):
+    """splice no se puede usar con este socket o archivo; indica cuántos bytes ya se escribieron"""
+    def __init__(self, recibidos):
+        super().__init__(recibidos)
+        self.recibidos = recibidos
+
+def _recibir_con_splice(sock, fd, desplazamiento, longitud, al_recibir=None):
+    """Mueve bytes del socket al archivo con splice (socket -> tubería -> archivo)"""
+    lectura, escritura = os.pipe()
+    try:
+        try:
+            import fcntl
+            fcntl.fcntl(escritura, fcntl.F_SETPIPE_SZ, TAMANO_TUBERIA)
+        except (ImportError, AttributeError, OSError):
+            pass
+
+        recibidos = 0
+        while recibidos < longitud:
+            try:
+                en_tuberia = os.splice(sock.fileno(), escritura, min(TAMANO_TUBERIA, longitud - recibidos))
+            except BlockingIOError:
+                # Un socket con tiempo de espera es no bloqueante por dentro: esperar datos como recv
+                if not select.select([sock], [], [], sock.gettimeout())[0]:
+                    raise socket.timeout("timed out")
+                continue
+            except OSError:
+                raise _SpliceNoSoportado(recibidos)
+            if en_tuberia == 0:
+                break
+
+            posicion = desplazamiento + recibidos
+            pendiente = en_tuberia
+            try:
+                while pendiente > 0:
+                    movidos = os.splice(lectura, fd, pendiente, offset_dst=posicion)
+                    posicion += movidos
+                    pendiente -= movidos
+            except OSError:
+                # El archivo destino no admite splice: vaciar la tubería copiando
+                while pendiente > 0:
+                    datos = os.read(lectura, pendiente)
+                    escribir_en(fd, datos, posicion)
+                    posicion += len(datos)
+                    pendiente -= len(datos)
+                recibidos += en_tuberia
+                if al_recibir:
+                    al_recibir(en_tuberia)
+                raise _SpliceNoSoportado(recibidos)
+            recibidos += en_tuberia
+            if al_recibir:
+                al_recibir(en_tuberia)
+        return recibidos
+    finally:
+        os.close(lectura)
+        os.close(escritura)
+
+def _recibir_con_buffer(sock, fd, desplazamiento, longitud, al_recibir=None):
+    """Recibe con recv_into en un buffer reutilizable y escribe en su posición"""
+    buffer = bytearray(BUFFER_RESPALDO)
+    vista = memoryview(buffer)
+    recibidos = 0
+    while recibidos < longitud:
+        leidos = sock.recv_into(vista, min(len(buffer), longitud - recibidos))
+        if not leidos:
+            break
+        escribir_en(fd, vista[:leidos], desplazamiento + recibidos)
+        recibidos += leidos
+        if al_recibir:
+            al_recibir(leidos)
+    return recibidos
+
+def escribir_en(fd, datos, desplazamiento):
+    """Escribe datos en una posición del archivo sin depender de la posición actual"""
+    datos = memoryview(datos)
+    if hasattr(os, 'pwrite'):
+        while datos:
+            escritos = os.pwrite(fd, datos, desplazamiento)
+            datos = datos[escritos:]
+            desplazamiento += escritos
+    else:
+        # Cada conexión tiene su propio descriptor, así que lseek + write es seguro
+        os.lseek(fd, desplazamiento, os.SEEK_SET)
+        while datos:
+            escritos = os.write(fd, datos)
+            datos = datos[escritos:]
+
+def copiar_rango(fd_origen, fd_destino, desde, hacia, longitud):
+    """
+    Copia longitud bytes de un archivo a otro, de la posición desde a la posición hacia.
+
+    Con copy_file_range (Linux) la copia la hace el núcleo sin pasar por
+    Python; si no, se lee y escribe en bloques.
+    """
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while longitud > 0:
+                copiados = os.copy_file_range(fd_origen, fd_destino, longitud, desde, hacia)
+                if copiados == 0:
+                    raise Exception("El archivo de origen es más corto de lo esperado")
+                desde += copiados
+                hacia += copiados
+                longitud -= copiados
+            return
+        except OSError:
+            # Sistema de archivos sin soporte: seguir copiando en espacio de usuario
+            pass
+
+    while longitud > 0:
+        if hasattr(os, 'pread'):
+            datos = os.pread(fd_origen, min(BUFFER_RESPALDO, longitud), desde)
+        else:
+            os.lseek(fd_origen, desde, os.SEEK_SET)
+            datos = os.read(fd_origen, min(BUFFER_RESPALDO, longitud))
+        if not datos:
+            raise Exception("El archivo de origen es más corto de lo esperado")
+        escribir_en(fd_destino, datos, hacia)
+        desde += len(datos)
+        hacia += len(datos)
+        longitud -= len(datos)
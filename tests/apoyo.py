@@ -0,0 +1,82 @@
+import os
+import sys
+import socket
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+# Los módulos del proyecto están en scripts/, junto a los scripts que los usan
+DIRECTORIO_SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+if DIRECTORIO_SCRIPTS not in sys.path:
+    sys.path.insert(0, DIRECTORIO_SCRIPTS)
+
+class PruebaTransferencia(unittest.TestCase):
+    """Base de las pruebas que escriben archivos en un directorio temporal y transmiten por un par de sockets"""
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directorio)
+
+    def archivo(self, nombre, datos=b''):
+        ruta = os.path.join(self.directorio, nombre)
+        with open(ruta, 'wb') as f:
+            f.write(datos)
+        return ruta
+
+    def transmitir(self, enviar, recibir):
+        """Ejecuta enviar(sock) y recibir(sock) en los dos extremos de un par de sockets conectados"""
+        emisor, receptor = socket.socketpair()
+        errores = []
+
+        def hilo_emisor():
+            try:
+                enviar(emisor)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                emisor.close()
+
+        hilo = threading.Thread(target=hilo_emisor)
+        hilo.start()
+        try:
+            resultado = recibir(receptor)
+        finally:
+            receptor.close()
+            hilo.join()
+        self.assertEqual(errores, [])
+        return resultado
+
+class PruebaTopologia(unittest.TestCase):
+    """
+    Base de las pruebas que usan la topología compartida.
+
+    Cada prueba trabaja sobre una base temporal con la topología inicial y
+    la caché de rutas vacía, sin tocar scripts/topologia.db.
+    """
+    def setUp(self):
+        import topologia
+        import tabla_rutas
+        self.directorio = tempfile.mkdtemp()
+        self.topologia = topologia.Topologia(os.path.join(self.directorio, 'topologia.db'))
+        parche = mock.patch.object(topologia, '_topologia', self.topologia)
+        parche.start()
+        self.addCleanup(parche.stop)
+        tabla_rutas.cache_rutas.invalidar()
+        self.addCleanup(tabla_rutas.cache_rutas.invalidar)
+
+    def tearDown(self):
+        conexion = getattr(self.topologia.local, 'conexion', None)
+        if conexion is not None:
+            conexion.close()
+        shutil.rmtree(self.directorio)
+
+    def red(self, enlaces):
+        """Agrega nodos y enlaces de prueba: enlaces es {(origen, destino): (latencia, ancho de banda)}"""
+        for origen, destino in enlaces:
+            for ip in (origen, destino):
+                self.topologia.agregar_nodo(ip, ip)
+        for (origen, destino), (latencia, ancho_banda) in enlaces.items():
+            self.topologia.definir_enlace(origen, destino, latencia, ancho_banda)
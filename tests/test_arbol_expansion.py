@@ -0,0 +1,155 @@
+import os
+import sys
+import random
+import unittest
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from grafo import como_csr
+from arbol_expansion import (kruskal, arbol_diametro_acotado, tabla_siguiente_salto, ArbolIncremental,
+                             MAX_CAMBIOS_INCREMENTALES)
+
+def pesos_aleatorios(semilla, num_nodos=7, probabilidad=0.6):
+    """Pesos de enlaces no dirigidos {frozenset((u, v)): peso}, reproducibles por su semilla"""
+    azar = random.Random(semilla)
+    nodos = [f"n{i}" for i in range(num_nodos)]
+    return nodos, {frozenset((u, v)): azar.randint(1, 100)
+                   for i, u in enumerate(nodos) for v in nodos[i + 1:] if azar.random() < probabilidad}
+
+def grafo_simetrico(nodos, pesos):
+    grafo = {nodo: {} for nodo in nodos}
+    for arista, peso in pesos.items():
+        u, v = tuple(arista)
+        grafo[u][v] = grafo[v][u] = peso
+    return grafo
+
+def peso_total(arbol):
+    return sum(peso for _, _, peso in arbol)
+
+def vecinos_arbol(arbol):
+    vecinos = {}
+    for u, v, _ in arbol:
+        vecinos.setdefault(u, set()).add(v)
+        vecinos.setdefault(v, set()).add(u)
+    return vecinos
+
+def diametro(arbol):
+    """Mayor número de saltos entre dos nodos del árbol"""
+    vecinos = vecinos_arbol(arbol)
+    mayor = 0
+    for inicio in vecinos:
+        distancias = {inicio: 0}
+        cola = deque([inicio])
+        while cola:
+            nodo = cola.popleft()
+            for vecino in vecinos[nodo]:
+                if vecino not in distancias:
+                    distancias[vecino] = distancias[nodo] + 1
+                    cola.append(vecino)
+        mayor = max(mayor, max(distancias.values()))
+    return mayor
+
+class PruebaKruskal(unittest.TestCase):
+    def test_asimetrico(self):
+        grafo = {'A': {'B': 10, 'C': 1}, 'B': {'A': 2, 'C': 5}, 'C': {'A': 8}}
+        self.assertEqual(sorted(peso for _, _, peso in kruskal(grafo, 'max')), [8, 10])
+        self.assertEqual(sorted(peso for _, _, peso in kruskal(grafo, 'min')), [2, 5])
+        self.assertEqual(sorted(peso for _, _, peso in kruskal(grafo, 'min', maximizar=False)), [1, 2])
+        self.assertEqual(sorted(peso for _, _, peso in kruskal(grafo, 'media', maximizar=False)), [4.5, 5])
+
+    def test_grado_y_diametro_acotados(self):
+        for semilla in range(20):
+            nodos, pesos = pesos_aleatorios(semilla, probabilidad=0.9)
+            grafo = grafo_simetrico(nodos, pesos)
+            for max_diametro in (2, 3, 4):
+                arbol = arbol_diametro_acotado(grafo, max_diametro)
+                self.assertLessEqual(diametro(arbol), max_diametro, f"semilla {semilla}")
+            for max_grado in (2, 3):
+                arbol = kruskal(grafo, max_grado=max_grado)
+                self.assertLessEqual(max(len(v) for v in vecinos_arbol(arbol).values()), max_grado)
+
+    def test_tabla_siguiente_salto(self):
+        tabla = tabla_siguiente_salto(['A', 'B', 'C', 'D'], [('A', 'B', 1), ('B', 'C', 1)])
+        self.assertEqual(tabla['A'], {'B': 'B', 'C': 'B'})
+        self.assertEqual(tabla['C']['A'], 'B')
+        self.assertEqual(tabla['D'], {})
+
+class PruebaArbolIncremental(unittest.TestCase):
+    def comprobar(self, arbol, nodos, pesos, contexto):
+        """El árbol mantenido pesa lo mismo que uno calculado desde cero y sólo usa enlaces existentes"""
+        esperado = kruskal(grafo_simetrico(nodos, pesos))
+        aristas = arbol.aristas()
+        self.assertEqual(len(aristas), len(esperado), contexto)
+        self.assertEqual(peso_total(aristas), peso_total(esperado), contexto)
+        for u, v, peso in aristas:
+            self.assertEqual(pesos[frozenset((u, v))], peso, contexto)
+
+    def test_intercambio_por_una_arista_que_mejora(self):
+        grafo = grafo_simetrico('ABC', {frozenset('AB'): 10, frozenset('BC'): 8, frozenset('AC'): 1})
+        arbol = ArbolIncremental(grafo)
+        self.assertFalse(arbol.actualizar_arista('A', 'C', 5))
+        self.assertTrue(arbol.actualizar_arista('A', 'C', 9))
+        self.assertEqual(sorted(peso for _, _, peso in arbol.aristas()), [9, 10])
+        self.assertEqual(arbol.siguiente_salto('B', 'C'), 'A')
+
+    def test_arista_del_arbol_que_empeora(self):
+        grafo = grafo_simetrico('ABC', {frozenset('AB'): 10, frozenset('BC'): 8, frozenset('AC'): 5})
+        arbol = ArbolIncremental(grafo)
+        self.assertFalse(arbol.actualizar_arista('B', 'C', 6))
+        self.assertTrue(arbol.actualizar_arista('B', 'C', 2))
+        self.assertEqual(sorted(peso for _, _, peso in arbol.aristas()), [5, 10])
+
+    def test_enlace_que_desaparece(self):
+        grafo = grafo_simetrico('ABC', {frozenset('AB'): 10, frozenset('BC'): 8})
+        arbol = ArbolIncremental(grafo)
+        self.assertEqual(arbol.siguiente_salto('A', 'C'), 'B')
+        self.assertTrue(arbol.actualizar_arista('B', 'C', None))
+        self.assertIsNone(arbol.siguiente_salto('A', 'C'))
+        # Al volver, el enlace reconecta las dos partes
+        self.assertTrue(arbol.actualizar_arista('B', 'C', 3))
+        self.assertEqual(arbol.siguiente_salto('A', 'C'), 'B')
+
+    def test_contra_kruskal(self):
+        for semilla in range(25):
+            nodos, pesos = pesos_aleatorios(semilla)
+            for maximizar in (True, False):
+                pesos_actuales = dict(pesos)
+                arbol = ArbolIncremental(grafo_simetrico(nodos, pesos_actuales), maximizar=maximizar)
+                azar = random.Random(semilla)
+                for paso in range(30):
+                    u, v = azar.sample(nodos, 2)
+                    clave = frozenset((u, v))
+                    peso = None if azar.random() < 0.15 else azar.randint(1, 100)
+                    if peso:
+                        pesos_actuales[clave] = peso
+                    else:
+                        pesos_actuales.pop(clave, None)
+                    arbol.actualizar_arista(u, v, peso)
+                    contexto = f"semilla {semilla}, maximizar={maximizar}, paso {paso}"
+                    if maximizar:
+                        self.comprobar(arbol, nodos, pesos_actuales, contexto)
+                    else:
+                        esperado = kruskal(grafo_simetrico(nodos, pesos_actuales), maximizar=False)
+                        self.assertEqual(peso_total(arbol.aristas()), peso_total(esperado), contexto)
+
+    def test_sincronizar(self):
+        nodos, pesos = pesos_aleatorios(4)
+        arbol = ArbolIncremental(grafo_simetrico(nodos, pesos))
+        clave = next(iter(pesos))
+        pesos[clave] = 1
+        self.assertEqual(arbol.sincronizar(como_csr(grafo_simetrico(nodos, pesos))), 1)
+        self.comprobar(arbol, nodos, pesos, "un enlace")
+
+        pesos = {arista: peso + 1 for arista, peso in pesos.items()}
+        self.assertLessEqual(len(pesos), MAX_CAMBIOS_INCREMENTALES)
+        self.assertEqual(arbol.sincronizar(como_csr(grafo_simetrico(nodos, pesos))), len(pesos))
+        self.comprobar(arbol, nodos, pesos, "todos los enlaces")
+
+        # Con otros nodos se recalcula el árbol entero
+        nodos, pesos = pesos_aleatorios(4, num_nodos=8)
+        self.assertEqual(arbol.sincronizar(como_csr(grafo_simetrico(nodos, pesos))), -1)
+        self.comprobar(arbol, nodos, pesos, "nodos nuevos")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from apoyo import PruebaTopologia
+from rutas import asignar_rutas
+from tabla_rutas import PlanificadorRutas
+
+class PruebaAsignarRutas(unittest.TestCase):
+    def setUp(self):
+        # Dos rutas iguales de A a D, por B y por C, con enlaces de 8 Mbps (1 MB/s) y latencia 0
+        self.latencia = {'A': {'B': 0, 'C': 0}, 'B': {'D': 0}, 'C': {'D': 0}, 'D': {}}
+        self.ancho_banda = {'A': {'B': 8, 'C': 8}, 'B': {'D': 8}, 'C': {'D': 8}, 'D': {}}
+
+    def test_reparte_entre_rutas(self):
+        asignadas, makespan = asignar_rutas(self.latencia, self.ancho_banda,
+                                            [(1, 'A', 'D', 10**6), (2, 'A', 'D', 10**6)], sobrecarga_salto=0)
+        self.assertNotEqual(asignadas[1][1], asignadas[2][1])
+        self.assertAlmostEqual(makespan, 1.0)
+
+    def test_mayor_primero(self):
+        # LPT: el de 3 MB va solo por una ruta y los dos de 1 MB comparten la otra
+        transferencias = [(1, 'A', 'D', 10**6), (2, 'A', 'D', 3 * 10**6), (3, 'A', 'D', 10**6)]
+        asignadas, makespan = asignar_rutas(self.latencia, self.ancho_banda, transferencias, sobrecarga_salto=0)
+        self.assertEqual(asignadas[1][1], asignadas[3][1])
+        self.assertNotEqual(asignadas[1][1], asignadas[2][1])
+        self.assertAlmostEqual(makespan, 3.0)
+
+    def test_respeta_la_carga_en_curso(self):
+        carga = {('A', 'B'): 5 * 10**6}
+        asignadas, makespan = asignar_rutas(self.latencia, self.ancho_banda, [(1, 'A', 'D', 10**6)],
+                                            carga=carga, sobrecarga_salto=0)
+        self.assertEqual(asignadas[1][1], ['A', 'C', 'D'])
+        self.assertAlmostEqual(makespan, 1.0)
+        self.assertEqual(carga, {('A', 'B'): 5 * 10**6})
+
+    def test_sin_ruta(self):
+        asignadas, makespan = asignar_rutas(self.latencia, self.ancho_banda, [(1, 'D', 'A', 10**6)])
+        self.assertEqual(asignadas, {})
+        self.assertEqual(makespan, 0.0)
+
+class PruebaPlanificadorRutas(PruebaTopologia):
+    def setUp(self):
+        super().setUp()
+        # Las mismas dos rutas de A a D, por B y por C
+        self.red({('10.0.0.1', '10.0.0.2'): (1, 8), ('10.0.0.1', '10.0.0.3'): (1, 8),
+                  ('10.0.0.2', '10.0.0.4'): (1, 8), ('10.0.0.3', '10.0.0.4'): (1, 8)})
+        self.planificador = PlanificadorRutas()
+
+    def test_pendientes_en_rutas_distintas(self):
+        rutas = self.planificador.agregar([(1, '10.0.0.1', '10.0.0.4', 10**6), (2, '10.0.0.1', '10.0.0.4', 10**6)])
+        self.assertEqual(set(rutas), {1, 2})
+        self.assertNotEqual(rutas[1], rutas[2])
+
+    def test_evita_la_ruta_en_curso(self):
+        self.planificador.agregar([(1, '10.0.0.1', '10.0.0.4', 5 * 10**6)])
+        en_curso = self.planificador.iniciar(1)
+        rutas = self.planificador.agregar([(2, '10.0.0.1', '10.0.0.4', 10**6)])
+        self.assertNotEqual(rutas[2], en_curso)
+
+        # Al terminar la transferencia en curso la pendiente se vuelve a planificar
+        self.planificador.avanzar(1, 5 * 10**6)
+        rutas = self.planificador.terminar(1)
+        self.assertEqual(list(rutas), [2])
+        self.assertIn(rutas[2][1], ('10.0.0.2', '10.0.0.3'))
+        self.assertEqual(self.planificador.en_curso, {})
+
+    def test_sin_ruta(self):
+        self.assertEqual(self.planificador.agregar([(1, '10.0.0.4', '10.0.0.1', 10**6)]), {})
+        self.assertIsNone(self.planificador.iniciar(1))
+
+if __name__ == "__main__":
+    unittest.main()
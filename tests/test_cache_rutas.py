@@ -0,0 +1,86 @@
+import unittest
+
+from apoyo import PruebaTopologia
+from tabla_rutas import CacheRutas, cache_rutas, ruta_optima
+from topologia import UMBRAL_CAMBIO_PESO
+
+class PruebaCacheRutas(unittest.TestCase):
+    def setUp(self):
+        self.cache = CacheRutas(max_entradas=2)
+        self.grafo = {}
+        self.calculos = []
+
+    def obtener(self, clave, grafo=None):
+        def calcular():
+            self.calculos.append(clave)
+            return clave.upper()
+        return self.cache.obtener(clave, self.grafo if grafo is None else grafo, calcular)
+
+    def test_acierto_sin_recalcular(self):
+        self.assertEqual(self.obtener('a'), 'A')
+        self.assertEqual(self.obtener('a'), 'A')
+        self.assertEqual(self.calculos, ['a'])
+        self.assertEqual((self.cache.aciertos, self.cache.fallos), (1, 1))
+
+    def test_descarta_la_menos_usada(self):
+        self.obtener('a')
+        self.obtener('b')
+        self.obtener('a')      # 'b' pasa a ser la menos usada
+        self.obtener('c')
+        self.assertEqual(list(self.cache.entradas), ['a', 'c'])
+        self.obtener('a')
+        self.obtener('b')
+        self.assertEqual(self.calculos, ['a', 'b', 'c', 'b'])
+
+    def test_grafo_nuevo_vacia_la_cache(self):
+        self.obtener('a')
+        self.obtener('b', grafo={})
+        self.assertEqual(list(self.cache.entradas), ['b'])
+        self.obtener('a', grafo=self.cache.grafo)
+        self.assertEqual(self.calculos, ['a', 'b', 'a'])
+
+    def test_invalidar(self):
+        self.obtener('a')
+        self.cache.invalidar()
+        self.obtener('a')
+        self.assertEqual(self.calculos, ['a', 'a'])
+
+class PruebaVersionTopologia(PruebaTopologia):
+    def setUp(self):
+        super().setUp()
+        # Ruta directa de 10 ms o por B con 5 + 6 ms
+        self.red({('10.0.0.1', '10.0.0.3'): (10, 8), ('10.0.0.1', '10.0.0.2'): (5, 8),
+                  ('10.0.0.2', '10.0.0.3'): (6, 8)})
+
+    def test_cambio_pequeno_no_publica_version(self):
+        self.assertTrue(self.topologia.registrar_medicion('10.0.0.1', '10.0.0.3', 'latencia', 10))
+        version = self.topologia.version()
+        muestra = 10 * (1 + UMBRAL_CAMBIO_PESO / 2)
+        self.assertFalse(self.topologia.registrar_medicion('10.0.0.1', '10.0.0.3', 'latencia', muestra,
+                                                           suavizar=False))
+        self.assertEqual(self.topologia.version(), version)
+        # Los grafos siguen usando el último valor publicado
+        self.assertEqual(self.topologia.grafos()[0]['10.0.0.1']['10.0.0.3'], 10)
+
+    def test_cambio_grande_publica_version(self):
+        self.topologia.registrar_medicion('10.0.0.1', '10.0.0.3', 'latencia', 10)
+        version = self.topologia.version()
+        self.assertTrue(self.topologia.registrar_medicion('10.0.0.1', '10.0.0.3', 'latencia', 20, suavizar=False))
+        self.assertEqual(self.topologia.version(), version + 1)
+        self.assertEqual(self.topologia.grafos()[0]['10.0.0.1']['10.0.0.3'], 20)
+
+    def test_la_cache_sigue_a_la_version(self):
+        # La primera medición de un enlace siempre se publica
+        self.topologia.registrar_medicion('10.0.0.1', '10.0.0.3', 'latencia', 10)
+        self.assertEqual(ruta_optima('10.0.0.1', '10.0.0.3'), (10, ['10.0.0.1', '10.0.0.3']))
+        fallos = cache_rutas.fallos
+        self.topologia.registrar_medicion('10.0.0.1', '10.0.0.3', 'latencia', 10.5)
+        self.assertEqual(ruta_optima('10.0.0.1', '10.0.0.3'), (10, ['10.0.0.1', '10.0.0.3']))
+        self.assertEqual(cache_rutas.fallos, fallos)
+
+        self.topologia.registrar_medicion('10.0.0.1', '10.0.0.3', 'latencia', 30, suavizar=False)
+        self.assertEqual(ruta_optima('10.0.0.1', '10.0.0.3'), (11, ['10.0.0.1', '10.0.0.2', '10.0.0.3']))
+        self.assertEqual(cache_rutas.fallos, fallos + 1)
+
+if __name__ == "__main__":
+    unittest.main()
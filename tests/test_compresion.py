@@ -0,0 +1,58 @@
+import os
+import random
+import unittest
+
+from apoyo import PruebaTransferencia
+from compresion import codecs, enviar_comprimido, recibir_comprimido, TAMANO_BLOQUE_COMPRESION, TRAMA
+
+def datos_mezclados(semilla, tamano):
+    """Texto repetitivo (comprimible) intercalado con trozos aleatorios (incompresibles)"""
+    azar = random.Random(semilla)
+    datos = bytearray()
+    while len(datos) < tamano:
+        if azar.random() < 0.5:
+            datos += b"linea de registro %d: todo en orden\n" % len(datos) * 200
+        else:
+            datos += azar.randbytes(azar.randint(1, 300 * 1024))
+    return bytes(datos[:tamano])
+
+class PruebaCompresion(PruebaTransferencia):
+    def ida_y_vuelta(self, datos, codec):
+        origen = self.archivo('origen', datos)
+        destino = self.archivo('destino')
+        fd = os.open(destino, os.O_WRONLY)
+        try:
+            def enviar(sock):
+                with open(origen, 'rb') as f:
+                    enviar_comprimido(sock, f, codec)
+            escritos = self.transmitir(enviar, lambda sock: recibir_comprimido(sock, fd, codec))
+        finally:
+            os.close(fd)
+        self.assertEqual(escritos, len(datos))
+        with open(destino, 'rb') as f:
+            self.assertEqual(f.read(), datos)
+
+    def test_todos_los_codecs(self):
+        datos = datos_mezclados(1, 3 * TAMANO_BLOQUE_COMPRESION + 12345)
+        for codec in codecs:
+            with self.subTest(codec=codec):
+                self.ida_y_vuelta(datos, codec)
+
+    def test_bloques_incompresibles(self):
+        self.ida_y_vuelta(random.Random(2).randbytes(TAMANO_BLOQUE_COMPRESION + 1), 'zlib')
+
+    def test_archivo_vacio(self):
+        self.ida_y_vuelta(b'', 'zlib')
+
+    def test_trama_invalida(self):
+        destino = self.archivo('destino')
+        fd = os.open(destino, os.O_WRONLY)
+        try:
+            with self.assertRaises(Exception):
+                self.transmitir(lambda sock: sock.sendall(TRAMA.pack(9, 0, 0)),
+                                lambda sock: recibir_comprimido(sock, fd, 'zlib'))
+        finally:
+            os.close(fd)
+
+if __name__ == "__main__":
+    unittest.main()
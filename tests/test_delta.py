@@ -0,0 +1,76 @@
+import os
+import random
+import struct
+import unittest
+
+from apoyo import PruebaTransferencia
+from delta import tamano_bloque_delta, firmas_archivo, calcular_delta, tamano_cuerpo, enviar_delta, aplicar_delta
+
+class PruebaDelta(PruebaTransferencia):
+    def ida_y_vuelta(self, base, nuevo, max_literal=None):
+        """Envía nuevo como delta de base y devuelve las operaciones usadas"""
+        ruta_base = self.archivo('base', base)
+        ruta_nuevo = self.archivo('nuevo', nuevo)
+        destino = self.archivo('destino')
+        tamano_bloque = tamano_bloque_delta(len(base))
+        operaciones = calcular_delta(nuevo, firmas_archivo(ruta_base, tamano_bloque), tamano_bloque, len(base),
+                                     max_literal)
+        if operaciones is None:
+            return None
+
+        fd_base = os.open(ruta_base, os.O_RDONLY)
+        fd = os.open(destino, os.O_WRONLY)
+        try:
+            def enviar(sock):
+                with open(ruta_nuevo, 'rb') as f:
+                    enviar_delta(sock, f, operaciones)
+            escritos = self.transmitir(enviar, lambda sock: aplicar_delta(
+                sock, fd, fd_base, tamano_cuerpo(operaciones), tamano_bloque, len(base)))
+        finally:
+            os.close(fd)
+            os.close(fd_base)
+        self.assertEqual(escritos, len(nuevo))
+        with open(destino, 'rb') as f:
+            self.assertEqual(f.read(), nuevo)
+        return operaciones
+
+    def test_cambios_en_medio(self):
+        azar = random.Random(3)
+        base = azar.randbytes(300 * 1024)
+        # Inserción (desplaza el resto), modificación y datos agregados al final
+        nuevo = base[:50000] + b'insertado' * 100 + base[50000:200000] + b'X' * 10 + base[200010:] + b'final'
+        operaciones = self.ida_y_vuelta(base, nuevo)
+        self.assertIn('bloques', [operacion[0] for operacion in operaciones])
+        self.assertLess(tamano_cuerpo(operaciones), len(nuevo) // 4)
+
+    def test_sin_cambios(self):
+        base = random.Random(4).randbytes(100 * 1024 + 7)
+        operaciones = self.ida_y_vuelta(base, base)
+        self.assertEqual([operacion[0] for operacion in operaciones], ['bloques'])
+
+    def test_archivo_nuevo_mas_corto(self):
+        base = random.Random(5).randbytes(200 * 1024)
+        self.ida_y_vuelta(base, base[1000:90000])
+
+    def test_demasiados_cambios(self):
+        azar = random.Random(6)
+        base = azar.randbytes(100 * 1024)
+        nuevo = azar.randbytes(100 * 1024)
+        self.assertIsNone(self.ida_y_vuelta(base, nuevo, max_literal=len(nuevo) // 2))
+        self.ida_y_vuelta(base, nuevo)
+
+    def test_bloque_fuera_del_archivo_base(self):
+        ruta_base = self.archivo('base', b'a' * 4096)
+        destino = self.archivo('destino')
+        fd_base = os.open(ruta_base, os.O_RDONLY)
+        fd = os.open(destino, os.O_WRONLY)
+        try:
+            with self.assertRaises(Exception):
+                self.transmitir(lambda sock: sock.sendall(b'B' + struct.pack('>II', 5, 1)),
+                                lambda sock: aplicar_delta(sock, fd, fd_base, 9, 2048, 4096))
+        finally:
+            os.close(fd)
+            os.close(fd_base)
+
+if __name__ == "__main__":
+    unittest.main()
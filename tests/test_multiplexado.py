@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import socket
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+import multiplexado
+from multiplexado import (ConexionEntrante, PoolConexiones, ruta_segura, enviar_archivo, enviar_archivos,
+                          TRAMA, TRAMA_DATOS, MAX_DATOS_TRAMA, MAX_CONTENIDO_TRAMA, MAX_TAMANO_LOTE)
+
+class PruebaMultiplexado(unittest.TestCase):
+    """
+    Emisor, nodo principal y destino en el mismo proceso, por TCP local.
+
+    Los archivos se envían desde self.origen y el destino los guarda en
+    self.destino, que es el directorio actual durante la prueba.
+    """
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.origen = os.path.join(self.directorio, 'origen')
+        self.destino = os.path.join(self.directorio, 'destino')
+        os.makedirs(self.origen)
+        os.makedirs(self.destino)
+        anterior = os.getcwd()
+        os.chdir(self.destino)
+        self.addCleanup(os.chdir, anterior)
+
+        self.servidores = []
+        self.pools = []
+        # El nodo principal reenvía al destino; el emisor se conecta al nodo principal
+        self.puerto_destino = self.servidor(self.pool(0))
+        self.puerto_nodo = self.servidor(self.pool(self.puerto_destino))
+        self.pool_emisor = self.pool(self.puerto_nodo)
+
+    def tearDown(self):
+        for pool in self.pools:
+            pool.cerrar()
+        for servidor in self.servidores:
+            servidor.close()
+        shutil.rmtree(self.directorio)
+
+    def pool(self, puerto):
+        pool = PoolConexiones(puerto)
+        self.pools.append(pool)
+        return pool
+
+    def servidor(self, pool):
+        """Atiende conexiones multiplexadas en un puerto libre, como multiplexado.servir"""
+        servidor = socket.create_server(('127.0.0.1', 0))
+        self.servidores.append(servidor)
+
+        def aceptar():
+            while True:
+                try:
+                    conn, _ = servidor.accept()
+                except OSError:
+                    return
+                ConexionEntrante(conn, pool).iniciar()
+
+        threading.Thread(target=aceptar, daemon=True).start()
+        return servidor.getsockname()[1]
+
+    def archivo(self, nombre, datos=b''):
+        ruta = os.path.join(self.origen, nombre)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, 'wb') as f:
+            f.write(datos)
+        return ruta
+
+    def recibido(self, nombre):
+        with open(os.path.join(self.destino, nombre), 'rb') as f:
+            return f.read()
+
+class PruebaTramas(PruebaMultiplexado):
+    def test_directo_y_por_un_nodo_principal(self):
+        pequeno = self.archivo('pequeno', b'hola')
+        grande = self.archivo('grande', os.urandom(3 * MAX_DATOS_TRAMA + 17))
+        for ruta in (['origen', '127.0.0.1'], ['origen', '127.0.0.1', '127.0.0.1']):
+            with self.subTest(saltos=len(ruta) - 1):
+                resultados = enviar_archivos(ruta, [pequeno, grande], pool=self.pool_emisor, tiempo_espera=10)
+                self.assertEqual([archivo for archivo, _ in resultados], [pequeno, grande])
+                for _, respuesta in resultados:
+                    self.assertTrue(respuesta['completo'], respuesta)
+                self.assertEqual(self.recibido('pequeno'), b'hola')
+                with open(grande, 'rb') as f:
+                    self.assertEqual(self.recibido('grande'), f.read())
+                os.remove(os.path.join(self.destino, 'pequeno'))
+                os.remove(os.path.join(self.destino, 'grande'))
+
+    def test_cancelar_no_deja_archivos(self):
+        conexion = self.pool_emisor.conexion('127.0.0.1')
+        flujo = conexion.abrir_flujo({'nombre': 'cancelado', 'tamano': 10})
+        flujo.enviar(b'12345')
+        flujo.cancelar()
+        self.assertFalse(flujo.esperar_respuesta(1)['completo'])
+        # Un archivo posterior por la misma conexión confirma que el cancelado ya se procesó
+        respuesta = enviar_archivo(conexion, self.archivo('otro', b'x'), {'nombre': 'otro'}).esperar_respuesta(10)
+        self.assertTrue(respuesta['completo'])
+        self.assertEqual(os.listdir(self.destino), ['otro'])
+
+    def test_mas_bytes_de_los_anunciados(self):
+        conexion = self.pool_emisor.conexion('127.0.0.1')
+        flujo = conexion.abrir_flujo({'nombre': 'largo', 'tamano': 2}, b'123')
+        respuesta = flujo.esperar_respuesta(10)
+        self.assertFalse(respuesta['completo'])
+        self.assertEqual(os.listdir(self.destino), [])
+        # El flujo fallido no afecta a la conexión
+        self.assertFalse(conexion.cerrada)
+
+    def test_trama_de_flujo_desconocido_cierra_la_conexion(self):
+        conexion = self.pool_emisor.conexion('127.0.0.1')
+        pendiente = conexion.abrir_flujo({'nombre': 'pendiente', 'tamano': 4})
+        conexion.enviar_trama(99, TRAMA_DATOS, b'x')
+        respuesta = pendiente.esperar_respuesta(10)
+        self.assertFalse(respuesta['completo'])
+        self.assertIn('perdida', respuesta['error'])
+        self.assertEqual(os.listdir(self.destino), [])
+
+    def test_trama_demasiado_grande(self):
+        conexion = self.pool_emisor.conexion('127.0.0.1')
+        pendiente = conexion.abrir_flujo({'nombre': 'pendiente', 'tamano': 4})
+        with conexion.bloqueo_envio:
+            conexion.sock.sendall(TRAMA.pack(pendiente.id, TRAMA_DATOS, MAX_CONTENIDO_TRAMA + 1))
+        self.assertFalse(pendiente.esperar_respuesta(10)['completo'])
+
+    def test_sin_respuesta_a_tiempo(self):
+        # Un destino que acepta la conexión pero nunca lee
+        mudo = socket.create_server(('127.0.0.1', 0))
+        self.servidores.append(mudo)
+        pool = self.pool(mudo.getsockname()[1])
+        resultados = enviar_archivos(['origen', '127.0.0.1'], [self.archivo('a', b'a')], pool=pool, tiempo_espera=0.2)
+        self.assertFalse(resultados[0][1]['completo'])
+        self.assertIn('Sin respuesta', resultados[0][1]['error'])
+
+    @mock.patch.object(multiplexado, 'TIEMPO_ESPERA_COLA', 0.2)
+    @mock.patch.object(multiplexado, 'MAX_TRAMAS_COLA_SALTO', 2)
+    def test_salto_detenido_no_bloquea_a_los_demas(self):
+        # 127.0.0.2 acepta conexiones en el puerto del destino pero nunca lee
+        try:
+            mudo = socket.create_server(('127.0.0.2', self.puerto_destino))
+        except OSError:
+            self.skipTest("sin 127.0.0.2")
+        self.servidores.append(mudo)
+        conexion = self.pool_emisor.conexion('127.0.0.1')
+        atascado = enviar_archivo(conexion, self.archivo('atascado', bytes(32 * 1024 * 1024)),
+                                  {'nombre': 'atascado', 'ruta': ['127.0.0.2']})
+        respuesta = atascado.esperar_respuesta(10)
+        self.assertFalse(respuesta['completo'])
+        self.assertIn('no avanza', respuesta['error'])
+
+        # La misma conexión sigue sirviendo a los flujos que no pasan por el salto detenido
+        respuesta = enviar_archivo(conexion, self.archivo('libre', b'libre'), {'nombre': 'libre'}).esperar_respuesta(10)
+        self.assertTrue(respuesta['completo'])
+        self.assertEqual(self.recibido('libre'), b'libre')
+
+class PruebaLotes(PruebaMultiplexado):
+    def arbol(self):
+        """Directorio con archivos pequeños, uno grande, un archivo vacío y un subdirectorio vacío"""
+        contenidos = {f'arbol/a{i}.txt': b'%d' % i * (i + 1) for i in range(7)}
+        contenidos['arbol/sub/b.txt'] = b'b'
+        contenidos['arbol/sub/vacio'] = b''
+        contenidos['arbol/grande'] = os.urandom(MAX_TAMANO_LOTE + 1)
+        for nombre, datos in contenidos.items():
+            self.archivo(nombre, datos)
+        os.makedirs(os.path.join(self.origen, 'arbol', 'sin_archivos'))
+        return contenidos
+
+    def enviar(self, ruta=('origen', '127.0.0.1')):
+        resultados = enviar_archivos(list(ruta), [os.path.join(self.origen, 'arbol')], pool=self.pool_emisor,
+                                     tiempo_espera=10)
+        for _, respuesta in resultados:
+            self.assertTrue(respuesta['completo'], respuesta)
+        return resultados
+
+    def comprobar(self, contenidos):
+        for nombre, datos in contenidos.items():
+            self.assertEqual(self.recibido(nombre), datos, nombre)
+        self.assertTrue(os.path.isdir(os.path.join(self.destino, 'arbol', 'sin_archivos')))
+        self.assertFalse([nombre for _, _, nombres in os.walk(self.destino) for nombre in nombres
+                          if nombre.endswith('.parcial')])
+
+    def test_pequenos_en_un_lote(self):
+        contenidos = self.arbol()
+        resultados = self.enviar(('origen', '127.0.0.1', '127.0.0.1'))
+        # Un flujo para el archivo grande y un lote con todo lo demás
+        self.assertEqual(len(resultados), 2)
+        self.assertEqual(sum(respuesta['archivos'] for _, respuesta in resultados), len(contenidos))
+        self.comprobar(contenidos)
+
+    def test_corte_por_cantidad_de_archivos(self):
+        contenidos = self.arbol()
+        with mock.patch.object(multiplexado, 'MAX_ARCHIVOS_LOTE', 3):
+            resultados = self.enviar()
+        # 3 directorios y 9 archivos pequeños en lotes de 3, más el grande
+        self.assertEqual(len(resultados), 5)
+        self.comprobar(contenidos)
+
+    def test_corte_por_bytes(self):
+        contenidos = self.arbol()
+        with mock.patch.object(multiplexado, 'MAX_BYTES_LOTE', 10):
+            resultados = self.enviar()
+        lotes = [respuesta for descripcion, respuesta in resultados if descripcion.endswith(')')]
+        self.assertGreater(len(lotes), 1)
+        for respuesta in lotes:
+            self.assertLessEqual(respuesta['recibidos'], 10)
+        self.comprobar(contenidos)
+
+    def test_corte_por_cabecera(self):
+        contenidos = {f'arbol/{"x" * 100}{i}': b'%d' % i for i in range(20)}
+        for nombre, datos in contenidos.items():
+            self.archivo(nombre, datos)
+        os.makedirs(os.path.join(self.origen, 'arbol', 'sin_archivos'))
+        with mock.patch.object(multiplexado, 'MAX_CABECERA_LOTE', 1000):
+            lotes = []
+            enviar_lote = multiplexado.enviar_lote
+
+            def registrar(conexion, lote, cabecera, al_enviar=None):
+                lotes.append(lote)
+                return enviar_lote(conexion, lote, cabecera, al_enviar)
+
+            with mock.patch.object(multiplexado, 'enviar_lote', registrar):
+                self.enviar()
+        self.assertGreater(len(lotes), 1)
+        for lote in lotes:
+            entradas = [(relativa, tamano) for _, relativa, tamano in lote]
+            self.assertLessEqual(len(json.dumps(entradas)), 1000)
+        self.comprobar(contenidos)
+
+class PruebaRutaSegura(unittest.TestCase):
+    def setUp(self):
+        self.directorio = os.path.realpath(tempfile.mkdtemp())
+        anterior = os.getcwd()
+        os.chdir(self.directorio)
+        self.addCleanup(os.chdir, anterior)
+        self.addCleanup(shutil.rmtree, self.directorio)
+
+    def test_rutas_relativas(self):
+        self.assertEqual(ruta_segura('a.txt'), 'a.txt')
+        self.assertEqual(ruta_segura('dir/./sub//a.txt'), os.path.join('dir', 'sub', 'a.txt'))
+        self.assertEqual(ruta_segura('dir\\a.txt'), os.path.join('dir', 'a.txt'))
+
+    def test_rutas_no_permitidas(self):
+        for nombre in ('', '.', '/etc/passwd', '\\windows', '../fuera', 'dir/../../fuera', 'dir/..'):
+            with self.subTest(nombre=nombre):
+                with self.assertRaises(Exception):
+                    ruta_segura(nombre)
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), "sin enlaces simbólicos")
+    def test_enlace_simbolico_hacia_fuera(self):
+        fuera = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, fuera)
+        os.symlink(fuera, 'enlace')
+        with self.assertRaises(Exception):
+            ruta_segura('enlace/a.txt')
+
+if __name__ == "__main__":
+    unittest.main()
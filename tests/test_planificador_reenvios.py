@@ -0,0 +1,121 @@
+import time
+import threading
+import unittest
+
+from apoyo import PruebaTopologia
+from nodo_principal import (PlanificadorReenvios, MAX_FILE_SIZE, MAX_BYTES_ADMITIDOS, TAMANO_INTERACTIVO,
+                            TAMANO_MASIVO)
+
+LOCAL = '10.0.0.1'
+RAPIDO = '10.0.0.2'   # Enlace de 100 Mbps
+LENTO = '10.0.0.3'    # Enlace de 10 Mbps
+OTRO = '10.0.0.4'
+
+def paquete(tamano, destino=RAPIDO):
+    return {'nombre': 'archivo', 'tamano': tamano, 'destino': destino}
+
+class PruebaPlanificadorReenvios(PruebaTopologia):
+    def setUp(self):
+        super().setUp()
+        self.red({(LOCAL, RAPIDO): (1, 100), (LOCAL, LENTO): (1, 10), (LOCAL, OTRO): (1, 100)})
+        self.orden = []
+        self.hilos = []
+        self.eventos = []
+
+    def tearDown(self):
+        for evento in self.eventos:
+            evento.set()
+        for hilo in self.hilos:
+            hilo.join(10)
+        super().tearDown()
+
+    def en_turno(self, planificador, solicitud, nombre, soltar=None):
+        """Pide turno desde otro hilo y espera a que la solicitud esté en la cola o reenviándose"""
+        def reenviar():
+            with planificador.turno(solicitud):
+                self.orden.append(nombre)
+                if soltar:
+                    soltar.wait(10)
+
+        if soltar:
+            self.eventos.append(soltar)
+        hilo = threading.Thread(target=reenviar, daemon=True)
+        self.hilos.append(hilo)
+        hilo.start()
+        self.esperar(lambda: solicitud in planificador.cola or solicitud.concedida)
+
+    def esperar(self, condicion):
+        limite = time.time() + 10
+        while not condicion():
+            self.assertLess(time.time(), limite, "el planificador no avanzó")
+            time.sleep(0.005)
+
+    def test_clases(self):
+        planificador = PlanificadorReenvios()
+        self.assertEqual(planificador.admitir(paquete(TAMANO_INTERACTIVO), LOCAL).clase, 0)
+        self.assertEqual(planificador.admitir(paquete(TAMANO_INTERACTIVO + 1), LOCAL).clase, 1)
+        self.assertEqual(planificador.admitir(paquete(TAMANO_MASIVO), LOCAL).clase, 2)
+        self.assertEqual(planificador.admitir(paquete(None), LOCAL).clase, 2)
+        with self.assertRaises(Exception):
+            planificador.admitir(paquete(MAX_FILE_SIZE + 1), LOCAL)
+
+    def test_capacidad_del_enlace(self):
+        planificador = PlanificadorReenvios()
+        self.assertEqual(planificador.admitir(paquete(1, LENTO), LOCAL).capacidad, 10)
+        self.assertEqual(planificador.admitir(paquete(1, '10.9.9.9'), LOCAL).enlace, '10.9.9.9')
+
+    def test_admision_de_archivos_grandes(self):
+        # Con 4 conexiones, 2 quedan reservadas para los archivos interactivos
+        planificador = PlanificadorReenvios(max_reenvios=4, max_conexiones=4)
+        grandes = [planificador.admitir(paquete(TAMANO_MASIVO), LOCAL) for _ in range(2)]
+        with self.assertRaises(Exception):
+            planificador.admitir(paquete(TAMANO_MASIVO), LOCAL)
+        planificador.admitir(paquete(1), LOCAL)
+
+        planificador.terminar(grandes[0])
+        planificador.admitir(paquete(TAMANO_MASIVO), LOCAL)
+
+    def test_admision_por_bytes(self):
+        planificador = PlanificadorReenvios(max_conexiones=100)
+        tamano = MAX_BYTES_ADMITIDOS // 2
+        primera = planificador.admitir(paquete(tamano), LOCAL)
+        planificador.admitir(paquete(tamano), LOCAL)
+        with self.assertRaises(Exception):
+            planificador.admitir(paquete(1), LOCAL)
+        planificador.terminar(primera)
+        planificador.admitir(paquete(1), LOCAL)
+        self.assertEqual(planificador.bytes_admitidos, tamano + 1)
+
+    def test_interactivos_el_mas_corto_primero(self):
+        planificador = PlanificadorReenvios(max_reenvios=3)
+        soltar = [threading.Event() for _ in range(3)]
+        for i in range(3):
+            self.en_turno(planificador, planificador.admitir(paquete(1), LOCAL), f"ocupado{i}", soltar[i])
+
+        self.en_turno(planificador, planificador.admitir(paquete(500 * 1024), LOCAL), 'mediano')
+        self.en_turno(planificador, planificador.admitir(paquete(100 * 1024), LOCAL), 'corto')
+        self.en_turno(planificador, planificador.admitir(paquete(10 * TAMANO_INTERACTIVO), LOCAL), 'grande')
+        self.assertEqual(len(planificador.cola), 3)
+        # Con un solo cupo libre los archivos en cola pasan de uno en uno
+        soltar[0].set()
+        self.esperar(lambda: len(self.orden) == 6)
+        # El grande no espera a todos los pequeños, y entre éstos el más corto va primero
+        self.assertEqual(self.orden[3:], ['grande', 'corto', 'mediano'])
+
+    def test_reparto_ponderado_entre_enlaces(self):
+        # Con 3 reenvíos sólo avanza un archivo grande a la vez
+        planificador = PlanificadorReenvios(max_reenvios=3)
+        soltar = threading.Event()
+        tamano = 10 * TAMANO_INTERACTIVO
+        self.en_turno(planificador, planificador.admitir(paquete(tamano, OTRO), LOCAL), 'ocupado', soltar)
+        for i in range(3):
+            self.en_turno(planificador, planificador.admitir(paquete(tamano, LENTO), LOCAL), f"lento{i}")
+        for i in range(3):
+            self.en_turno(planificador, planificador.admitir(paquete(tamano, RAPIDO), LOCAL), f"rapido{i}")
+        soltar.set()
+        self.esperar(lambda: len(self.orden) == 7)
+        # El enlace de 100 Mbps reenvía tres archivos en el tiempo virtual de uno del de 10 Mbps
+        self.assertEqual(self.orden[1:], ['lento0', 'rapido0', 'rapido1', 'rapido2', 'lento1', 'lento2'])
+
+if __name__ == "__main__":
+    unittest.main()
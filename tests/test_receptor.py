@@ -0,0 +1,163 @@
+import os
+import socket
+import threading
+import unittest
+
+from apoyo import PruebaTopologia
+import receptor
+from receptor import atender_conexion, validar_franja, PuntoControl, MAX_FILE_SIZE
+from transporte import enviar_mensaje, recibir_mensaje
+
+class PruebaReceptor(PruebaTopologia):
+    """Atiende conexiones con receptor.atender_conexion por TCP local, en un directorio temporal"""
+    def setUp(self):
+        super().setUp()
+        self.recibidos = os.path.join(self.directorio, 'recibidos')
+        os.makedirs(self.recibidos)
+        anterior = os.getcwd()
+        os.chdir(self.recibidos)
+        self.addCleanup(os.chdir, anterior)
+        self.escrituras = threading.BoundedSemaphore(4)
+        self.servidor = socket.create_server(('127.0.0.1', 0))
+        self.addCleanup(self.servidor.close)
+
+    def enviar(self, paquete, datos=b''):
+        """
+        Envía los metadatos y los datos de una conexión, como un emisor.
+
+        Returns:
+            La respuesta del receptor, o None si cerró la conexión sin responder
+        """
+        cliente = socket.create_connection(self.servidor.getsockname())
+        conn, addr = self.servidor.accept()
+        hilo = threading.Thread(target=atender_conexion, args=(conn, addr, self.escrituras))
+        hilo.start()
+        try:
+            enviar_mensaje(cliente, paquete)
+            try:
+                cliente.sendall(datos)
+                cliente.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass  # El receptor rechazó los metadatos y cerró sin leer los datos
+            try:
+                return recibir_mensaje(cliente)
+            except Exception:
+                return None
+        finally:
+            cliente.close()
+            hilo.join(10)
+
+    def contenido(self, nombre):
+        with open(nombre, 'rb') as f:
+            return f.read()
+
+class PruebaFranjas(PruebaReceptor):
+    def franja(self, datos, desplazamiento, longitud, **extra):
+        paquete = dict({'nombre': 'archivo', 'id_transferencia': 'franjas', 'tamano_total': len(datos),
+                        'desplazamiento': desplazamiento, 'tamano': longitud, 'espera_respuesta': True}, **extra)
+        return self.enviar(paquete, datos[desplazamiento:desplazamiento + longitud])
+
+    def test_reensamblado_fuera_de_orden(self):
+        datos = os.urandom(300 * 1024 + 7)
+        tercio = len(datos) // 3
+        franjas = [(0, tercio), (tercio, tercio), (2 * tercio, len(datos) - 2 * tercio)]
+        respuestas = [self.franja(datos, desplazamiento, longitud) for desplazamiento, longitud in
+                      (franjas[2], franjas[0], franjas[1])]
+        self.assertEqual([respuesta['completo'] for respuesta in respuestas], [False, False, True])
+        self.assertEqual(self.contenido('archivo'), datos)
+        self.assertEqual(os.listdir('.'), ['archivo'])
+        self.assertNotIn('franjas', receptor.franjas_recibidas)
+
+    def test_franja_incompleta(self):
+        datos = os.urandom(64 * 1024)
+        paquete = {'nombre': 'archivo', 'id_transferencia': 'cortada', 'tamano_total': len(datos),
+                   'desplazamiento': 0, 'tamano': len(datos), 'espera_respuesta': True}
+        # El emisor se corta a la mitad: no hay confirmación ni archivo final
+        self.assertIsNone(self.enviar(paquete, datos[:len(datos) // 2]))
+        self.assertFalse(os.path.exists('archivo'))
+        self.addCleanup(receptor.franjas_recibidas.pop, 'cortada', None)
+
+class PruebaFlujosParalelos(PruebaFranjas):
+    def test_franjas_simultaneas(self):
+        datos = os.urandom(2 * 1024 * 1024 + 3)
+        num_flujos = 4
+        tamano = -(-len(datos) // num_flujos)
+        respuestas = []
+
+        def enviar(i):
+            desplazamiento = i * tamano
+            respuestas.append(self.franja(datos, desplazamiento, min(tamano, len(datos) - desplazamiento),
+                                          id_transferencia='paralela'))
+
+        hilos = [threading.Thread(target=enviar, args=(i,)) for i in range(num_flujos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join(10)
+        self.assertEqual(sorted(respuesta['completo'] for respuesta in respuestas), [False] * 3 + [True])
+        self.assertEqual(self.contenido('archivo'), datos)
+
+    def test_franja_fuera_del_archivo(self):
+        for desplazamiento, longitud in ((-1, 10), (0, 101), (95, 10)):
+            with self.subTest(desplazamiento=desplazamiento, longitud=longitud):
+                paquete = {'nombre': 'archivo', 'id_transferencia': 'invalida', 'tamano_total': 100,
+                           'desplazamiento': desplazamiento, 'tamano': longitud, 'espera_respuesta': True}
+                self.assertIsNone(self.enviar(paquete, bytes(max(longitud, 0))))
+                # Se rechaza antes de crear y reservar el archivo parcial
+                self.assertEqual(os.listdir('.'), [])
+
+    def test_tamano_total_excesivo(self):
+        paquete = {'nombre': 'archivo', 'id_transferencia': 'enorme', 'tamano_total': MAX_FILE_SIZE + 1,
+                   'desplazamiento': 0, 'tamano': 10, 'espera_respuesta': True}
+        self.assertIsNone(self.enviar(paquete, bytes(10)))
+        self.assertEqual(os.listdir('.'), [])
+        with self.assertRaises(Exception):
+            validar_franja(paquete)
+
+class PruebaPuntoControl(PruebaReceptor):
+    TAMANO_BLOQUE = 4096
+
+    def test_faltantes_y_guardado(self):
+        open('archivo.parcial', 'wb').close()
+        punto = PuntoControl('archivo.parcial', 10 * self.TAMANO_BLOQUE + 100, self.TAMANO_BLOQUE)
+        self.assertEqual(punto.total_bloques, 11)
+        punto.marcar([0, 1, 2, 5, 10])
+        self.assertEqual(punto.faltantes(), [[3 * self.TAMANO_BLOQUE, 2 * self.TAMANO_BLOQUE],
+                                             [6 * self.TAMANO_BLOQUE, 4 * self.TAMANO_BLOQUE]])
+        self.assertFalse(punto.completo())
+        punto.guardar()
+
+        cargado = PuntoControl('archivo.parcial', punto.tamano_total, self.TAMANO_BLOQUE)
+        self.assertEqual(cargado.completados, punto.completados)
+        # Con otro manifiesto, o sin el archivo parcial, el punto de control no vale
+        self.assertEqual(PuntoControl('archivo.parcial', punto.tamano_total + 1, self.TAMANO_BLOQUE).completados, set())
+        os.remove('archivo.parcial')
+        self.assertEqual(PuntoControl('archivo.parcial', punto.tamano_total, self.TAMANO_BLOQUE).completados, set())
+
+    def test_reanudar_tras_un_corte(self):
+        datos = os.urandom(40 * self.TAMANO_BLOQUE + 100)
+        paquete = {'nombre': 'archivo', 'id_transferencia': 'reanudable', 'tamano_total': len(datos),
+                   'tamano_bloque': self.TAMANO_BLOQUE, 'reanudable': True, 'espera_respuesta': True}
+        self.addCleanup(receptor.puntos_control.pop, 'reanudable', None)
+        consulta = dict(paquete, tipo='consulta_reanudacion', tamano=0)
+        self.assertEqual(self.enviar(consulta), {'faltantes': [[0, len(datos)]]})
+
+        # La conexión se corta a mitad de un bloque: sólo cuentan los bloques enteros
+        cortados = 25 * self.TAMANO_BLOQUE + 10
+        self.assertIsNone(self.enviar(dict(paquete, desplazamiento=0, tamano=len(datos)), datos[:cortados]))
+        self.assertTrue(os.path.exists('archivo.reanudable.parcial.json'))
+        faltantes = self.enviar(consulta)['faltantes']
+        self.assertEqual(faltantes, [[25 * self.TAMANO_BLOQUE, len(datos) - 25 * self.TAMANO_BLOQUE]])
+
+        # Un receptor reiniciado continúa desde el punto de control guardado en disco
+        receptor.puntos_control.clear()
+        self.assertEqual(self.enviar(consulta)['faltantes'], faltantes)
+        desplazamiento, longitud = faltantes[0]
+        respuesta = self.enviar(dict(paquete, desplazamiento=desplazamiento, tamano=longitud),
+                                datos[desplazamiento:desplazamiento + longitud])
+        self.assertTrue(respuesta['completo'])
+        self.assertEqual(self.contenido('archivo'), datos)
+        self.assertEqual(os.listdir('.'), ['archivo'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from rutas import k_rutas_mas_cortas, max_rutas_disjuntas, rutas_disjuntas
+
+def grafo_aleatorio(semilla, num_nodos=6, probabilidad=0.5):
+    """Grafo dirigido pequeño con pesos enteros, reproducible por su semilla"""
+    azar = random.Random(semilla)
+    nodos = [f"n{i}" for i in range(num_nodos)]
+    grafo = {nodo: {} for nodo in nodos}
+    for u in nodos:
+        for v in nodos:
+            if u != v and azar.random() < probabilidad:
+                grafo[u][v] = azar.randint(1, 9)
+    return grafo
+
+def rutas_simples(grafo, inicio, fin):
+    """Todas las rutas sin ciclos de inicio a fin (fuerza bruta)"""
+    rutas = []
+    pila = [[inicio]]
+    while pila:
+        ruta = pila.pop()
+        if ruta[-1] == fin:
+            rutas.append(ruta)
+            continue
+        for vecino in grafo[ruta[-1]]:
+            if vecino not in ruta:
+                pila.append(ruta + [vecino])
+    return rutas
+
+def aristas(ruta):
+    return [(ruta[i], ruta[i + 1]) for i in range(len(ruta) - 1)]
+
+def latencia(grafo, ruta):
+    return sum(grafo[u][v] for u, v in aristas(ruta))
+
+def cuello(grafo, ruta):
+    return min(grafo[u][v] for u, v in aristas(ruta))
+
+def disjuntas(rutas, nodos_disjuntos):
+    usadas = set()
+    for ruta in rutas:
+        elementos = ruta[1:-1] if nodos_disjuntos else aristas(ruta)
+        if usadas & set(elementos):
+            return False
+        usadas.update(elementos)
+    return True
+
+def mejor_conjunto_disjunto(grafo, inicio, fin, nodos_disjuntos):
+    """
+    Máximo de rutas disjuntas y, con ese máximo, la menor latencia total.
+
+    Búsqueda exhaustiva con vuelta atrás sobre todas las rutas simples: sólo
+    se extienden los conjuntos que siguen siendo disjuntos.
+    """
+    todas = [(set(ruta[1:-1] if nodos_disjuntos else aristas(ruta)), latencia(grafo, ruta))
+             for ruta in rutas_simples(grafo, inicio, fin)]
+    mejor = (0, 0)
+
+    def buscar(desde, usadas, cantidad, costo):
+        nonlocal mejor
+        if cantidad > mejor[0] or (cantidad == mejor[0] and costo < mejor[1]):
+            mejor = (cantidad, costo)
+        for i in range(desde, len(todas)):
+            elementos, latencia_ruta = todas[i]
+            if not elementos & usadas:
+                buscar(i + 1, usadas | elementos, cantidad + 1, costo + latencia_ruta)
+
+    buscar(0, set(), 0, 0)
+    return mejor
+
+class PruebaKRutasMasCortas(unittest.TestCase):
+    def comprobar_rutas(self, grafo, inicio, fin, rutas):
+        for _, ruta in rutas:
+            self.assertEqual((ruta[0], ruta[-1]), (inicio, fin))
+            self.assertEqual(len(set(ruta)), len(ruta), "la ruta tiene un ciclo")
+            for u, v in aristas(ruta):
+                self.assertIn(v, grafo[u])
+        self.assertEqual(len({tuple(ruta) for _, ruta in rutas}), len(rutas), "rutas repetidas")
+
+    def test_ejemplo_conocido(self):
+        grafo = {
+            'C': {'D': 3, 'E': 2},
+            'D': {'F': 4},
+            'E': {'D': 1, 'F': 2, 'G': 3},
+            'F': {'G': 2, 'H': 1},
+            'G': {'H': 2},
+            'H': {}
+        }
+        rutas = k_rutas_mas_cortas(grafo, 'C', 'H', 3)
+        self.assertEqual(rutas, [(5, ['C', 'E', 'F', 'H']), (7, ['C', 'E', 'G', 'H']), (8, ['C', 'D', 'F', 'H'])])
+
+    def test_latencia_contra_fuerza_bruta(self):
+        for semilla in range(60):
+            grafo = grafo_aleatorio(semilla)
+            esperadas = sorted(latencia(grafo, ruta) for ruta in rutas_simples(grafo, 'n0', 'n5'))
+            for k in (1, 3, 8, 100):
+                rutas = k_rutas_mas_cortas(grafo, 'n0', 'n5', k)
+                self.comprobar_rutas(grafo, 'n0', 'n5', rutas)
+                self.assertEqual([valor for valor, _ in rutas], esperadas[:k], f"semilla {semilla}, k={k}")
+                for valor, ruta in rutas:
+                    self.assertEqual(valor, latencia(grafo, ruta))
+
+    def test_ancho_banda_contra_fuerza_bruta(self):
+        for semilla in range(60):
+            grafo = grafo_aleatorio(semilla)
+            esperadas = sorted((cuello(grafo, ruta) for ruta in rutas_simples(grafo, 'n0', 'n5')), reverse=True)
+            for k in (1, 4, 100):
+                rutas = k_rutas_mas_cortas(grafo, 'n0', 'n5', k, use_latency=False)
+                self.comprobar_rutas(grafo, 'n0', 'n5', rutas)
+                self.assertEqual([valor for valor, _ in rutas], esperadas[:k], f"semilla {semilla}, k={k}")
+
+    def test_sin_ruta(self):
+        grafo = {'A': {'B': 1}, 'B': {}, 'C': {'A': 1}}
+        self.assertEqual(k_rutas_mas_cortas(grafo, 'A', 'C', 3), [])
+        self.assertEqual(k_rutas_mas_cortas(grafo, 'A', 'A', 3), [])
+        self.assertEqual(k_rutas_mas_cortas(grafo, 'A', 'Z', 3), [])
+
+class PruebaMaxRutasDisjuntas(unittest.TestCase):
+    def test_trampa_de_la_eleccion_voraz(self):
+        # La ruta más ancha A-C-D-B usa las aristas que necesitan las otras dos
+        grafo = {
+            'A': {'C': 100, 'E': 10},
+            'C': {'D': 100, 'B': 10},
+            'E': {'D': 10},
+            'D': {'B': 100},
+            'B': {}
+        }
+        self.assertEqual(len(rutas_disjuntas(grafo, 'A', 'B')), 1)
+        rutas = max_rutas_disjuntas(grafo, 'A', 'B', use_latency=False)
+        self.assertEqual(sorted(ruta for _, ruta in rutas), [['A', 'C', 'B'], ['A', 'E', 'D', 'B']])
+        self.assertEqual([valor for valor, _ in rutas], [10, 10])
+
+    def test_nodos_disjuntos(self):
+        # Las dos rutas comparten el nodo M pero ninguna arista
+        grafo = {
+            'A': {'B': 1, 'C': 1},
+            'B': {'M': 1},
+            'C': {'M': 1},
+            'M': {'D': 1, 'E': 1},
+            'E': {'D': 1},
+            'D': {}
+        }
+        rutas = max_rutas_disjuntas(grafo, 'A', 'D')
+        self.assertEqual(len(rutas), 2)
+        self.assertEqual(sum(valor for valor, _ in rutas), 7)
+        rutas = max_rutas_disjuntas(grafo, 'A', 'D', nodos_disjuntos=True)
+        self.assertEqual(len(rutas), 1)
+        self.assertEqual(rutas[0][0], 3)
+
+    def test_contra_fuerza_bruta(self):
+        for semilla in range(40):
+            grafo = grafo_aleatorio(semilla, num_nodos=7, probabilidad=0.6)
+            for nodos_disjuntos in (False, True):
+                rutas = max_rutas_disjuntas(grafo, 'n0', 'n6', nodos_disjuntos=nodos_disjuntos)
+                solo_rutas = [ruta for _, ruta in rutas]
+                cantidad, costo = mejor_conjunto_disjunto(grafo, 'n0', 'n6', nodos_disjuntos)
+                contexto = f"semilla {semilla}, nodos_disjuntos={nodos_disjuntos}"
+                self.assertTrue(disjuntas(solo_rutas, nodos_disjuntos), contexto)
+                self.assertEqual(len(rutas), cantidad, contexto)
+                self.assertEqual(sum(valor for valor, _ in rutas), costo, contexto)
+                for valor, ruta in rutas:
+                    self.assertEqual((ruta[0], ruta[-1]), ('n0', 'n6'))
+                    self.assertEqual(valor, latencia(grafo, ruta))
+
+if __name__ == "__main__":
+    unittest.main()
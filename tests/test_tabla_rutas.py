@@ -0,0 +1,94 @@
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from grafo import como_csr
+from rutas import dijkstra
+from tabla_rutas import TablaRutas, MAX_CAMBIOS_INCREMENTALES
+
+def red_aleatoria(semilla, num_nodos=8, probabilidad=0.4):
+    """Grafos de latencia y ancho de banda con los mismos enlaces"""
+    azar = random.Random(semilla)
+    nodos = [f"n{i}" for i in range(num_nodos)]
+    latencia = {nodo: {} for nodo in nodos}
+    ancho_banda = {nodo: {} for nodo in nodos}
+    for u in nodos:
+        for v in nodos:
+            if u != v and azar.random() < probabilidad:
+                latencia[u][v] = azar.randint(1, 50)
+                ancho_banda[u][v] = azar.randint(1, 100)
+    return latencia, ancho_banda
+
+class PruebaTablaRutas(unittest.TestCase):
+    def comprobar(self, tabla, latencia, ancho_banda, contexto):
+        """Compara la tabla con un Dijkstra desde cero para cada par de nodos"""
+        for origen in latencia:
+            for destino in latencia:
+                if origen == destino:
+                    continue
+                for metrica, grafo in (('latencia', latencia), ('ancho_banda', ancho_banda)):
+                    esperado, ruta_esperada = dijkstra(grafo, origen, destino, metrica == 'latencia')
+                    valor, ruta = tabla.ruta(origen, destino, metrica)
+                    mensaje = f"{contexto}: {origen} -> {destino} por {metrica}"
+                    self.assertEqual(bool(ruta), bool(ruta_esperada), mensaje)
+                    if not ruta:
+                        continue
+                    self.assertEqual(valor, esperado, mensaje)
+                    self.assertEqual(tabla.siguiente_salto(origen, destino, metrica), ruta[1], mensaje)
+                    pesos = [grafo[ruta[i]][ruta[i + 1]] for i in range(len(ruta) - 1)]
+                    self.assertEqual(sum(pesos) if metrica == 'latencia' else min(pesos), esperado, mensaje)
+
+    def test_actualizaciones_incrementales(self):
+        for semilla in range(15):
+            latencia, ancho_banda = red_aleatoria(semilla)
+            tabla = TablaRutas.desde_grafos(latencia, ancho_banda)
+            self.comprobar(tabla, latencia, ancho_banda, f"semilla {semilla}")
+
+            azar = random.Random(semilla)
+            enlaces = [(u, v) for u in latencia for v in latencia[u]]
+            for paso in range(20):
+                u, v = azar.choice(enlaces)
+                if azar.random() < 0.5:
+                    latencia[u][v] = azar.randint(1, 50)
+                    self.assertTrue(tabla.actualizar_arista(u, v, 'latencia', latencia[u][v]))
+                else:
+                    ancho_banda[u][v] = azar.randint(1, 100)
+                    self.assertTrue(tabla.actualizar_arista(u, v, 'ancho_banda', ancho_banda[u][v]))
+                self.comprobar(tabla, latencia, ancho_banda, f"semilla {semilla}, paso {paso}")
+
+    def test_enlace_desconocido(self):
+        latencia, ancho_banda = red_aleatoria(0)
+        tabla = TablaRutas.desde_grafos(latencia, ancho_banda)
+        self.assertFalse(tabla.actualizar_arista('n0', 'otro', 'latencia', 1))
+
+    def test_sincronizar(self):
+        latencia, ancho_banda = red_aleatoria(3)
+        tabla = TablaRutas.desde_grafos(latencia, ancho_banda)
+        u = next(nodo for nodo in latencia if latencia[nodo])
+        v = next(iter(latencia[u]))
+
+        latencia[u][v] += 7
+        ancho_banda[u][v] += 3
+        self.assertEqual(tabla.sincronizar(como_csr(latencia, ancho_banda=ancho_banda)), 2)
+        self.comprobar(tabla, latencia, ancho_banda, "pesos")
+
+        # Con un enlace nuevo cambia la estructura y se recalcula todo
+        w = next(nodo for nodo in latencia if nodo != u and nodo not in latencia[u])
+        latencia[u][w], ancho_banda[u][w] = 1, 100
+        self.assertEqual(tabla.sincronizar(como_csr(latencia, ancho_banda=ancho_banda)), -1)
+        self.comprobar(tabla, latencia, ancho_banda, "enlace nuevo")
+
+        # Demasiados pesos a la vez también
+        for origen in latencia:
+            for destino in latencia[origen]:
+                latencia[origen][destino] += 1
+                ancho_banda[origen][destino] += 1
+        self.assertGreater(2 * sum(len(vecinos) for vecinos in latencia.values()), MAX_CAMBIOS_INCREMENTALES)
+        self.assertEqual(tabla.sincronizar(como_csr(latencia, ancho_banda=ancho_banda)), -1)
+        self.comprobar(tabla, latencia, ancho_banda, "muchos pesos")
+
+if __name__ == "__main__":
+    unittest.main()